@@ -1,20 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List
 import os
-import uuid
-import shutil
+import asyncio
 from datetime import datetime
 
 from app.core.database import get_db
+from app.core.admission import admission_controller
 from app.core.config import settings
 from app.core.security import get_current_active_user
-from app.models.document import Document as DocumentModel, DocumentStatus, DocumentType
+from app.models.document import Document as DocumentModel, DocumentType
 from app.models.user import User
 from app.schemas.document import Document, DocumentCreate
+from app.services.content_store import release_reference
+from app.services.document_download import download_response, not_modified, stored_file_response
+from app.services.previews import (
+    PREVIEW_MEDIA_TYPE,
+    PreviewUnavailable,
+    PreviewsBusy,
+    ensure_preview,
+    preview_etag,
+    render_upload_previews
+)
+from app.services.upload_stream import UploadTooLarge, receive_upload, store_document
 
 router = APIRouter()
 
+# The body is parsed by receive_upload, not by FastAPI, so describe it for the docs
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
 @router.get("/", response_model=List[Document])
 async def read_documents(
     skip: int = 0, 
@@ -47,57 +74,150 @@ async def read_document(
     
     return document
 
-@router.post("/upload/", response_model=Document, status_code=status.HTTP_201_CREATED)
-async def upload_document(
-    file: UploadFile = File(...), 
-    document_type: DocumentType = DocumentType.OTHER,
+@router.get("/{document_id}/download")
+async def download_document(
+    document_id: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Upload a new document"""
-    # Validate file extension
-    file_ext = os.path.splitext(file.filename)[1].lower().replace('.', '')
-    if file_ext not in settings.ALLOWED_EXTENSIONS:
+    """Download a document's original file
+    
+    Supports Range requests (206) for partial and resumed downloads, and
+    If-None-Match against the ETag (the content hash) for a 304.
+    """
+    document = db.query(DocumentModel).filter(
+        DocumentModel.id == document_id,
+        DocumentModel.owner_id == current_user.id
+    ).first()
+    
+    if not document:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"File type not allowed. Allowed types: {', '.join(settings.ALLOWED_EXTENSIONS)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    try:
+        return await download_response(request, document)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document file not found"
+        )
+
+@router.get("/{document_id}/previews/{size}")
+async def read_document_preview(
+    document_id: str,
+    size: str,
+    request: Request,
+    page: int = 1,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get a page of a document as a JPEG of a named size (PREVIEW_SIZES, e.g. thumbnail)
+    
+    Previews are rendered once, right after the upload or on first request,
+    and may be cached by clients for good.
+    """
+    pixels = settings.PREVIEW_SIZES.get(size)
+    if pixels is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown preview size. Sizes: {', '.join(settings.PREVIEW_SIZES)}"
+        )
+    
+    document = db.query(DocumentModel).filter(
+        DocumentModel.id == document_id,
+        DocumentModel.owner_id == current_user.id
+    ).first()
+    
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    # A document's contents never change, so neither do its previews
+    headers = {"cache-control": "private, max-age=31536000, immutable"}
+    if document.content_hash:
+        headers["etag"] = preview_etag(document.content_hash, page, pixels)
+    response = not_modified(request, headers)
+    if response is not None:
+        return response
+    
+    try:
+        key = await ensure_preview(document, page, pixels)
+        return await stored_file_response(request, key, headers, PREVIEW_MEDIA_TYPE)
+    except PreviewUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except (PreviewsBusy, asyncio.TimeoutError):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Preview is not ready yet",
+            headers={"Retry-After": "5"}
+        )
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document file not found"
         )
+
+@router.post(
+    "/upload/", response_model=Document, status_code=status.HTTP_201_CREATED, openapi_extra=UPLOAD_REQUEST_BODY
+)
+async def upload_document(
+    request: Request,
+    document_type: DocumentType = DocumentType.OTHER,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Upload a new document
     
-    # Create unique filename
-    unique_filename = f"{uuid.uuid4()}.{file_ext}"
-    file_location = os.path.join(settings.UPLOAD_FOLDER, unique_filename)
+    The file is streamed to disk as it arrives and hashed on the way, off
+    the event loop. Files over MAX_CONTENT_LENGTH are refused with 413 as
+    soon as the request announces or exceeds that size.
+    """
+    # Refuse while the upload folder is short of space
+    admission_controller.check_upload(int(request.headers.get("content-length") or 0))
     
-    # Save file
+    # Save file, hashing it on the way
     try:
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
+        upload = await receive_upload(
+            request, "file", settings.UPLOAD_FOLDER, settings.MAX_CONTENT_LENGTH, settings.ALLOWED_EXTENSIONS
+        )
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File too large. Maximum size: {settings.MAX_CONTENT_LENGTH // (1024 * 1024)}MB"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except OSError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Could not upload file: {str(e)}"
         )
-    finally:
-        file.file.close()
-    
-    # Get file size
-    file_size = os.path.getsize(file_location)
-    
-    # Create document record
-    db_document = DocumentModel(
-        id=str(uuid.uuid4()),
-        filename=file.filename,
-        file_path=file_location,
-        file_type=file_ext,
-        file_size=file_size,
-        mime_type=file.content_type,
-        status=DocumentStatus.UPLOADED,
-        document_type=document_type,
-        owner_id=current_user.id
-    )
     
-    db.add(db_document)
+    # Move it into storage (identical files share one copy) and record it
+    db_document = await store_document(
+        db,
+        owner_id=current_user.id,
+        temp_path=upload.temp_path,
+        filename=upload.filename,
+        size=upload.size,
+        content_hash=upload.content_hash,
+        mime_type=upload.content_type,
+        document_type=document_type
+    )
     db.commit()
     db.refresh(db_document)
+    render_upload_previews(db_document)
     
     return db_document
 
@@ -120,13 +240,23 @@ async def delete_document(
             detail="Document not found"
         )
     
-    # Delete file if it exists
-    if document.file_path and os.path.exists(document.file_path):
-        try:
-            os.remove(document.file_path)
-        except Exception as e:
-            # Log error but continue with database deletion
-            print(f"Error deleting file: {str(e)}")
+    if document.storage_key:
+        # Other documents may share the stored file; it is deleted once none refers to it
+        release_reference(db, document.storage_key)
+    else:
+        # Uploaded before storage keys: other documents may share the same copy
+        shared = db.query(DocumentModel.id).filter(
+            DocumentModel.file_path == document.file_path,
+            DocumentModel.id != document.id
+        ).first()
+        
+        # Delete file if it exists
+        if not shared and document.file_path and os.path.exists(document.file_path):
+            try:
+                os.remove(document.file_path)
+            except Exception as e:
+                # Log error but continue with database deletion
+                print(f"Error deleting file: {str(e)}")
     
     # Delete from database
     db.delete(document)
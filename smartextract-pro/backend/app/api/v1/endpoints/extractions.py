@@ -1,38 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Any
+from typing import AsyncIterator, List, Any, Optional
+import json
 
 from app.core.database import get_db
+from app.core.admission import admission_controller
 from app.core.security import get_current_active_user
 from app.models.user import User
-from app.models.extraction import ExtractionJob, ExtractionStatus
+from app.models.extraction import ExtractionJob, ExtractionStatus, ExtractionPage, ExtractionPriority
 from app.services.extraction_service import ExtractionService
-from app.schemas.extraction import ExtractionJobCreate, ExtractionJobResponse, ExtractedDataResponse
+from app.core.config import settings
+from app.worker import enqueue_extraction_job, enqueue_extraction_jobs
+from app.services.token_store import unpack_tokens
+from app.services.template_reapply import TemplateReapplyService
+from app.services.job_events import JobEvent, Subscription, get_job_event_hub
+from app.crud import crud_template
+from app.schemas.extraction import (
+    ExtractionJobCreate,
+    ExtractionJobResponse,
+    ExtractedDataResponse,
+    ExtractionTokensResponse,
+    ExtractionJobBatchCreate,
+    ExtractionJobBatchResponse
+)
 
 router = APIRouter()
 
+EVENTS_SNAPSHOT_LIMIT = 1000  # Active jobs sent when a per-user event stream opens
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Keep proxies from buffering the stream
+PARTIAL_HEADER = "X-Extraction-Partial"  # Set on the data of jobs stopped before all pages were extracted
+
+def _sse(event: str, data: Any) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _event_stream(
+    request: Request,
+    subscription: Subscription,
+    initial: List[JobEvent],
+    single_job: bool
+) -> AsyncIterator[str]:
+    """Send the current state, then every change, until the client leaves (or the single job finishes)"""
+    try:
+        events = initial
+        while True:
+            for event in events:
+                yield _sse("complete" if event.finished else "status", event.as_dict())
+                if single_job and event.finished:
+                    return
+            if await request.is_disconnected():
+                return
+            events = await subscription.next_events(settings.JOB_EVENTS_KEEPALIVE)
+            if not events:
+                yield ": keepalive\n\n"
+    finally:
+        subscription.close()
+
 @router.post("/", response_model=ExtractionJobResponse, status_code=status.HTTP_201_CREATED)
 async def create_extraction_job(
     extraction_job: ExtractionJobCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new extraction job"""
+    # Refuse while the queue is overloaded
+    admission_controller.check_extraction(db, current_user.id)
+    
     try:
         # Create extraction job
         job = ExtractionService.create_extraction_job(
             db=db,
             document_id=extraction_job.document_id,
-            user_id=current_user.id
+            user_id=current_user.id,
+            template_id=extraction_job.template_id,
+            priority=ExtractionPriority(extraction_job.priority.value)
         )
         
-        # Process document in background
-        background_tasks.add_task(
-            ExtractionService.process_document,
-            db=db,
-            job_id=job.id
-        )
+        # Hand the job to the extraction worker processes
+        enqueue_extraction_job(job.id)
         
         return job
     except ValueError as e:
@@ -46,6 +92,44 @@ async def create_extraction_job(
             detail=f"Error creating extraction job: {str(e)}"
         )
 
+@router.post("/batch", response_model=ExtractionJobBatchResponse, status_code=status.HTTP_201_CREATED)
+def create_extraction_jobs(
+    batch: ExtractionJobBatchCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Create extraction jobs for many documents at once"""
+    if len(batch.document_ids) > settings.MAX_BATCH_EXTRACTION_JOBS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.MAX_BATCH_EXTRACTION_JOBS} documents per batch"
+        )
+    
+    # Refuse while the queue is overloaded, admitting the batch as a whole
+    admission_controller.check_extraction(db, current_user.id, len(batch.document_ids))
+    
+    try:
+        jobs = ExtractionService.create_extraction_jobs(
+            db=db,
+            document_ids=batch.document_ids,
+            user_id=current_user.id,
+            template_id=batch.template_id,
+            priority=ExtractionPriority(batch.priority.value)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    
+    # One wake-up for the whole batch
+    enqueue_extraction_jobs([job_id for _, job_id in jobs])
+    
+    return {
+        "count": len(jobs),
+        "jobs": [{"document_id": document_id, "job_id": job_id} for document_id, job_id in jobs],
+    }
+
 @router.get("/", response_model=List[ExtractionJobResponse])
 async def get_extraction_jobs(
     skip: int = 0,
@@ -58,6 +142,37 @@ async def get_extraction_jobs(
         .offset(skip).limit(limit).all()
     return jobs
 
+@router.get("/events")
+async def stream_extraction_events(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream status and progress of the current user's jobs as server-sent events
+    
+    Opens with a `status` event per queued or running job, then sends a
+    `status` event on every change and a `complete` event when a job
+    finishes. Changes are pushed by the workers' database writes; nothing
+    is polled per client.
+    """
+    subscription = get_job_event_hub().subscribe(current_user.id)
+    try:
+        jobs = db.query(ExtractionJob).filter(
+            ExtractionJob.user_id == current_user.id,
+            ExtractionJob.status.in_([ExtractionStatus.PENDING, ExtractionStatus.PROCESSING])
+        ).order_by(ExtractionJob.created_at).limit(EVENTS_SNAPSHOT_LIMIT).all()
+        initial = [JobEvent.from_job(job) for job in jobs]
+    except Exception:
+        subscription.close()
+        raise
+    db.close()  # Do not hold a pooled connection for the life of the stream
+    
+    return StreamingResponse(
+        _event_stream(request, subscription, initial, single_job=False),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @router.get("/{job_id}", response_model=ExtractionJobResponse)
 async def get_extraction_job(
     job_id: str,
@@ -78,13 +193,55 @@ async def get_extraction_job(
     
     return job
 
+@router.get("/{job_id}/events")
+async def stream_extraction_job_events(
+    job_id: str,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream status and progress of one job as server-sent events
+    
+    Sends the current state, a `status` event on every change and a final
+    `complete` event, then closes.
+    """
+    # Subscribe before reading the job, so no change in between is missed
+    subscription = get_job_event_hub().subscribe(current_user.id, job_id)
+    try:
+        job = db.query(ExtractionJob).filter(
+            ExtractionJob.id == job_id,
+            ExtractionJob.user_id == current_user.id
+        ).first()
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Extraction job with ID {job_id} not found"
+            )
+        initial = [JobEvent.from_job(job)]
+    except Exception:
+        subscription.close()
+        raise
+    db.close()  # Do not hold a pooled connection for the life of the stream
+    
+    return StreamingResponse(
+        _event_stream(request, subscription, initial, single_job=True),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
 @router.get("/{job_id}/data", response_model=List[ExtractedDataResponse])
 async def get_extracted_data(
     job_id: str,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get extracted data for a specific job"""
+    """Get extracted data for a specific job
+    
+    Also served for jobs that were cancelled or ran out of time after
+    extracting some pages; their data is marked with the header
+    `X-Extraction-Partial: true`.
+    """
     # Check if job exists and belongs to user
     job = db.query(ExtractionJob).filter(
         ExtractionJob.id == job_id,
@@ -97,12 +254,114 @@ async def get_extracted_data(
             detail=f"Extraction job with ID {job_id} not found"
         )
     
-    # Check if job is completed
-    if job.status != ExtractionStatus.COMPLETED:
+    # Check if job is completed, or was stopped keeping the pages it finished
+    partial = (
+        job.status in (ExtractionStatus.CANCELLED, ExtractionStatus.FAILED)
+        and bool((job.extra_metadata or {}).get("partial"))
+    )
+    if job.status != ExtractionStatus.COMPLETED and not partial:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Extraction job is not completed. Current status: {job.status}"
         )
+    if partial:
+        response.headers[PARTIAL_HEADER] = "true"
     
     # Get extracted data
-    return job.extracted_data
\ No newline at end of file
+    return job.extracted_data
+
+@router.get("/{job_id}/tokens", response_model=ExtractionTokensResponse)
+async def get_extraction_tokens(
+    job_id: str,
+    page: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the words of a job with their boxes and confidences, one list per column and page"""
+    # One query for all pages; the join enforces ownership
+    query = db.query(ExtractionPage).join(ExtractionJob, ExtractionPage.job_id == ExtractionJob.id).filter(
+        ExtractionPage.job_id == job_id,
+        ExtractionJob.user_id == current_user.id
+    )
+    if page is not None:
+        query = query.filter(ExtractionPage.page_number == page)
+    pages = query.order_by(ExtractionPage.page_number).all()
+    
+    if not pages:
+        job_exists = db.query(ExtractionJob.id).filter(
+            ExtractionJob.id == job_id,
+            ExtractionJob.user_id == current_user.id
+        ).first()
+        if not job_exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Extraction job with ID {job_id} not found"
+            )
+    
+    # Built directly: validating every word through the response model would dominate the request
+    return JSONResponse({
+        "job_id": job_id,
+        "pages": [
+            {
+                "page": item.page_number,
+                "source": item.source,
+                "word_count": item.word_count,
+                "words": unpack_tokens(item.tokens),
+            }
+            for item in pages
+        ],
+    })
+
+@router.post("/{job_id}/reapply-template", response_model=ExtractionJobResponse)
+def reapply_template(
+    job_id: str,
+    template_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Match a template (by default the job's own) again against the job's stored words, without OCR"""
+    template = None
+    if template_id is not None:
+        template = crud_template.get_template(db=db, template_id=template_id, owner_id=current_user.id)
+        if not template:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Template not found"
+            )
+    
+    try:
+        return TemplateReapplyService.reapply_job(db=db, job_id=job_id, user_id=current_user.id, template=template)
+    except LookupError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/{job_id}/cancel", response_model=ExtractionJobResponse)
+def cancel_extraction_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Cancel a queued or running extraction job
+    
+    A running job stops at its next page or region and keeps the results
+    extracted so far; until then it is returned with `cancel_requested` set.
+    """
+    try:
+        return ExtractionService.cancel_job(db=db, job_id=job_id, user_id=current_user.id)
+    except LookupError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
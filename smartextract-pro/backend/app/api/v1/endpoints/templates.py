@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from app.core.database import get_db
 from app.core.security import get_current_active_user
@@ -8,6 +8,7 @@ from app.models.user import User
 from app.models.template import Template as TemplateModel
 from app.schemas.template import Template, TemplateCreate, TemplateUpdate, TemplateField, FieldType
 from app.crud import crud_template
+from app.models.extraction import ExtractionJob, ExtractionStatus
 
 router = APIRouter()
 
@@ -82,11 +83,17 @@ async def update_template(
             detail="Template not found"
         )
     
-    return crud_template.update_template(
-        db=db,
-        db_template=db_template,
-        template_in=template_in
-    )
+    try:
+        return crud_template.update_template(
+            db=db,
+            db_template=db_template,
+            template_in=template_in
+        )
+    except crud_template.TemplateConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{str(e)}; reload it and try again"
+        )
 
 @router.delete("/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_template(
@@ -107,5 +114,50 @@ async def delete_template(
             detail="Template not found"
         )
     
-    crud_template.delete_template(db=db, db_template=db_template)
+    try:
+        crud_template.delete_template(db=db, db_template=db_template)
+    except crud_template.TemplateConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{str(e)}; reload it and try again"
+        )
     return None
+
+@router.get("/{template_id}/reapply")
+def reapply_template(
+    template_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+) -> Dict[str, Any]:
+    """
+    Count the completed jobs that re-applying a template would update.
+    
+    Re-applying runs outside the API, with the returned command (see
+    scripts/reapply_template.py): fields are matched again from the words
+    stored with each job, without OCR. Single jobs can be re-applied with
+    POST /extractions/{job_id}/reapply-template.
+    """
+    db_template = crud_template.get_template(
+        db=db,
+        template_id=template_id,
+        owner_id=current_user.id
+    )
+    
+    if not db_template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template not found"
+        )
+    
+    job_count = db.query(ExtractionJob).filter(
+        ExtractionJob.template_id == template_id,
+        ExtractionJob.user_id == current_user.id,
+        ExtractionJob.status == ExtractionStatus.COMPLETED
+    ).count()
+    
+    return {
+        "template_id": template_id,
+        "version": db_template.version,
+        "jobs": job_count,
+        "command": f"python scripts/reapply_template.py {template_id} --user-id {current_user.id}",
+    }
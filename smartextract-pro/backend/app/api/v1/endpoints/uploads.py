@@ -0,0 +1,181 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.core.database import get_db
+from app.core.admission import admission_controller
+from app.core.config import settings
+from app.core.security import get_current_active_user
+from app.models.user import User
+from app.crud import crud_upload_session
+from app.schemas.document import Document
+from app.schemas.upload_session import UploadSession, UploadSessionCreate
+from app.services.previews import render_upload_previews
+from app.services.upload_stream import UploadTooLarge
+from app.services.upload_sessions import (
+    UploadIncomplete,
+    UploadOffsetMismatch,
+    create_session,
+    write_chunk,
+    finalize_session,
+    delete_session
+)
+
+router = APIRouter()
+
+# Chunks are raw bytes, read by write_chunk rather than by FastAPI
+CHUNK_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+    }
+}
+
+def _get_session_or_404(db: Session, session_id: str, user_id: str):
+    upload_session = crud_upload_session.get_session(db=db, session_id=session_id, user_id=user_id)
+    if not upload_session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found"
+        )
+    return upload_session
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File too large. Maximum size: {settings.RESUMABLE_UPLOAD_MAX_SIZE // (1024 * 1024)}MB"
+    )
+
+@router.get("/", response_model=List[UploadSession])
+def read_upload_sessions(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the unfinished upload sessions of the current user"""
+    return crud_upload_session.get_sessions(db=db, user_id=current_user.id)
+
+@router.post("/", response_model=UploadSession, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    session_in: UploadSessionCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Start a resumable upload
+
+    Send the file in chunks with PUT /uploads/{id}?offset=N, each chunk
+    starting at the session's `offset`. After a failure, GET the session
+    and continue from its `offset`. When `offset` equals `size`, POST
+    /uploads/{id}/finalize to create the document. Sessions without a
+    chunk for UPLOAD_SESSION_TTL seconds are deleted.
+    """
+    if crud_upload_session.count_sessions(db=db, user_id=current_user.id) >= settings.UPLOAD_SESSION_MAX_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.UPLOAD_SESSION_MAX_PER_USER} unfinished uploads allowed"
+        )
+
+    # Refuse while the upload folder is short of space
+    admission_controller.check_upload(session_in.size)
+
+    try:
+        return await create_session(
+            db,
+            user_id=current_user.id,
+            filename=session_in.filename,
+            size=session_in.size,
+            mime_type=session_in.mime_type,
+            document_type=session_in.document_type
+        )
+    except UploadTooLarge:
+        raise _too_large()
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except OSError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Could not start upload: {str(e)}"
+        )
+
+@router.get("/{session_id}", response_model=UploadSession)
+def read_upload_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get an upload session, with the offset to resume from"""
+    return _get_session_or_404(db, session_id, current_user.id)
+
+@router.put("/{session_id}", response_model=UploadSession, openapi_extra=CHUNK_REQUEST_BODY)
+async def upload_chunk(
+    session_id: str,
+    offset: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Write the request body into the file at `offset`
+
+    `offset` may not be past the session's current offset (409 otherwise,
+    with the offset to resume from). Bytes that arrived before a broken
+    connection are kept.
+    """
+    upload_session = _get_session_or_404(db, session_id, current_user.id)
+    try:
+        return await write_chunk(db, upload_session, offset, request)
+    except UploadOffsetMismatch as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(e), "offset": e.offset}
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except OSError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Could not write chunk: {str(e)}"
+        )
+
+@router.post("/{session_id}/finalize", response_model=Document, status_code=status.HTTP_201_CREATED)
+async def finalize_upload_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Create the document of a completely received upload, ending the session"""
+    upload_session = _get_session_or_404(db, session_id, current_user.id)
+    try:
+        document = await finalize_session(db, upload_session)
+    except UploadIncomplete as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found"
+        )
+    except OSError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Could not store upload: {str(e)}"
+        )
+    render_upload_previews(document)
+    return document
+
+@router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_upload_session(
+    session_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Abort an upload, deleting what was received"""
+    upload_session = _get_session_or_404(db, session_id, current_user.id)
+    await delete_session(db, upload_session)
+    return None
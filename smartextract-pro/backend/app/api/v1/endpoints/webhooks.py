@@ -0,0 +1,98 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import get_current_active_user
+from app.models.user import User
+from app.crud import crud_webhook
+from app.services.webhook_outbox import delivery_metrics
+from app.schemas.webhook import (
+    WebhookEndpoint,
+    WebhookEndpointWithSecret,
+    WebhookEndpointCreate,
+    WebhookEndpointUpdate,
+    WebhookMetrics
+)
+
+router = APIRouter()
+
+def _get_endpoint_or_404(db: Session, endpoint_id: str, user_id: str):
+    endpoint = crud_webhook.get_endpoint(db=db, endpoint_id=endpoint_id, user_id=user_id)
+    if not endpoint:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Webhook endpoint not found"
+        )
+    return endpoint
+
+@router.get("/", response_model=List[WebhookEndpoint])
+def read_webhook_endpoints(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get all webhook endpoints of the current user"""
+    return crud_webhook.get_endpoints(db=db, user_id=current_user.id)
+
+@router.post("/", response_model=WebhookEndpointWithSecret, status_code=status.HTTP_201_CREATED)
+def create_webhook_endpoint(
+    endpoint_in: WebhookEndpointCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Register a URL that extraction.completed, .failed, .partial and .cancelled events are posted to
+
+    Events are posted as `{"events": [...]}`, several per request when the
+    receiver has fallen behind. Each request carries an
+    X-SmartExtract-Signature header, `sha256=` followed by the hex
+    HMAC-SHA256 of `<X-SmartExtract-Timestamp>.<body>` keyed with the
+    returned secret, which is only shown here. URLs must lead to public
+    addresses: loopback, private and link-local ones are refused (see
+    WEBHOOK_ALLOWED_HOSTS).
+    """
+    if crud_webhook.count_endpoints(db=db, user_id=current_user.id) >= settings.WEBHOOK_MAX_ENDPOINTS_PER_USER:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.WEBHOOK_MAX_ENDPOINTS_PER_USER} webhook endpoints allowed"
+        )
+    return crud_webhook.create_endpoint(db=db, endpoint_in=endpoint_in, user_id=current_user.id)
+
+@router.get("/metrics", response_model=WebhookMetrics)
+def read_webhook_metrics(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the delivery backlog and lag of the current user's webhook endpoints"""
+    return delivery_metrics(db=db, user_id=current_user.id)
+
+@router.get("/{endpoint_id}", response_model=WebhookEndpoint)
+def read_webhook_endpoint(
+    endpoint_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get a specific webhook endpoint by ID"""
+    return _get_endpoint_or_404(db, endpoint_id, current_user.id)
+
+@router.put("/{endpoint_id}", response_model=WebhookEndpoint)
+def update_webhook_endpoint(
+    endpoint_id: str,
+    endpoint_in: WebhookEndpointUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Update a webhook endpoint; events wait while it is inactive"""
+    endpoint = _get_endpoint_or_404(db, endpoint_id, current_user.id)
+    return crud_webhook.update_endpoint(db=db, db_endpoint=endpoint, endpoint_in=endpoint_in)
+
+@router.delete("/{endpoint_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_webhook_endpoint(
+    endpoint_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Delete a webhook endpoint, dropping its undelivered events"""
+    endpoint = _get_endpoint_or_404(db, endpoint_id, current_user.id)
+    crud_webhook.delete_endpoint(db=db, db_endpoint=endpoint)
+    return None
@@ -0,0 +1,157 @@
+import math
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.extraction import ExtractionJob, ExtractionStatus
+
+logger = logging.getLogger(__name__)
+
+QUEUED_STATUSES = (ExtractionStatus.PENDING, ExtractionStatus.PROCESSING)
+
+
+class QueueStats(NamedTuple):
+    """Backlog and measured throughput of the extraction workers"""
+    queued_jobs: int
+    seconds_per_job: Optional[float]  # None until ADMISSION_MIN_SAMPLES jobs were extracted within the window
+    worker_slots: int  # Jobs the workers run at once
+
+    def seconds_for(self, jobs: int) -> Optional[float]:
+        """Estimated time the workers need for `jobs` average jobs"""
+        if self.seconds_per_job is None:
+            return None
+        return jobs * self.seconds_per_job / self.worker_slots
+
+
+class AdmissionController:
+    """
+    Refuses new work while the system is overloaded.
+
+    Extraction requests are refused while the queue is deeper, or would take
+    longer to drain, than configured. The drain time is estimated from the
+    time the workers actually spent on the jobs they extracted over the last
+    ADMISSION_THROUGHPUT_WINDOW seconds, spread over ADMISSION_WORKER_SLOTS;
+    idle time and results reused from earlier jobs do not count, and with
+    fewer than ADMISSION_MIN_SAMPLES such jobs there is no estimate. Uploads
+    are refused while UPLOAD_FOLDER is short of space. Refusals carry a
+    Retry-After computed from the same estimate: 503 for system-wide
+    overload, 429 when one user's own backlog is too deep.
+    """
+    def __init__(self):
+        self._stats: Optional[QueueStats] = None
+        self._stats_at = 0.0
+        self._lock = threading.Lock()
+
+    def queue_stats(self, db: Session) -> QueueStats:
+        """Current backlog and throughput, measured at most once per ADMISSION_STATS_TTL"""
+        with self._lock:
+            if self._stats is not None and time.monotonic() - self._stats_at < settings.ADMISSION_STATS_TTL:
+                return self._stats
+
+        queued_jobs = db.query(func.count(ExtractionJob.id)).filter(
+            ExtractionJob.status.in_(QUEUED_STATUSES)
+        ).scalar() or 0
+
+        window = settings.ADMISSION_THROUGHPUT_WINDOW
+        jobs, busy_seconds = db.query(func.count(ExtractionJob.id), func.sum(ExtractionJob.processing_seconds)).filter(
+            ExtractionJob.finished_at >= datetime.utcnow() - timedelta(seconds=window),
+            ExtractionJob.processing_seconds.isnot(None)
+        ).one()
+
+        stats = QueueStats(
+            queued_jobs=queued_jobs,
+            seconds_per_job=busy_seconds / jobs if jobs and jobs >= settings.ADMISSION_MIN_SAMPLES else None,
+            worker_slots=max(1, settings.ADMISSION_WORKER_SLOTS or settings.EXTRACTION_WORKERS),
+        )
+        with self._lock:
+            self._stats, self._stats_at = stats, time.monotonic()
+        return stats
+
+    def check_extraction(self, db: Session, user_id: str, job_count: int = 1) -> None:
+        """
+        Admit `job_count` new extraction jobs for a user
+
+        Raises:
+            HTTPException: 503 when the queue is too deep or too slow to drain, 429 when the user's is
+        """
+        stats = self.queue_stats(db)
+
+        max_queued = settings.ADMISSION_MAX_QUEUED_JOBS
+        if max_queued and stats.queued_jobs + job_count > max_queued:
+            excess = stats.queued_jobs + job_count - max_queued
+            self._reject(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                f"Extraction queue is full ({stats.queued_jobs} jobs queued)",
+                stats.seconds_for(excess)
+            )
+
+        max_drain = settings.ADMISSION_MAX_DRAIN_SECONDS
+        drain = stats.seconds_for(stats.queued_jobs + job_count)
+        if max_drain and drain is not None and drain > max_drain:
+            self._reject(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                f"Extraction backlog would take {drain / 60:.0f} minutes to process",
+                drain - max_drain
+            )
+
+        max_per_user = settings.ADMISSION_MAX_QUEUED_JOBS_PER_USER
+        if max_per_user:
+            user_queued = db.query(func.count(ExtractionJob.id)).filter(
+                ExtractionJob.user_id == user_id,
+                ExtractionJob.status.in_(QUEUED_STATUSES)
+            ).scalar() or 0
+            if user_queued + job_count > max_per_user:
+                self._reject(
+                    status.HTTP_429_TOO_MANY_REQUESTS,
+                    f"Too many extraction jobs queued ({user_queued}, limit {max_per_user})",
+                    stats.seconds_for(user_queued + job_count - max_per_user)
+                )
+
+    def check_upload(self, expected_bytes: int = 0) -> None:
+        """
+        Admit an upload of about `expected_bytes`
+
+        Raises:
+            HTTPException: 503 when UPLOAD_FOLDER would drop below ADMISSION_MIN_FREE_DISK_MB
+        """
+        min_free = settings.ADMISSION_MIN_FREE_DISK_MB * 1024 * 1024
+        if not min_free:
+            return
+        try:
+            free = shutil.disk_usage(settings.UPLOAD_FOLDER).free
+        except OSError as e:
+            logger.warning(f"Could not read free space of {settings.UPLOAD_FOLDER}: {e}")
+            return
+        if free - expected_bytes < min_free:
+            self._reject(
+                status.HTTP_503_SERVICE_UNAVAILABLE,
+                "Not enough storage space for new uploads",
+                settings.ADMISSION_DISK_RETRY_AFTER
+            )
+
+    @staticmethod
+    def _reject(status_code: int, message: str, retry_after: Optional[float]) -> None:
+        """Refuse the request, telling the client when to try again"""
+        if retry_after is None:
+            retry_after = settings.ADMISSION_DEFAULT_RETRY_AFTER
+        retry_after = max(1, int(math.ceil(retry_after)))
+        logger.warning(f"Admission refused ({status_code}): {message}, retry after {retry_after}s")
+        raise HTTPException(
+            status_code=status_code,
+            detail={
+                "message": f"{message}. Please try again later.",
+                "retry_after_seconds": retry_after,
+            },
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+admission_controller = AdmissionController()
@@ -32,6 +32,8 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = 10
     DB_POOL_TIMEOUT: int = 30
     DB_POOL_RECYCLE: int = 1800  # 30 minutes
+    BACKGROUND_DB_POOL_SIZE: int = 4  # Connections of background threads (worker loop, webhook dispatcher, job events), apart from requests'
+    BACKGROUND_DB_MAX_OVERFLOW: int = 8  # Webhook deliveries each record their result
     
     # JWT
     ALGORITHM: str = "HS256"
@@ -42,7 +44,106 @@ class Settings(BaseSettings):
     # File Storage
     UPLOAD_FOLDER: str = os.path.join(os.getcwd(), "uploads")
     MAX_CONTENT_LENGTH: int = 50 * 1024 * 1024  # 50MB max file size
+    UPLOAD_IO_WORKERS: int = 4  # Threads uploads are written and hashed on, shared by all concurrent uploads
+    RESUMABLE_UPLOAD_MAX_SIZE: int = 1024 * 1024 * 1024  # 1GB max file size of a resumable upload (/uploads)
+    UPLOAD_SESSION_TTL: int = 24 * 3600  # Seconds an upload session lives after its last chunk
+    UPLOAD_SESSION_MAX_PER_USER: int = 20  # Unfinished upload sessions per user
+    UPLOAD_SESSION_GC_INTERVAL: int = 600  # Seconds between sweeps of expired upload sessions (by extraction workers)
     ALLOWED_EXTENSIONS: set = {"pdf", "png", "jpg", "jpeg", "tiff", "bmp", "docx"}
+    # Stored documents are content-addressed: one copy per distinct file, under its SHA-256 (see app/services/storage.py)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "local")  # local, or directory-object-store (an object store emulated on STORAGE_ROOT)
+    STORAGE_ROOT: str = os.getenv("STORAGE_ROOT", os.path.join(os.getcwd(), "uploads", "objects"))  # Keep on the file system of UPLOAD_FOLDER, so uploads are moved in by rename
+    STORAGE_GC_INTERVAL: int = 600  # Seconds between sweeps of files no document refers to anymore (by extraction workers)
+    STORAGE_GC_GRACE: int = 3600  # Seconds an unreferenced file is kept before it is deleted
+    DOWNLOAD_ACCEL_REDIRECT_PREFIX: str = os.getenv("DOWNLOAD_ACCEL_REDIRECT_PREFIX", "")  # Internal nginx location serving STORAGE_ROOT (e.g. /_storage/): downloads are then sent by nginx ('': by the API)
+    DOWNLOAD_CHUNK_SIZE: int = 256 * 1024  # Bytes read at a time when the API sends a file itself
+    # Previews: page images rendered from documents and stored next to them (see app/services/previews.py)
+    PREVIEW_SIZES: Dict[str, int] = {"thumbnail": 256, "preview": 1280}  # Pixels of the long side, by name
+    PREVIEW_ON_UPLOAD_SIZES: List[str] = ["thumbnail"]  # Previews of the first page rendered right after an upload (others: on first request)
+    PREVIEW_WORKERS: int = 2  # Processes of the API rendering previews
+    PREVIEW_MAX_PENDING: int = 64  # Renders queued or running before requests for missing previews are refused (503)
+    PREVIEW_RENDER_TIMEOUT: float = 30.0  # Seconds a request waits for its preview to be rendered (503 after, while rendering goes on)
+    PREVIEW_JPEG_QUALITY: int = 80
+    MAX_BATCH_EXTRACTION_JOBS: int = 10000  # Documents per POST /extractions/batch request
+    
+    # Extraction Workers
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", os.cpu_count() or 1))  # Default: one process per core
+    EMBEDDED_WORKER: bool = os.getenv("EMBEDDED_WORKER", "True").lower() in ("true", "1", "t", "yes")  # Run a worker inside the API process
+    WORKER_POLL_INTERVAL: float = 2.0  # Seconds between queue polls when idle
+    JOB_LEASE_SECONDS: int = 120  # A PROCESSING job without a heartbeat for this long is re-claimed
+    JOB_HEARTBEAT_INTERVAL: int = 30
+    JOB_MAX_ATTEMPTS: int = 3  # Claims before a repeatedly stuck job is marked FAILED
+    JOB_TIME_BUDGET: float = float(os.getenv("JOB_TIME_BUDGET", 600))  # Seconds a job may run before it is stopped as FAILED, keeping partial results (0: no limit)
+    PAGE_TIME_BUDGET: float = float(os.getenv("PAGE_TIME_BUDGET", 60))  # Seconds OCR of one page or region canvas may take before it is killed (0: no limit)
+    CANCEL_CHECK_INTERVAL: float = 1.0  # Minimum seconds between checks of a running job's cancel flag
+    RESULT_BATCH_SIZE: int = 50  # Finished jobs whose results are written in one transaction
+    RESULT_COMMIT_INTERVAL: float = 0.25  # Seconds a finished job may wait for others before its results are committed
+    
+    # Scheduling: interactive jobs are claimed before bulk ones, and tenants
+    # (users) share the workers fairly, in proportion to their weights
+    TENANT_MAX_CONCURRENT_JOBS: int = int(os.getenv("TENANT_MAX_CONCURRENT_JOBS", 0))  # Jobs one user may have running across all workers (0: no cap)
+    TENANT_CONCURRENCY_LIMITS: Dict[str, int] = {}  # Per-user overrides of TENANT_MAX_CONCURRENT_JOBS, by user id
+    TENANT_WEIGHTS: Dict[str, float] = {}  # Per-user share of the workers relative to the default of 1, by user id
+    BULK_WORKER_SHARE: float = 0.75  # Fraction of a worker's processes bulk jobs may occupy (at least one); the rest stay free for interactive jobs
+    
+    # Job event streams (GET /extractions/events)
+    JOB_EVENTS_POLL_INTERVAL: float = 0.5  # Seconds between looks for changed jobs when the database has no LISTEN/NOTIFY (SQLite)
+    JOB_EVENTS_KEEPALIVE: float = 15.0  # Seconds of silence before a keep-alive comment is sent
+    
+    # Admission control: refuse new work while the system is overloaded (0: no limit)
+    ADMISSION_MAX_QUEUED_JOBS: int = int(os.getenv("ADMISSION_MAX_QUEUED_JOBS", 100000))  # Queued jobs across all users (503)
+    ADMISSION_MAX_QUEUED_JOBS_PER_USER: int = int(os.getenv("ADMISSION_MAX_QUEUED_JOBS_PER_USER", 50000))  # Queued jobs of one user (429)
+    ADMISSION_MAX_DRAIN_SECONDS: float = float(os.getenv("ADMISSION_MAX_DRAIN_SECONDS", 4 * 3600))  # Estimated time to work off the queue (503)
+    ADMISSION_MIN_FREE_DISK_MB: int = int(os.getenv("ADMISSION_MIN_FREE_DISK_MB", 1024))  # Free space to keep in UPLOAD_FOLDER (503)
+    ADMISSION_THROUGHPUT_WINDOW: int = 600  # Seconds of finished jobs the average processing time is measured over
+    ADMISSION_MIN_SAMPLES: int = 10  # Jobs extracted within the window before drain times are estimated (fewer: no drain check)
+    ADMISSION_WORKER_SLOTS: int = int(os.getenv("ADMISSION_WORKER_SLOTS", 0))  # Jobs all workers together run at once (0: EXTRACTION_WORKERS, i.e. a single worker)
+    ADMISSION_STATS_TTL: float = 2.0  # Seconds queue and throughput figures are reused between requests
+    ADMISSION_DISK_RETRY_AFTER: int = 600  # Retry-After when refusing for lack of disk space
+    ADMISSION_DEFAULT_RETRY_AFTER: int = 60  # Retry-After when no throughput has been measured yet
+
+    # Webhooks: extraction events are posted to the endpoints users register (see app/worker/webhooks.py)
+    WEBHOOK_MAX_ENDPOINTS_PER_USER: int = 10
+    WEBHOOK_ALLOWED_HOSTS: List[str] = []  # Hosts webhooks may be sent to although they are not public (loopback, private, link-local addresses are refused otherwise)
+    WEBHOOK_BATCH_SIZE: int = 100  # Events per request when a receiver has fallen behind
+    WEBHOOK_DELIVERY_CONCURRENCY: int = 8  # Requests in flight per dispatcher, at most one per endpoint; also its pooled keep-alive connections
+    WEBHOOK_TIMEOUT: float = 10.0  # Seconds per request
+    WEBHOOK_KEEPALIVE_EXPIRY: float = 60.0  # Seconds an idle connection to a receiver is kept open
+    WEBHOOK_POLL_INTERVAL: float = 1.0  # Seconds between outbox polls when idle
+    WEBHOOK_LEASE_SECONDS: int = 60  # Events being sent are re-sent by another dispatcher after this
+    WEBHOOK_MAX_ATTEMPTS: int = 15  # Requests an event is tried in before it is marked FAILED
+    WEBHOOK_BACKOFF_BASE: float = 2.0  # Seconds an endpoint is backed off after its first failure, doubling with each one
+    WEBHOOK_BACKOFF_MAX: float = 3600.0
+    WEBHOOK_RETENTION_SECONDS: int = 7 * 24 * 3600  # Delivered and failed events are deleted after this
+    WEBHOOK_METRICS_WINDOW: int = 3600  # Seconds of deliveries the lag percentiles are computed over
+
+    # OCR
+    OCR_ENGINE: str = os.getenv("OCR_ENGINE", "auto")  # auto, tesserocr (in-process) or pytesseract (subprocess per call)
+    OCR_LANGUAGE: str = "eng"
+    OCR_PSM: int = 3  # Tesseract page segmentation mode
+    OCR_REGION_PSM: int = 6  # Mode for stitched template field regions (uniform block of text)
+    # Image preprocessing stages per document type or file type (see app/services/preprocessing.py);
+    # a template's own preprocessing takes precedence
+    PREPROCESSING_PROFILES: Dict[str, List[Dict[str, Any]]] = {
+        "default": [{"stage": "binarize", "method": "otsu"}],
+        "receipt": [{"stage": "deskew"}, {"stage": "binarize", "method": "adaptive"}, {"stage": "denoise"}],  # Phone photos
+    }
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_DIR: str = os.path.join(os.getcwd(), "cache", "ocr")
+    OCR_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB
+    TEMPLATE_MATCHER_CACHE_SIZE: int = 256  # Compiled templates kept per process
+    TEMPLATE_REAPPLY_BATCH_SIZE: int = 500  # Jobs re-matched per transaction when re-applying a template
+    TILED_OCR_MIN_PIXELS: int = int(os.getenv("TILED_OCR_MIN_PIXELS", 50 * 1000 * 1000))  # Images this large are decoded, binarized and OCR'd in tiles (0: never)
+    OCR_TILE_SIZE: int = 4096  # Pixels a tile side
+    OCR_TILE_OVERLAP: int = 384  # Pixels neighbouring tiles share; longer words may come out split at a seam
+    PDF_RENDER_DPI: int = 300
+    PDF_TEXT_LAYER_ENABLED: bool = True  # Use a PDF's own text instead of OCR where possible
+    PDF_TEXT_LAYER_MIN_CHARS: int = 20  # Fewer usable characters than this means the page is OCR'd
+    # Pages OCR'd in parallel per job. Each of the EXTRACTION_WORKERS processes runs its own
+    # pool, so a busy worker runs EXTRACTION_WORKERS x PDF_PAGE_WORKERS OCR threads: the default
+    # splits the cores between them (raise it only when there are fewer processes than cores)
+    PDF_PAGE_WORKERS: int = int(os.getenv("PDF_PAGE_WORKERS", max(1, (os.cpu_count() or 1) // max(1, EXTRACTION_WORKERS))))
+    PROGRESS_UPDATE_INTERVAL: float = 1.0  # Minimum seconds between job progress writes
     
     class Config:
         case_sensitive = True
@@ -11,42 +11,61 @@ logger = logging.getLogger(__name__)
 # Determine if we're using SQLite
 is_sqlite = settings.DATABASE_URL.startswith("sqlite")
 
-# Create SQLAlchemy engine with appropriate configuration
-if is_sqlite:
-    # SQLite specific configuration
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        # SQLite doesn't support connection pooling in the same way as other databases
-        poolclass=QueuePool,
-        pool_size=1,  # Minimal pooling for SQLite
-        max_overflow=0
-    )
-    
-    # Add SQLite optimizations
-    @event.listens_for(engine, "connect")
-    def set_sqlite_pragma(dbapi_connection, connection_record):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA journal_mode=WAL")  # Write-Ahead Logging for better concurrency
-        cursor.execute("PRAGMA synchronous=NORMAL")  # Synchronous setting for better performance
-        cursor.execute("PRAGMA foreign_keys=ON")  # Enforce foreign key constraints
-        cursor.close()
+def _create_engine(pool_size: int, max_overflow: int):
+    """Create an engine with its own connection pool, configured for the database in use"""
+    if is_sqlite:
+        # SQLite specific configuration
+        sqlite_engine = create_engine(
+            settings.DATABASE_URL,
+            connect_args={"check_same_thread": False},
+            # SQLite doesn't support connection pooling in the same way as other databases
+            poolclass=QueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT
+        )
         
-else:
+        # Add SQLite optimizations
+        @event.listens_for(sqlite_engine, "connect")
+        def set_sqlite_pragma(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")  # Write-Ahead Logging for better concurrency
+            cursor.execute("PRAGMA synchronous=NORMAL")  # Synchronous setting for better performance
+            cursor.execute("PRAGMA foreign_keys=ON")  # Enforce foreign key constraints
+            cursor.close()
+        
+        return sqlite_engine
+    
     # Configuration for other databases (PostgreSQL, MySQL, etc.)
-    engine = create_engine(
+    return create_engine(
         settings.DATABASE_URL,
-        pool_size=settings.DB_POOL_SIZE,
-        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
         pool_timeout=settings.DB_POOL_TIMEOUT,
         pool_recycle=settings.DB_POOL_RECYCLE,
         pool_pre_ping=True  # Verify connections before using them
     )
 
+# Engine for API requests (minimal pooling for SQLite)
+if is_sqlite:
+    engine = _create_engine(pool_size=1, max_overflow=0)
+else:
+    engine = _create_engine(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW)
+
+# Engine for background threads (extraction worker loop, webhook dispatcher,
+# job event poller), so they never wait for connections held by requests
+# or make requests wait for theirs
+background_engine = _create_engine(
+    pool_size=settings.BACKGROUND_DB_POOL_SIZE, max_overflow=settings.BACKGROUND_DB_MAX_OVERFLOW
+)
+
 # Create a scoped session factory
 SessionLocal = scoped_session(
     sessionmaker(autocommit=False, autoflush=False, bind=engine)
 )
+BackgroundSessionLocal = scoped_session(
+    sessionmaker(autocommit=False, autoflush=False, bind=background_engine)
+)
 
 # Base class for all models
 Base = declarative_base()
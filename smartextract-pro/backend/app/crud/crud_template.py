@@ -1,7 +1,13 @@
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from app.models.template import Template as TemplateModel
+from app.models.extraction import ExtractionJob
 from app.schemas.template import TemplateCreate, TemplateUpdate
+from app.services.template_matcher import template_matcher_cache
+
+class TemplateConflict(Exception):
+    """The template was updated or deleted by another request since it was read"""
 
 def get_template(db: Session, template_id: str, owner_id: str) -> Optional[TemplateModel]:
     """Get a template by ID for a specific owner"""
@@ -45,19 +51,46 @@ def update_template(
     db_template: TemplateModel,
     template_in: TemplateUpdate
 ) -> TemplateModel:
-    """Update an existing template"""
+    """Update an existing template
+    
+    Raises:
+        TemplateConflict: Another request updated or deleted it first
+    """
+    template_id = db_template.id
     update_data = template_in.dict(exclude_unset=True)
     
     for field, value in update_data.items():
         setattr(db_template, field, value)
         
     db.add(db_template)
-    db.commit()
+    try:
+        db.commit()
+    except StaleDataError:
+        # The version read is no longer the current one
+        db.rollback()
+        raise TemplateConflict(f"Template {template_id} was changed concurrently")
     db.refresh(db_template)
+    
+    # The new version gets a new cache key everywhere; drop the old one here
+    template_matcher_cache.invalidate(db_template.id)
     return db_template
 
 def delete_template(db: Session, db_template: TemplateModel) -> bool:
-    """Delete a template"""
+    """Delete a template; jobs that used it keep their results, without the template
+    
+    Raises:
+        TemplateConflict: Another request updated or deleted it first
+    """
+    template_id = db_template.id
+    # Also done by the foreign key (ON DELETE SET NULL), except in databases created before it
+    db.query(ExtractionJob).filter(ExtractionJob.template_id == template_id).update(
+        {ExtractionJob.template_id: None}, synchronize_session=False
+    )
     db.delete(db_template)
-    db.commit()
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise TemplateConflict(f"Template {template_id} was changed concurrently")
+    template_matcher_cache.invalidate(template_id)
     return True
@@ -0,0 +1,20 @@
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from app.models.upload_session import UploadSession
+
+def get_session(db: Session, session_id: str, user_id: str) -> Optional[UploadSession]:
+    """Get an upload session by ID for a specific user"""
+    return db.query(UploadSession).filter(
+        UploadSession.id == session_id,
+        UploadSession.user_id == user_id
+    ).first()
+
+def get_sessions(db: Session, user_id: str) -> List[UploadSession]:
+    """Get the unfinished upload sessions of a user"""
+    return db.query(UploadSession).filter(
+        UploadSession.user_id == user_id
+    ).order_by(UploadSession.created_at).all()
+
+def count_sessions(db: Session, user_id: str) -> int:
+    """Count the unfinished upload sessions of a user"""
+    return db.query(UploadSession).filter(UploadSession.user_id == user_id).count()
@@ -0,0 +1,68 @@
+import secrets
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from app.models.webhook import WebhookEndpoint, WebhookOutbox
+from app.schemas.webhook import WebhookEndpointCreate, WebhookEndpointUpdate
+
+def get_endpoint(db: Session, endpoint_id: str, user_id: str) -> Optional[WebhookEndpoint]:
+    """Get a webhook endpoint by ID for a specific user"""
+    return db.query(WebhookEndpoint).filter(
+        WebhookEndpoint.id == endpoint_id,
+        WebhookEndpoint.user_id == user_id
+    ).first()
+
+def get_endpoints(db: Session, user_id: str) -> List[WebhookEndpoint]:
+    """Get all webhook endpoints of a user"""
+    return db.query(WebhookEndpoint).filter(
+        WebhookEndpoint.user_id == user_id
+    ).order_by(WebhookEndpoint.created_at).all()
+
+def count_endpoints(db: Session, user_id: str) -> int:
+    """Count the webhook endpoints of a user"""
+    return db.query(WebhookEndpoint).filter(WebhookEndpoint.user_id == user_id).count()
+
+def create_endpoint(db: Session, endpoint_in: WebhookEndpointCreate, user_id: str) -> WebhookEndpoint:
+    """Create a webhook endpoint with a new signing secret"""
+    db_endpoint = WebhookEndpoint(
+        url=str(endpoint_in.url),
+        description=endpoint_in.description,
+        is_active=endpoint_in.is_active,
+        secret=f"whsec_{secrets.token_urlsafe(32)}",
+        user_id=user_id
+    )
+    db.add(db_endpoint)
+    db.commit()
+    db.refresh(db_endpoint)
+    return db_endpoint
+
+def update_endpoint(
+    db: Session,
+    db_endpoint: WebhookEndpoint,
+    endpoint_in: WebhookEndpointUpdate
+) -> WebhookEndpoint:
+    """Update a webhook endpoint; a changed URL or re-activation ends any backoff"""
+    update_data = endpoint_in.dict(exclude_unset=True)
+    if "url" in update_data:
+        update_data["url"] = str(update_data["url"])
+
+    if update_data.get("url", db_endpoint.url) != db_endpoint.url or (
+        update_data.get("is_active") and not db_endpoint.is_active
+    ):
+        db_endpoint.failure_count = 0
+        db_endpoint.retry_after = None
+
+    for field, value in update_data.items():
+        setattr(db_endpoint, field, value)
+
+    db.add(db_endpoint)
+    db.commit()
+    db.refresh(db_endpoint)
+    return db_endpoint
+
+def delete_endpoint(db: Session, db_endpoint: WebhookEndpoint) -> None:
+    """Delete a webhook endpoint and its undelivered and past events"""
+    db.query(WebhookOutbox).filter(
+        WebhookOutbox.endpoint_id == db_endpoint.id
+    ).delete(synchronize_session=False)
+    db.delete(db_endpoint)
+    db.commit()
@@ -7,6 +7,9 @@ from app.core.security_middleware import setup_security_middleware
 from app.core.rate_limiter import create_rate_limiter
 from app.core.error_handlers import setup_exception_handlers
 from app.core.csrf_middleware import setup_csrf_middleware
+from app.worker import start_embedded_worker, stop_embedded_worker, start_webhook_dispatcher, stop_webhook_dispatcher
+from app.services.job_events import get_job_event_hub
+from app.services.previews import preview_renderer
 import uvicorn
 import logging
 
@@ -54,6 +57,20 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.on_event("startup")
+async def start_extraction_workers():
+    # Dedicated deployments run `python -m app.worker` instead
+    if settings.EMBEDDED_WORKER:
+        start_embedded_worker()
+        start_webhook_dispatcher()
+
+@app.on_event("shutdown")
+async def stop_extraction_workers():
+    stop_embedded_worker()
+    stop_webhook_dispatcher()
+    get_job_event_hub().stop()
+    preview_renderer.stop()
+
 
 
 # Include API router
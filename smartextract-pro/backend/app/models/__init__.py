@@ -2,8 +2,11 @@
 from app.db.database import Base
 from .user import User
 from .document import Document
-from .extraction import ExtractionJob, ExtractedData
+from .extraction import ExtractionJob, ExtractedData, ExtractionPage, ExtractionPriority
 from .template import Template
+from .webhook import WebhookEndpoint, WebhookOutbox, WebhookDeliveryStatus
+from .upload_session import UploadSession
+from .stored_file import StoredFile
 
 # Make models available for SQLAlchemy
 __all__ = [
@@ -11,5 +14,12 @@ __all__ = [
     'Document',
     'ExtractionJob',
     'ExtractedData',
-    'Template'
+    'ExtractionPage',
+    'ExtractionPriority',
+    'Template',
+    'WebhookEndpoint',
+    'WebhookOutbox',
+    'WebhookDeliveryStatus',
+    'UploadSession',
+    'StoredFile'
 ]
@@ -23,10 +23,12 @@ class Document(Base):
     
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     filename = Column(String(255), nullable=False)
-    file_path = Column(String(512), nullable=False)
+    storage_key = Column(String(255), nullable=True, index=True)  # Where the file is stored, see app/services/storage.py
+    file_path = Column(String(512), nullable=True)  # Absolute path of files uploaded before storage keys (scripts/migrate_storage.py moves them)
     file_type = Column(String(50), nullable=False)
     file_size = Column(Integer, nullable=False)
     mime_type = Column(String(100), nullable=True)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the file contents
     status = Column(Enum(DocumentStatus), default=DocumentStatus.UPLOADED)
     document_type = Column(Enum(DocumentType), default=DocumentType.OTHER)
     extra_metadata = Column(JSON, nullable=True)  # ✅ renamed to avoid conflict
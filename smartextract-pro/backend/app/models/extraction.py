@@ -1,6 +1,6 @@
 import enum
 import uuid
-from sqlalchemy import Column, String, Text, Enum, Float, ForeignKey, JSON, Boolean, DateTime, func
+from sqlalchemy import Column, String, Text, Enum, Float, ForeignKey, JSON, Boolean, DateTime, Integer, Index, LargeBinary, UniqueConstraint, func, false
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -10,6 +10,11 @@ class ExtractionStatus(str, enum.Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     PARTIAL = "partial"
+    CANCELLED = "cancelled"
+
+class ExtractionPriority(str, enum.Enum):
+    INTERACTIVE = "interactive"  # A user waiting on the result
+    BULK = "bulk"  # Backfills and batch loads
 
 class ExtractionJob(Base):
     """Model for tracking extraction jobs"""
@@ -18,17 +23,41 @@ class ExtractionJob(Base):
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     status = Column(Enum(ExtractionStatus), default=ExtractionStatus.PENDING)
     progress = Column(Float, default=0.0)  # 0 to 100
+    priority = Column(
+        Enum(ExtractionPriority), default=ExtractionPriority.INTERACTIVE, server_default="INTERACTIVE", nullable=False
+    )
     error_message = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, default=False, server_default=false(), nullable=False)  # Checked by the worker between pages
     extra_metadata = Column(JSON, nullable=True)  # ✅ renamed to avoid reserved name
+    pipeline_key = Column(String(64), nullable=True, index=True)  # Hash of the extraction settings used
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
     
+    # Queue lease (see app/worker/queue.py)
+    lease_owner = Column(String(128), nullable=True)  # Worker currently holding the job
+    lease_expires_at = Column(DateTime, nullable=True)  # UTC; job can be re-claimed after this
+    heartbeat_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    
+    # Worker time, measured for admission control (see app/core/admission.py)
+    finished_at = Column(DateTime, nullable=True, index=True)  # UTC
+    processing_seconds = Column(Float, nullable=True)  # Time spent extracting; None when nothing was extracted (reused results, errors up front)
+    
     # Relationships
     document_id = Column(String(36), ForeignKey("documents.id"), nullable=False)
     document = relationship("Document", back_populates="extractions")
     user_id = Column(String(36), ForeignKey("users.id"), nullable=False)
     user = relationship("User", back_populates="extraction_jobs")
+    template_id = Column(String(36), ForeignKey("templates.id", ondelete="SET NULL"), nullable=True)  # NULL once the template is deleted
+    template = relationship("Template")
     extracted_data = relationship("ExtractedData", back_populates="job", cascade="all, delete-orphan")
+    pages = relationship(
+        "ExtractionPage", back_populates="job", cascade="all, delete-orphan", order_by="ExtractionPage.page_number"
+    )
+    
+    __table_args__ = (
+        Index("ix_extraction_jobs_status_created_at", "status", "created_at"),
+    )
     
     def __repr__(self):
         return f"<ExtractionJob {self.id} ({self.status})>"
@@ -54,3 +83,28 @@ class ExtractedData(Base):
     
     def __repr__(self):
         return f"<ExtractedData {self.field_name}={self.extracted_value[:50]}...>"
+
+
+class ExtractionPage(Base):
+    """Word-level OCR output of one page, packed (see app/services/token_store.py)"""
+    __tablename__ = "extraction_pages"
+    
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    page_number = Column(Integer, nullable=False)  # 1-based
+    source = Column(String(20), nullable=False)  # ocr, ocr_cache, text_layer or regions
+    width = Column(Integer, nullable=True)  # Page size in pixels, the coordinate space of the words
+    height = Column(Integer, nullable=True)
+    word_count = Column(Integer, nullable=False, default=0)
+    tokens = Column(LargeBinary, nullable=False)  # Compressed columnar words, boxes and confidences
+    created_at = Column(DateTime, default=func.now(), nullable=False, index=True)
+    
+    # Relationships
+    job_id = Column(String(36), ForeignKey("extraction_jobs.id"), nullable=False)
+    job = relationship("ExtractionJob", back_populates="pages")
+    
+    __table_args__ = (
+        UniqueConstraint("job_id", "page_number", name="uq_extraction_pages_job_page"),
+    )
+    
+    def __repr__(self):
+        return f"<ExtractionPage {self.job_id} page {self.page_number} ({self.word_count} words)>"
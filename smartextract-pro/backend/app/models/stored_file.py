@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, Integer, DateTime, Index, func
+from app.db.database import Base
+
+class StoredFile(Base):
+    """
+    A file in document storage and how many documents refer to it.
+
+    Files are content-addressed, so identical uploads share one stored file;
+    it is deleted some time after its last document (see
+    app/services/content_store.py).
+    """
+    __tablename__ = "stored_files"
+
+    key = Column(String(255), primary_key=True)  # Storage key, see app/services/storage.py
+    size = Column(Integer, nullable=False)
+    refcount = Column(Integer, default=0, server_default="0", nullable=False)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    updated_at = Column(DateTime, default=func.now(), nullable=False)  # UTC; last change of refcount
+
+    __table_args__ = (
+        # Sweep of unreferenced files
+        Index("ix_stored_files_refcount_updated_at", "refcount", "updated_at"),
+    )
+
+    def __repr__(self):
+        return f"<StoredFile {self.key} ({self.refcount} refs)>"
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Text, JSON, ForeignKey, DateTime, func, Enum
+from sqlalchemy import Column, String, Text, JSON, ForeignKey, DateTime, Integer, func, Enum
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 from app.models.document import DocumentType
@@ -13,6 +13,9 @@ class Template(Base):
     description = Column(Text, nullable=True)
     document_type = Column(Enum(DocumentType), nullable=False, default=DocumentType.OTHER)
     fields = Column(JSON, nullable=False)  # Store template field definitions
+    anchors = Column(JSON, nullable=True)  # Fixed text used to align pages for region extraction
+    preprocessing = Column(JSON, nullable=True)  # Image preprocessing stages; None uses the configured profile
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Incremented on every update
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
     
@@ -20,5 +23,7 @@ class Template(Base):
     owner_id = Column(String(36), ForeignKey("users.id"), nullable=False)
     owner = relationship("User", back_populates="templates")
     
+    __mapper_args__ = {"version_id_col": version}
+    
     def __repr__(self):
         return f"<Template {self.name} ({self.document_type})>"
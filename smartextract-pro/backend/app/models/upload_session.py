@@ -0,0 +1,30 @@
+import uuid
+from sqlalchemy import Column, String, Enum, ForeignKey, Integer, DateTime, func
+from sqlalchemy.orm import relationship
+from app.db.database import Base
+from .document import DocumentType
+
+class UploadSession(Base):
+    """
+    A resumable upload in progress: the file is received in chunks into a
+    preallocated file and becomes a document when finalized
+    """
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    filename = Column(String(255), nullable=False)
+    mime_type = Column(String(100), nullable=True)
+    document_type = Column(Enum(DocumentType), default=DocumentType.OTHER)
+    size = Column(Integer, nullable=False)  # Declared file size
+    offset = Column("upload_offset", Integer, default=0, server_default="0", nullable=False)  # Bytes received without gaps
+    temp_path = Column(String(512), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)  # UTC; deleted with its file after this
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+
+    # Relationships
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
+    user = relationship("User")
+
+    def __repr__(self):
+        return f"<UploadSession {self.filename} ({self.offset}/{self.size})>"
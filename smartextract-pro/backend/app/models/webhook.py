@@ -0,0 +1,68 @@
+import enum
+import uuid
+from sqlalchemy import Column, String, Text, Enum, ForeignKey, JSON, Boolean, DateTime, Integer, Index, func, true
+from sqlalchemy.orm import relationship
+from app.db.database import Base
+
+class WebhookDeliveryStatus(str, enum.Enum):
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"  # Given up after WEBHOOK_MAX_ATTEMPTS
+
+class WebhookEndpoint(Base):
+    """URL a user's extraction events are posted to"""
+    __tablename__ = "webhook_endpoints"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    url = Column(String(2048), nullable=False)
+    description = Column(String(255), nullable=True)
+    secret = Column(String(128), nullable=False)  # Key of the request signatures
+    is_active = Column(Boolean, default=True, server_default=true(), nullable=False)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+
+    # Delivery state (see app/worker/webhooks.py)
+    failure_count = Column(Integer, default=0, server_default="0", nullable=False)  # Failed requests in a row
+    retry_after = Column(DateTime, nullable=True)  # UTC; no requests before this while backing off
+    last_error = Column(Text, nullable=True)
+
+    # Relationships
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
+    user = relationship("User")
+
+    def __repr__(self):
+        return f"<WebhookEndpoint {self.url}>"
+
+class WebhookOutbox(Base):
+    """
+    A webhook event for one endpoint, written in the transaction that
+    produced it and delivered from there
+    """
+    __tablename__ = "webhook_outbox"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    event = Column(String(50), nullable=False)  # e.g. extraction.completed
+    payload = Column(JSON, nullable=False)
+    status = Column(
+        Enum(WebhookDeliveryStatus), default=WebhookDeliveryStatus.PENDING, server_default="PENDING", nullable=False
+    )
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    delivered_at = Column(DateTime, nullable=True)
+
+    # Delivery lease, so several dispatchers never send the same event at once
+    lease_owner = Column(String(128), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    endpoint_id = Column(String(36), ForeignKey("webhook_endpoints.id"), nullable=False)
+    endpoint = relationship("WebhookEndpoint")
+    job_id = Column(String(36), nullable=True)  # Extraction job the event is about
+
+    __table_args__ = (
+        Index("ix_webhook_outbox_status_endpoint_created_at", "status", "endpoint_id", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<WebhookOutbox {self.event} ({self.status})>"
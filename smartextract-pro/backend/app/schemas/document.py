@@ -31,10 +31,11 @@ class DocumentUpdate(BaseModel):
 
 class DocumentInDBBase(DocumentBase):
     id: str
-    file_path: str
+    storage_key: Optional[str] = None
     file_type: str
     file_size: int
     mime_type: Optional[str] = None
+    content_hash: Optional[str] = None
     status: DocumentStatus = DocumentStatus.UPLOADED
     extra_metadata: Optional[Dict[str, Any]] = None
     owner_id: str
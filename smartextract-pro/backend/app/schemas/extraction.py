@@ -9,9 +9,16 @@ class ExtractionStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
     PARTIAL = "partial"
+    CANCELLED = "cancelled"
+
+class ExtractionPriority(str, Enum):
+    INTERACTIVE = "interactive"
+    BULK = "bulk"
 
 class ExtractionJobBase(BaseModel):
     document_id: str
+    template_id: Optional[str] = None
+    priority: ExtractionPriority = ExtractionPriority.INTERACTIVE
 
 class ExtractionJobCreate(ExtractionJobBase):
     pass
@@ -26,6 +33,7 @@ class ExtractionJobInDBBase(ExtractionJobBase):
     status: ExtractionStatus
     progress: float = 0.0
     error_message: Optional[str] = None
+    cancel_requested: bool = False
     extra_metadata: Optional[Dict[str, Any]] = None
     user_id: str
     created_at: datetime
@@ -59,4 +67,27 @@ class ExtractedDataInDBBase(ExtractedDataBase):
         orm_mode = True
 
 class ExtractedDataResponse(ExtractedDataInDBBase):
-    pass
\ No newline at end of file
+    pass
+class PageTokens(BaseModel):
+    """Word-level OCR output of one page, one list per column"""
+    page: int
+    source: str
+    word_count: int
+    words: Dict[str, List[Any]]  # text, left, top, width, height, conf, block_num, par_num, line_num
+
+class ExtractionTokensResponse(BaseModel):
+    job_id: str
+    pages: List[PageTokens]
+
+class ExtractionJobBatchCreate(BaseModel):
+    document_ids: List[str] = Field(..., min_items=1)  # At most MAX_BATCH_EXTRACTION_JOBS
+    template_id: Optional[str] = None
+    priority: ExtractionPriority = ExtractionPriority.BULK
+
+class BatchJob(BaseModel):
+    document_id: str
+    job_id: str
+
+class ExtractionJobBatchResponse(BaseModel):
+    count: int
+    jobs: List[BatchJob]
@@ -1,5 +1,6 @@
+import re
 from pydantic import BaseModel, Field, validator
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
 from enum import Enum
 from app.schemas.document import DocumentType
@@ -11,6 +12,37 @@ class FieldType(str, Enum):
     SELECT = "select"
     CHECKBOX = "checkbox"
 
+class FieldRegion(BaseModel):
+    """Bounding box on a page, normalized to the page size (0 to 1)"""
+    x: float = Field(..., ge=0, le=1)
+    y: float = Field(..., ge=0, le=1)
+    width: float = Field(..., gt=0, le=1)
+    height: float = Field(..., gt=0, le=1)
+    page: int = Field(1, ge=1)
+
+class TemplateAnchor(BaseModel):
+    """Fixed text on the form used to align scanned pages with the template"""
+    text: str = Field(..., min_length=1)
+    region: FieldRegion  # Where the text is expected on the page
+    search_margin: float = Field(0.05, ge=0, le=0.5)  # How far around the region to look
+
+class PreprocessingStage(BaseModel):
+    """One image preprocessing stage; unset parameters take the stage defaults"""
+    stage: Literal["decode", "resample", "deskew", "binarize", "denoise"]
+    reduce: Optional[int] = None  # decode: 1, 2, 4 or 8
+    dpi: Optional[int] = Field(None, ge=72, le=1200)  # resample: target resolution
+    source_dpi: Optional[int] = Field(None, ge=72, le=2400)  # resample: resolution of scanned images
+    max_angle: Optional[float] = Field(None, gt=0, le=45)  # deskew
+    method: Optional[Literal["otsu", "adaptive", "fixed"]] = None  # binarize
+    threshold: Optional[int] = Field(None, ge=0, le=255)  # binarize (fixed)
+    block_size: Optional[int] = Field(None, ge=3)  # binarize (adaptive), odd
+    c: Optional[int] = None  # binarize (adaptive)
+    invert: Optional[bool] = None  # binarize
+    size: Optional[int] = Field(None, ge=3)  # denoise: median aperture, odd
+    
+    class Config:
+        extra = "forbid"
+
 class TemplateField(BaseModel):
     """Schema for a single field in a template"""
     name: str
@@ -20,12 +52,45 @@ class TemplateField(BaseModel):
     options: Optional[List[str]] = None
     default: Optional[Any] = None
     description: Optional[str] = None
+    region: Optional[FieldRegion] = None  # Only this part of the page is recognized
+    pattern: Optional[str] = None  # Regex for the value; group 1 is used when present
+    keywords: Optional[List[str]] = None  # Text printed before the value (default: the label)
+
+def _validate_field_regions(fields: Optional[List[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+    """Check the optional region and pattern of each field definition"""
+    for field in fields or []:
+        if field.get("region") is not None:
+            field["region"] = FieldRegion(**field["region"]).dict()
+        if field.get("pattern"):
+            try:
+                re.compile(field["pattern"])
+            except re.error as e:
+                raise ValueError(f"Invalid pattern for field {field.get('name')}: {e}")
+    return fields
+
+def _validate_preprocessing(stages: Optional[List[PreprocessingStage]]) -> Optional[List[PreprocessingStage]]:
+    """Check that stages are listed once and apertures are odd"""
+    names = [stage.stage for stage in stages or []]
+    if len(names) != len(set(names)):
+        raise ValueError("Each preprocessing stage may only be listed once")
+    for stage in stages or []:
+        for value in (stage.block_size, stage.size):
+            if value is not None and value % 2 == 0:
+                raise ValueError(f"{stage.stage}: block_size and size must be odd")
+        if stage.reduce is not None and stage.reduce not in (1, 2, 4, 8):
+            raise ValueError("decode: reduce must be 1, 2, 4 or 8")
+    return stages
 
 class TemplateBase(BaseModel):
     name: str = Field(..., min_length=3, max_length=255)
     description: Optional[str] = None
     document_type: DocumentType = DocumentType.OTHER
     fields: List[Dict[str, Any]]  # List of field definitions
+    anchors: Optional[List[TemplateAnchor]] = None
+    preprocessing: Optional[List[PreprocessingStage]] = None
+    
+    _check_regions = validator('fields', allow_reuse=True)(_validate_field_regions)
+    _check_preprocessing = validator('preprocessing', allow_reuse=True)(_validate_preprocessing)
 
 class TemplateCreate(TemplateBase):
     pass
@@ -35,9 +100,15 @@ class TemplateUpdate(BaseModel):
     description: Optional[str] = None
     document_type: Optional[DocumentType] = None
     fields: Optional[List[Dict[str, Any]]] = None
+    anchors: Optional[List[TemplateAnchor]] = None
+    preprocessing: Optional[List[PreprocessingStage]] = None
+    
+    _check_regions = validator('fields', allow_reuse=True)(_validate_field_regions)
+    _check_preprocessing = validator('preprocessing', allow_reuse=True)(_validate_preprocessing)
 
 class TemplateInDBBase(TemplateBase):
     id: str
+    version: int = 1
     owner_id: str
     created_at: datetime
     updated_at: datetime
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+from .document import DocumentType
+
+class UploadSessionCreate(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    size: int = Field(..., ge=0)  # Bytes the file will have
+    mime_type: Optional[str] = Field(None, max_length=100)
+    document_type: DocumentType = DocumentType.OTHER
+
+class UploadSession(BaseModel):
+    id: str
+    filename: str
+    mime_type: Optional[str] = None
+    document_type: DocumentType = DocumentType.OTHER
+    size: int
+    offset: int  # Bytes received so far; the next chunk starts here
+    expires_at: datetime  # Deleted unless a chunk arrives before then
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
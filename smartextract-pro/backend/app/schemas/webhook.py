@@ -0,0 +1,64 @@
+from pydantic import BaseModel, AnyHttpUrl, Field, validator
+from typing import Optional, List
+from datetime import datetime
+
+from app.services.webhook_destinations import check_url
+
+def _validate_destination(url):
+    """Refuse URLs on loopback, private or link-local addresses (hosts are checked again on every delivery)"""
+    if url is not None:
+        check_url(str(url))
+    return url
+
+class WebhookEndpointBase(BaseModel):
+    url: AnyHttpUrl
+    description: Optional[str] = Field(None, max_length=255)
+    is_active: bool = True
+
+    _check_url = validator('url', allow_reuse=True)(_validate_destination)
+
+class WebhookEndpointCreate(WebhookEndpointBase):
+    pass
+
+class WebhookEndpointUpdate(BaseModel):
+    url: Optional[AnyHttpUrl] = None
+    description: Optional[str] = Field(None, max_length=255)
+    is_active: Optional[bool] = None
+
+    _check_url = validator('url', allow_reuse=True)(_validate_destination)
+
+class WebhookEndpoint(WebhookEndpointBase):
+    id: str
+    failure_count: int = 0  # Failed requests in a row
+    retry_after: Optional[datetime] = None  # Backing off until then
+    last_error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class WebhookEndpointWithSecret(WebhookEndpoint):
+    """Returned on creation only: requests are signed with this secret"""
+    secret: str
+
+class WebhookEndpointMetrics(BaseModel):
+    endpoint_id: str
+    url: str
+    is_active: bool
+    pending: int  # Events waiting for delivery
+    oldest_pending_seconds: float  # Current delivery lag
+    failed: int  # Events given up on
+    delivered: int  # Within the window
+    latency_p50_seconds: Optional[float] = None  # Event to delivery, within the window
+    latency_p95_seconds: Optional[float] = None
+    latency_max_seconds: Optional[float] = None
+    consecutive_failures: int
+    retry_after: Optional[datetime] = None
+    last_error: Optional[str] = None
+
+class WebhookMetrics(BaseModel):
+    window_seconds: int
+    pending: int
+    oldest_pending_seconds: float
+    endpoints: List[WebhookEndpointMetrics]
@@ -0,0 +1,136 @@
+import os
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.document import Document
+from ..models.stored_file import StoredFile
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Unreferenced files looked at per sweep
+GC_BATCH_SIZE = 500
+
+
+def reserve_reference(db: Session, key: str, size: int) -> None:
+    """
+    Record the file under `key` before it is stored (see put_content), and
+    commit that, along with anything else pending in `db`.
+
+    The row is added without references, or its count kept, and marked as
+    just updated: the sweep leaves the file alone for STORAGE_GC_GRACE
+    seconds, time to store it and commit the documents referring to it
+    (add_reference). Should that commit fail, the stored file is deleted by
+    the sweep like any other unreferenced one.
+    """
+    now = datetime.utcnow()
+    if not _change_refcount(db, key, 0, now):
+        try:
+            with db.begin_nested():
+                db.add(StoredFile(key=key, size=size, refcount=0, created_at=now, updated_at=now))
+        except IntegrityError:
+            # Added by a concurrent upload of the same contents
+            _change_refcount(db, key, 0, now)
+    db.commit()
+
+
+def add_reference(db: Session, key: str, size: int) -> None:
+    """
+    Count one more document referring to the file under `key`, reserved with
+    reserve_reference. Not committed.
+    """
+    now = datetime.utcnow()
+    if _change_refcount(db, key, 1, now):
+        return
+    try:
+        with db.begin_nested():
+            db.add(StoredFile(key=key, size=size, refcount=1, created_at=now, updated_at=now))
+    except IntegrityError:
+        _change_refcount(db, key, 1, now)
+
+
+def release_reference(db: Session, key: str) -> None:
+    """
+    Count one document less referring to the file under `key`. The file is
+    deleted by the sweep once no document refers to it for STORAGE_GC_GRACE
+    seconds. Not committed.
+    """
+    _change_refcount(db, key, -1, datetime.utcnow())
+
+
+def _change_refcount(db: Session, key: str, delta: int, now: datetime) -> bool:
+    result = db.execute(
+        update(StoredFile)
+        .where(StoredFile.key == key)
+        .values({StoredFile.refcount: StoredFile.refcount + delta, StoredFile.updated_at: now})
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+def put_content(key: str, source_path: str) -> None:
+    """
+    Store a file under its content key, taking it over. When the key already
+    exists the stored copy is kept and the file dropped. Blocking I/O.
+    """
+    storage = get_storage()
+    if storage.exists(key):
+        os.remove(source_path)
+    else:
+        storage.put(key, source_path)
+
+
+@contextmanager
+def document_file(document: Document) -> Iterator[str]:
+    """A local path to read a document's file from for the duration of the block"""
+    if document.storage_key:
+        with get_storage().local_path(document.storage_key) as path:
+            yield path
+    else:
+        yield document.file_path  # Uploaded before storage keys
+
+
+def collect_unreferenced_files(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete stored files no document referred to for STORAGE_GC_GRACE seconds; returns how many"""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.STORAGE_GC_GRACE)
+    candidates = db.query(StoredFile.key).filter(
+        StoredFile.refcount <= 0,
+        StoredFile.updated_at < cutoff
+    ).limit(GC_BATCH_SIZE).all()
+
+    storage = get_storage()
+    deleted = 0
+    for (key,) in candidates:
+        # A new reference may have been added since the key was read. The
+        # deleted row stays locked until the commit, so an upload of the
+        # same contents waits for the file to be gone and stores it anew.
+        if not db.query(StoredFile).filter(
+            StoredFile.key == key,
+            StoredFile.refcount <= 0,
+            StoredFile.updated_at < cutoff
+        ).delete(synchronize_session=False):
+            db.rollback()
+            continue
+        try:
+            # Files derived from it (previews) go with it
+            for derived_key in storage.keys(f"{key}."):
+                storage.delete(derived_key)
+            storage.delete(key)
+        except OSError as e:
+            db.rollback()
+            logger.warning(f"Could not delete stored file {key}: {e}")
+            continue
+        db.commit()
+        deleted += 1
+
+    if deleted:
+        logger.info(f"Deleted {deleted} unreferenced stored file(s)")
+    return deleted
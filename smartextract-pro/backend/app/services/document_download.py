@@ -0,0 +1,217 @@
+import os
+import mimetypes
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+from urllib.parse import quote
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from ..core.config import settings
+from ..models.document import Document
+from .storage import get_storage
+
+# ASGI extension for servers that can send a file without copying it through Python
+ZEROCOPY_EXTENSION = "http.response.zerocopy"
+
+
+class RangeNotSatisfiable(ValueError):
+    """A Range header asks for bytes past the end of the file"""
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    The first and last byte a Range header asks for.
+
+    Returns None when the header is to be ignored and the whole file sent:
+    it is malformed, not in bytes, or asks for several ranges (which would
+    take a multipart response).
+
+    Raises:
+        RangeNotSatisfiable: The range starts past the end of the file
+    """
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, dash, last = (part.strip() for part in ranges.partition("-"))
+    if not dash or not (first or last) or not (first + last).isdigit():
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0 or size == 0:
+            raise RangeNotSatisfiable(header)
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Whether an If-None-Match header lists `etag` (weak comparison, as RFC 7232 has for it)"""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().replace("W/", "", 1) == etag for tag in header.split(","))
+
+
+class FileRangeResponse(Response):
+    """
+    Sends `length` bytes of a file from `start`.
+
+    Servers offering the ASGI zero-copy extension send the file themselves
+    (sendfile); otherwise it is read in DOWNLOAD_CHUNK_SIZE chunks on the
+    thread pool, never all of it into memory.
+    """
+
+    def __init__(
+        self,
+        opener: Callable[[], BinaryIO],
+        start: int,
+        length: int,
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+        media_type: Optional[str] = None
+    ):
+        self.opener = opener
+        self.start = start
+        self.length = length
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        file = await run_in_threadpool(self.opener)
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if ZEROCOPY_EXTENSION in scope.get("extensions", {}) and hasattr(file, "fileno"):
+                await send({
+                    "type": ZEROCOPY_EXTENSION,
+                    "file": file,
+                    "offset": self.start,
+                    "count": self.length,
+                    "more_body": False,
+                })
+                return
+
+            await run_in_threadpool(_seek, file, self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await run_in_threadpool(file.read, min(settings.DOWNLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break  # Truncated underneath us: end the body early rather than hang
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await run_in_threadpool(file.close)
+
+
+def _seek(file: BinaryIO, offset: int) -> None:
+    if file.seekable():
+        file.seek(offset)
+    else:
+        while offset > 0:
+            skipped = len(file.read(min(settings.DOWNLOAD_CHUNK_SIZE, offset)))
+            if not skipped:
+                break
+            offset -= skipped
+
+
+def not_modified(request: Request, headers: Dict[str, str]) -> Optional[Response]:
+    """A 304 when the request's If-None-Match lists the ETag in `headers`, else None"""
+    etag = headers.get("etag")
+    if_none_match = request.headers.get("if-none-match")
+    if etag is not None and if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+async def download_response(request: Request, document: Document) -> Response:
+    """
+    Response with a document's file, honouring conditional and Range requests.
+
+    The ETag is the content hash, so a client holding the file revalidates
+    with If-None-Match and gets a 304 without the file being opened.
+
+    Raises:
+        FileNotFoundError: The document's file is gone
+    """
+    media_type = document.mime_type or mimetypes.guess_type(document.filename)[0] or "application/octet-stream"
+    headers = {
+        "cache-control": "private, no-cache",  # Revalidate each time: cheap with the ETag
+        "content-disposition": f"inline; filename*=UTF-8''{quote(document.filename)}",
+    }
+    if document.content_hash:
+        headers["etag"] = f'"{document.content_hash}"'
+    response = not_modified(request, headers)
+    if response is not None:
+        return response
+
+    if document.storage_key:
+        return await stored_file_response(request, document.storage_key, headers, media_type)
+
+    # Uploaded before storage keys
+    file_path = document.file_path
+    size = await run_in_threadpool(os.path.getsize, file_path)
+    return _file_response(request, lambda: open(file_path, "rb"), size, headers, media_type)
+
+
+async def stored_file_response(request: Request, key: str, headers: Dict[str, str], media_type: str) -> Response:
+    """
+    Response with a file in storage, honouring Range requests.
+
+    A single byte range (also suffix and open ranges) gets a 206; an
+    If-Range that does not match the ETag in `headers` gets the whole file.
+    With DOWNLOAD_ACCEL_REDIRECT_PREFIX set, files in local storage are
+    handed to nginx (X-Accel-Redirect), which sends them with sendfile and
+    answers Range itself.
+
+    Raises:
+        FileNotFoundError: Nothing is stored under `key`
+    """
+    storage = get_storage()
+    path = storage.filesystem_path(key)
+    if path is not None and settings.DOWNLOAD_ACCEL_REDIRECT_PREFIX:
+        if not await run_in_threadpool(os.path.exists, path):
+            raise FileNotFoundError(key)
+        headers = dict(headers, **{
+            "accept-ranges": "bytes",
+            "x-accel-redirect": settings.DOWNLOAD_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + key,
+        })
+        return Response(headers=headers, media_type=media_type)
+
+    size = await run_in_threadpool(storage.size, key)
+    opener = (lambda: open(path, "rb")) if path is not None else (lambda: storage.open(key))
+    return _file_response(request, opener, size, headers, media_type)
+
+
+def _file_response(
+    request: Request,
+    opener: Callable[[], BinaryIO],
+    size: int,
+    headers: Dict[str, str],
+    media_type: str
+) -> Response:
+    headers = dict(headers, **{"accept-ranges": "bytes"})
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == headers.get("etag")):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+            return FileRangeResponse(opener, start, end - start + 1, 206, headers, media_type)
+
+    return FileRangeResponse(opener, 0, size, 200, headers, media_type)
@@ -1,31 +1,130 @@
-import os
+import json
+import time
 import uuid
-import pytesseract
-import cv2
+import hashlib
 import numpy as np
-from typing import Dict, Any, List, Optional
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 
+from ..core.config import settings
 from ..models.document import Document
-from ..models.extraction import ExtractionJob, ExtractionStatus, ExtractedData
+from ..models.extraction import ExtractionJob, ExtractionStatus, ExtractionPriority, ExtractedData
+from ..models.template import Template
+from .ocr_cache import get_ocr_cache, make_ocr_cache_key
+from .ocr_data import OCRData, Box, empty_ocr_data, words_in_box, to_text, mean_confidence
+from .pdf_pipeline import ocr_pdf_pages, load_page, page_sizes, SOURCE_OCR, SOURCE_OCR_CACHE, SOURCE_TEXT_LAYER
+from .template_regions import align_page, ocr_regions, SOURCE_REGIONS
+from .template_matcher import template_matcher_cache
+from .preprocessing import PreprocessingPipeline
+from .tiled_ocr import ocr_tiled, should_tile, tiling_spec
+from .ocr_engine import get_ocr_engine, engine_version, OCRTimeout
+from .token_store import TokenPage
+from .job_results import JobOutcome, persist_outcomes
+from .job_control import JobControl
+from .webhook_outbox import FinishedJob, enqueue_job_events
+from .content_store import document_file
+
+# Bump whenever extraction output changes for the same input, so results
+# produced by an older pipeline are not reused.
+PIPELINE_VERSION = 3
 
 class ExtractionService:
     """Service for extracting data from documents"""
     
     @staticmethod
-    def create_extraction_job(db: Session, document_id: str, user_id: str) -> ExtractionJob:
+    def preprocessing_pipeline(document: Document, template: Optional[Template] = None) -> PreprocessingPipeline:
+        """
+        Image preprocessing for a document
+        
+        A template's own stages win; otherwise the profile configured for the
+        document type, then for the file type, then the default profile.
+        """
+        if template is not None and template.preprocessing:
+            return PreprocessingPipeline(template.preprocessing)
+        
+        profiles = settings.PREPROCESSING_PROFILES
+        document_type = document.document_type.value if document.document_type else None
+        for name in (document_type, document.file_type.lower()):
+            if name in profiles:
+                return PreprocessingPipeline(profiles[name])
+        return PreprocessingPipeline(profiles.get("default", []))
+    
+    @staticmethod
+    def pipeline_settings(document: Document, template: Optional[Template] = None) -> Dict[str, Any]:
+        """Settings that determine the extraction output for a document"""
+        preprocessing = ExtractionService.preprocessing_pipeline(document, template)
+        pipeline = {
+            "version": PIPELINE_VERSION,
+            "file_type": document.file_type.lower(),
+            "preprocessing": preprocessing.spec,
+            "engine": engine_version(),
+            "lang": settings.OCR_LANGUAGE,
+            "psm": settings.OCR_PSM,
+        }
+        if pipeline["file_type"] == "pdf":
+            pipeline["dpi"] = ExtractionService._render_dpi(preprocessing)
+            pipeline["text_layer_min_chars"] = settings.PDF_TEXT_LAYER_MIN_CHARS if settings.PDF_TEXT_LAYER_ENABLED else None
+        elif pipeline["file_type"] in ['jpg', 'jpeg', 'png', 'tiff', 'bmp']:
+            pipeline["tiling"] = tiling_spec()
+        if template is not None:
+            pipeline["template"] = {"fields": template.fields, "anchors": template.anchors}
+            pipeline["region_psm"] = settings.OCR_REGION_PSM
+        return pipeline
+    
+    @staticmethod
+    def pipeline_key(document: Document, template: Optional[Template] = None) -> str:
+        """Stable hash of the pipeline settings, used to match reusable results"""
+        encoded = json.dumps(ExtractionService.pipeline_settings(document, template), sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def ocr_key(document: Document, template: Optional[Template] = None) -> str:
+        """
+        Hash of the settings that determine the words read from a document
+        
+        Unlike pipeline_key it leaves out the template's fields and anchors
+        and the code and engine versions, so stored words can be matched
+        again after a template edit or an upgrade.
+        """
+        ocr_settings = ExtractionService.pipeline_settings(document, template)
+        for key in ("template", "version", "engine"):
+            ocr_settings.pop(key, None)
+        encoded = json.dumps(ocr_settings, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def create_extraction_job(
+        db: Session,
+        document_id: str,
+        user_id: str,
+        template_id: Optional[str] = None,
+        priority: ExtractionPriority = ExtractionPriority.INTERACTIVE
+    ) -> ExtractionJob:
         """Create a new extraction job"""
         # Check if document exists
         document = db.query(Document).filter(Document.id == document_id).first()
         if not document:
             raise ValueError(f"Document with ID {document_id} not found")
         
+        # Check that the template exists and belongs to the user
+        if template_id is not None:
+            template = db.query(Template.id).filter(
+                Template.id == template_id,
+                Template.owner_id == user_id
+            ).first()
+            if not template:
+                raise ValueError(f"Template with ID {template_id} not found")
+        
         # Create extraction job
         job = ExtractionJob(
             id=str(uuid.uuid4()),
             status=ExtractionStatus.PENDING,
+            priority=priority,
             document_id=document_id,
-            user_id=user_id
+            user_id=user_id,
+            template_id=template_id
         )
         
         db.add(job)
@@ -35,16 +134,143 @@ class ExtractionService:
         return job
     
     @staticmethod
-    def process_document(db: Session, job_id: str) -> ExtractionJob:
-        """Process a document and extract data"""
+    def create_extraction_jobs(
+        db: Session,
+        document_ids: List[str],
+        user_id: str,
+        template_id: Optional[str] = None,
+        priority: ExtractionPriority = ExtractionPriority.BULK
+    ) -> List[Tuple[str, str]]:
+        """Create one extraction job per document in a single statement and commit
+        
+        Ownership of all documents is checked with one IN query; duplicate
+        ids get a single job.
+        
+        Returns:
+            (document id, job id) pairs, in request order
+        
+        Raises:
+            ValueError: A document or the template does not exist or belongs to another user
+        """
+        document_ids = list(dict.fromkeys(document_ids))
+        owned = set(db.scalars(
+            select(Document.id).where(Document.id.in_(document_ids), Document.owner_id == user_id)
+        ))
+        missing = [document_id for document_id in document_ids if document_id not in owned]
+        if missing:
+            shown = ", ".join(missing[:10]) + (f" and {len(missing) - 10} more" if len(missing) > 10 else "")
+            raise ValueError(f"Documents not found: {shown}")
+        
+        if template_id is not None:
+            template = db.query(Template.id).filter(
+                Template.id == template_id,
+                Template.owner_id == user_id
+            ).first()
+            if not template:
+                raise ValueError(f"Template with ID {template_id} not found")
+        
+        now = datetime.utcnow()
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "status": ExtractionStatus.PENDING,
+                "priority": priority,
+                "progress": 0.0,
+                "document_id": document_id,
+                "user_id": user_id,
+                "template_id": template_id,
+                "attempts": 0,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for document_id in document_ids
+        ]
+        db.execute(insert(ExtractionJob), rows)
+        db.commit()
+        
+        return [(row["document_id"], row["id"]) for row in rows]
+    
+    @staticmethod
+    def cancel_job(db: Session, job_id: str, user_id: str) -> ExtractionJob:
+        """Cancel an extraction job
+        
+        A queued job is cancelled right away. A running job is flagged; its
+        worker stops between pages and the job ends CANCELLED, keeping the
+        results of the pages already done.
+        
+        Raises:
+            LookupError: Job not found
+            ValueError: Job already finished
+        """
+        job = db.query(ExtractionJob).filter(
+            ExtractionJob.id == job_id,
+            ExtractionJob.user_id == user_id
+        ).first()
+        if not job:
+            raise LookupError(f"Extraction job with ID {job_id} not found")
+        if job.status not in (ExtractionStatus.PENDING, ExtractionStatus.PROCESSING):
+            raise ValueError(f"Extraction job already finished. Current status: {job.status}")
+        
+        # Conditional updates: the job may be claimed or finish concurrently
+        cancelled = db.query(ExtractionJob).filter(
+            ExtractionJob.id == job_id,
+            ExtractionJob.status == ExtractionStatus.PENDING
+        ).update(
+            {
+                "status": ExtractionStatus.CANCELLED,
+                "cancel_requested": True,
+                "error_message": "Cancelled by user",
+            },
+            synchronize_session=False
+        )
+        if cancelled:
+            enqueue_job_events(db, [FinishedJob(job_id, ExtractionStatus.CANCELLED, "Cancelled by user")])
+        else:
+            db.query(ExtractionJob).filter(
+                ExtractionJob.id == job_id,
+                ExtractionJob.status == ExtractionStatus.PROCESSING
+            ).update({"cancel_requested": True}, synchronize_session=False)
+        db.commit()
+        db.refresh(job)
+        
+        return job
+    
+    @staticmethod
+    def process_document(db: Session, job_id: str, lease_owner: Optional[str] = None) -> ExtractionJob:
+        """Process a document and extract data
+        
+        When `lease_owner` is given the job was claimed from the queue and
+        results are only written while that worker still holds the lease.
+        """
         # Get job
         job = db.query(ExtractionJob).filter(ExtractionJob.id == job_id).first()
         if not job:
             raise ValueError(f"Extraction job with ID {job_id} not found")
         
-        # Update job status
-        job.status = ExtractionStatus.PROCESSING
-        db.commit()
+        # Update job status (claimed jobs were moved to PROCESSING by the queue)
+        if lease_owner is None:
+            job.status = ExtractionStatus.PROCESSING
+            db.commit()
+        
+        outcome = ExtractionService.extract(db, job)
+        persist_outcomes(db, [outcome], lease_owner)
+        db.refresh(job)
+        return job
+    
+    @staticmethod
+    def extract(db: Session, job: ExtractionJob) -> JobOutcome:
+        """Run a job's extraction and return its results without writing them
+        
+        Only progress is written along the way; the outcome is persisted by
+        the caller (see app/services/job_results.py), possibly together with
+        the outcomes of other jobs. A job that is cancelled or runs out of
+        time stops between pages and ends CANCELLED or FAILED with the
+        results of the pages it finished.
+        """
+        outcome = JobOutcome(job_id=job.id, status=ExtractionStatus.PROCESSING)
+        metadata = dict(job.extra_metadata or {})
+        control = JobControl(db, job.id, settings.JOB_TIME_BUDGET, settings.PAGE_TIME_BUDGET)
+        started: Optional[float] = None
         
         try:
             # Get document
@@ -52,79 +278,535 @@ class ExtractionService:
             if not document:
                 raise ValueError(f"Document with ID {job.document_id} not found")
             
+            template = job.template
+            outcome.pipeline_key = ExtractionService.pipeline_key(document, template)
+            metadata["ocr_key"] = ExtractionService.ocr_key(document, template)
+            preprocessing = ExtractionService.preprocessing_pipeline(document, template)
+            
+            # Identical content already extracted with the same settings: copy the result
+            source_job = ExtractionService._find_reusable_job(db, document, job.id, outcome.pipeline_key)
+            if source_job is not None:
+                ExtractionService._clone_extracted_data(source_job, outcome)
+                metadata["reused_from_job_id"] = source_job.id
+                outcome.extra_metadata = metadata
+                outcome.status = ExtractionStatus.COMPLETED
+                return outcome
+            
             # Extract data based on document type
             extracted_data = []
+            token_pages: List[TokenPage] = []
             
-            if document.file_type.lower() in ['jpg', 'jpeg', 'png', 'tiff', 'bmp']:
-                # Process image
-                extracted_data = ExtractionService._extract_from_image(document.file_path)
-            elif document.file_type.lower() == 'pdf':
-                # Process PDF (simplified - in real app would use a PDF library)
-                extracted_data = ExtractionService._extract_from_pdf(document.file_path)
-            else:
-                # Unsupported file type
-                job.status = ExtractionStatus.FAILED
-                job.error_message = f"Unsupported file type: {document.file_type}"
-                db.commit()
-                return job
+            # Read from storage (downloaded for the duration of the job from remote backends)
+            started = time.monotonic()
+            with document_file(document) as file_path:
+                if template is not None and document.file_type.lower() in ['jpg', 'jpeg', 'png', 'tiff', 'bmp', 'pdf']:
+                    # Extract the template's fields
+                    extracted_data, template_metadata, token_pages = ExtractionService._extract_with_template(
+                        document,
+                        file_path,
+                        template,
+                        preprocessing,
+                        control=control
+                    )
+                    metadata.update(template_metadata)
+                elif document.file_type.lower() in ['jpg', 'jpeg', 'png', 'tiff', 'bmp']:
+                    # Process image
+                    extracted_data, token_pages = ExtractionService._extract_from_image(
+                        file_path, preprocessing, document.content_hash, control=control
+                    )
+                elif document.file_type.lower() == 'pdf':
+                    # Process PDF page by page
+                    extracted_data, pdf_metadata, token_pages = ExtractionService._extract_from_pdf(
+                        file_path,
+                        preprocessing,
+                        document.content_hash,
+                        control=control
+                    )
+                    metadata.update(pdf_metadata)
+                else:
+                    # Unsupported file type
+                    raise ValueError(f"Unsupported file type: {document.file_type}")
             
-            # Save extracted data
-            for field_name, data in extracted_data.items():
-                extracted_item = ExtractedData(
-                    id=str(uuid.uuid4()),
-                    field_name=field_name,
-                    field_type="text",
-                    extracted_value=data['value'],
-                    confidence=data['confidence'],
-                    job_id=job.id
-                )
-                db.add(extracted_item)
+            metadata["preprocessing"] = {
+                "stages": [stage["stage"] for stage in preprocessing.spec],
+                "timings": preprocessing.timings.as_dict(),
+            }
             
-            # Update job status
-            job.status = ExtractionStatus.COMPLETED
-            job.progress = 100.0
+            # Extracted data, and the words with their boxes so fields can be matched again without OCR
+            now = datetime.utcnow()
+            outcome.add_fields(extracted_data, now)
+            outcome.add_pages(token_pages, now)
+            if control.stopped:
+                # Keep what was extracted before the job was stopped
+                outcome.status = control.status
+                outcome.error_message = control.reason
+                metadata["partial"] = True
+            else:
+                outcome.status = ExtractionStatus.COMPLETED
             
         except Exception as e:
             # Handle errors
-            job.status = ExtractionStatus.FAILED
-            job.error_message = str(e)
+            outcome.status = ExtractionStatus.FAILED
+            outcome.error_message = str(e)
+            outcome.extracted_data = []
+            outcome.pages = []
         
-        db.commit()
-        db.refresh(job)
+        if started is not None:
+            # Only jobs that did the work count towards the measured throughput
+            outcome.processing_seconds = time.monotonic() - started
+        outcome.extra_metadata = metadata
+        return outcome
+    
+    @staticmethod
+    def _find_reusable_job(
+        db: Session, document: Document, job_id: str, pipeline_key: str
+    ) -> Optional[ExtractionJob]:
+        """Find a completed job on identical content extracted with the same pipeline settings"""
+        if not document.content_hash:
+            return None
         
-        return job
+        return db.query(ExtractionJob).join(Document, ExtractionJob.document_id == Document.id).filter(
+            Document.content_hash == document.content_hash,
+            ExtractionJob.pipeline_key == pipeline_key,
+            ExtractionJob.status == ExtractionStatus.COMPLETED,
+            ExtractionJob.id != job_id,
+            # Image errors used to be recorded as an "error" field of a completed job
+            ~ExtractionJob.extracted_data.any(ExtractedData.field_name == "error")
+        ).order_by(ExtractionJob.updated_at.desc()).first()
     
     @staticmethod
-    def _extract_from_image(file_path: str) -> Dict[str, Dict[str, Any]]:
-        """Extract data from an image file"""
-        try:
-            # Read image
-            img = cv2.imread(file_path)
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    def _clone_extracted_data(source_job: ExtractionJob, outcome: JobOutcome) -> None:
+        """Copy the extracted data and pages of a previous job into a new job's outcome"""
+        now = datetime.utcnow()
+        for item in source_job.extracted_data:
+            outcome.extracted_data.append({
+                "id": str(uuid.uuid4()),
+                "field_name": item.field_name,
+                "field_type": item.field_type,
+                "extracted_value": item.extracted_value,
+                "confidence": item.confidence,
+                "is_valid": item.is_valid,
+                "validation_errors": item.validation_errors,
+                "extra_metadata": item.extra_metadata,
+                "job_id": outcome.job_id,
+                "created_at": now,
+                "updated_at": now,
+            })
+        for page in source_job.pages:
+            outcome.pages.append({
+                "id": str(uuid.uuid4()),
+                "page_number": page.page_number,
+                "source": page.source,
+                "width": page.width,
+                "height": page.height,
+                "word_count": page.word_count,
+                "tokens": page.tokens,
+                "job_id": outcome.job_id,
+                "created_at": now,
+            })
+    
+    @staticmethod
+    def _extract_from_image(
+        file_path: str,
+        preprocessing: PreprocessingPipeline,
+        content_hash: Optional[str] = None,
+        control: Optional[JobControl] = None
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[TokenPage]]:
+        """Extract data from an image file
+        
+        Errors fail the job rather than being recorded as a field, so a
+        failed read is never reused as the result for the same content.
+        
+        Returns:
+            Extracted fields and the words of the image
+        """
+        token_page = ExtractionService._ocr_image_file(file_path, preprocessing, content_hash, control)
+        ocr_data = token_page.words
+        
+        # Simple extraction - in a real app would use more sophisticated techniques
+        # like named entity recognition, regex patterns, etc.
+        fields = {
+            "full_text": {
+                "value": to_text(ocr_data),
+                "confidence": mean_confidence(ocr_data)
+            },
+        }
+        return fields, [token_page]
+    
+    @staticmethod
+    def _ocr_cache_key(
+        source_hash: str,
+        preprocessing: PreprocessingPipeline,
+        psm: Optional[int] = None,
+        tiling: bool = False
+    ) -> str:
+        """OCR cache key for an image source under the current OCR settings
+        
+        `tiling` adds the tiling settings, for whole image files that may be
+        OCR'd in tiles.
+        """
+        ocr_settings: Dict[str, Any] = {"stages": preprocessing.spec}
+        if tiling:
+            ocr_settings["tiling"] = tiling_spec()
+        return make_ocr_cache_key(
+            source_hash,
+            ocr_settings,
+            get_ocr_engine().version(),
+            settings.OCR_LANGUAGE,
+            psm or settings.OCR_PSM
+        )
+    
+    @staticmethod
+    def _ocr_image_file(
+        file_path: str,
+        preprocessing: PreprocessingPipeline,
+        content_hash: Optional[str] = None,
+        control: Optional[JobControl] = None
+    ) -> TokenPage:
+        """Run word-level OCR on an image file, going through the OCR cache
+        
+        Images of TILED_OCR_MIN_PIXELS or more are OCR'd in tiles (see
+        app/services/tiled_ocr.py), so the page is never held prepared in full.
+        """
+        cache = get_ocr_cache()
+        cache_key = ExtractionService._ocr_cache_key(
+            content_hash or ExtractionService._hash_file(file_path), preprocessing, tiling=True
+        )
+        
+        # The entry also records the size of the preprocessed image
+        cached = cache.get(cache_key)
+        if cached is not None and "page_size" in cached:
+            width, height = cached.pop("page_size")
+            return TokenPage(1, SOURCE_OCR_CACHE, cached, width, height)
+        
+        # Decode straight to grayscale; uncompressed BMPs are read as needed
+        source = preprocessing.open_image(file_path)
+        if should_tile(source):
+            page_started = time.monotonic()
             
-            # Apply threshold to get black and white image
-            _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY_INV)
+            def ocr_tile(binary: np.ndarray) -> OCRData:
+                timeout = control.ocr_timeout(page_started) if control is not None else None
+                return get_ocr_engine().image_to_data(binary, settings.OCR_PSM, timeout)
             
-            # Extract text using pytesseract
-            text = pytesseract.image_to_string(thresh)
+            ocr_data, width, height, tiling = ocr_tiled(
+                source, preprocessing, ocr_tile,
+                should_stop=control.should_stop if control is not None else None,
+                on_tile=control.report_progress if control is not None else None
+            )
+            if tiling["tiles_read"] == tiling["tiles"]:
+                cache.put(cache_key, {**ocr_data, "page_size": [width, height]})
+            return TokenPage(1, SOURCE_OCR, ocr_data, width, height)
+        
+        # Small enough to normalize the page in one piece
+        gray = preprocessing.prepare_page(source.read_all(), preprocessing.source_dpi)
+        del source
+        height, width = gray.shape[:2]
+        
+        ocr_data = ExtractionService._run_ocr(
+            gray, preprocessing, timeout=control.ocr_timeout() if control is not None else None
+        )
+        cache.put(cache_key, {**ocr_data, "page_size": [width, height]})
+        return TokenPage(1, SOURCE_OCR, ocr_data, width, height)
+    
+    @staticmethod
+    def _run_ocr(
+        gray: np.ndarray,
+        preprocessing: PreprocessingPipeline,
+        psm: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> OCRData:
+        """Binarize a grayscale image and extract words and boxes
+        
+        Raises:
+            OCRTimeout: OCR ran longer than `timeout` seconds
+        """
+        # Binarize and denoise, in place when possible
+        binary = preprocessing.prepare_for_ocr(gray)
+        
+        # Extract words and boxes with the process's long-lived engine
+        return get_ocr_engine().image_to_data(binary, psm or settings.OCR_PSM, timeout)
+    
+    @staticmethod
+    def _run_region_ocr(gray: np.ndarray, preprocessing: PreprocessingPipeline, timeout: Optional[float] = None) -> OCRData:
+        """OCR a canvas of stitched field regions, going through the OCR cache"""
+        psm = settings.OCR_REGION_PSM
+        pixels_hash = hashlib.sha256(gray.tobytes()).hexdigest()
+        cache_key = ExtractionService._ocr_cache_key(
+            f"pixels:{pixels_hash}:{gray.shape[1]}x{gray.shape[0]}", preprocessing, psm
+        )
+        
+        cache = get_ocr_cache()
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        ocr_data = ExtractionService._run_ocr(gray, preprocessing, psm=psm, timeout=timeout)
+        cache.put(cache_key, ocr_data)
+        return ocr_data
+    
+    @staticmethod
+    def _hash_file(file_path: str) -> str:
+        """SHA-256 of a file, for documents uploaded before content hashing"""
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+    
+    @staticmethod
+    def _render_dpi(preprocessing: PreprocessingPipeline) -> int:
+        """Resolution PDF pages are rendered at: straight at the resample target when there is one"""
+        return preprocessing.target_dpi or settings.PDF_RENDER_DPI
+    
+    @staticmethod
+    def _extract_from_pdf(
+        file_path: str,
+        preprocessing: PreprocessingPipeline,
+        content_hash: Optional[str] = None,
+        control: Optional[JobControl] = None
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any], List[TokenPage]]:
+        """Extract data from a PDF file
+        
+        Returns:
+            Extracted fields, metadata to record on the job and the words of every page
+        """
+        token_pages, metadata = ExtractionService._ocr_pdf(file_path, preprocessing, content_hash, control)
+        
+        all_confidences = [conf for page in token_pages for conf in page.words["conf"]]
+        fields = {
+            "full_text": {
+                "value": "\n\n".join(to_text(page.words) for page in token_pages),
+                "confidence": mean_confidence({"conf": all_confidences})
+            },
+        }
+        return fields, metadata, token_pages
+    
+    @staticmethod
+    def _ocr_pdf(
+        file_path: str,
+        preprocessing: PreprocessingPipeline,
+        content_hash: Optional[str] = None,
+        control: Optional[JobControl] = None
+    ) -> Tuple[List[TokenPage], Dict[str, Any]]:
+        """Word-level data for every page of a PDF
+        
+        Born-digital pages are read from the PDF's text layer; only pages
+        without usable text are rasterized and OCR'd. When the job is
+        stopped, only the pages finished until then are returned.
+        
+        Returns:
+            Words per page and metadata recording the source of each page
+        """
+        dpi = ExtractionService._render_dpi(preprocessing)
+        source_hash = content_hash or ExtractionService._hash_file(file_path)
+        cache = get_ocr_cache()
+        
+        def page_cache_key(index: int) -> str:
+            return ExtractionService._ocr_cache_key(f"{source_hash}:page={index}:dpi={dpi}", preprocessing)
+        
+        def lookup_page(index: int) -> Optional[OCRData]:
+            return cache.get(page_cache_key(index))
+        
+        def ocr_page(index: int, image: np.ndarray) -> Optional[OCRData]:
+            try:
+                ocr_data = ExtractionService._run_ocr(
+                    preprocessing.prepare_page(image, dpi),
+                    preprocessing,
+                    timeout=control.ocr_timeout() if control is not None else None
+                )
+            except OCRTimeout:
+                control.ocr_timed_out(index + 1)
+                return None  # Abandon the page, and the pages after it
+            cache.put(page_cache_key(index), ocr_data)
+            return ocr_data
+        
+        pages, sources = ocr_pdf_pages(
+            file_path,
+            dpi=dpi,
+            ocr_page=ocr_page,
+            max_workers=settings.PDF_PAGE_WORKERS,
+            lookup_page=lookup_page,
+            on_page_done=control.report_progress if control is not None else None,
+            text_layer_min_chars=settings.PDF_TEXT_LAYER_MIN_CHARS if settings.PDF_TEXT_LAYER_ENABLED else None,
+            should_stop=control.should_stop if control is not None else None
+        )
+        
+        metadata = {
+            "page_count": len(pages),
+            "pages": [
+                {"page": index + 1, "source": source}
+                for index, source in enumerate(sources) if source is not None
+            ],
+        }
+        skipped = [index + 1 for index, words in enumerate(pages) if words is None]
+        if skipped:
+            metadata["skipped_pages"] = skipped
+        sizes = page_sizes(file_path, dpi)
+        token_pages = [
+            TokenPage(index + 1, source, words, width, height)
+            for index, (words, source, (width, height)) in enumerate(zip(pages, sources, sizes))
+            if words is not None
+        ]
+        return token_pages, metadata
+    
+    @staticmethod
+    def _has_regions(template: Optional[Template]) -> bool:
+        """Whether a template defines regions for any of its fields"""
+        return template is not None and any(field.get("region") for field in template.fields or [])
+    
+    @staticmethod
+    def _extract_with_template(
+        document: Document,
+        file_path: str,
+        template: Template,
+        preprocessing: PreprocessingPipeline,
+        control: Optional[JobControl] = None
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any], List[TokenPage]]:
+        """Extract one value per template field
+        
+        Fields with a region are read from that region only; the other fields
+        are matched (keywords, pattern, type) against the words of the whole
+        document, which is only OCR'd when such fields exist.
+        
+        Returns:
+            Extracted fields, metadata to record on the job and the words
+            read (whole pages, or only the field regions when that is all
+            that was recognized)
+        """
+        matcher = template_matcher_cache.get(template)
+        metadata: Dict[str, Any] = {"template_id": template.id}
+        
+        region_words: Dict[str, Tuple[OCRData, int, Box]] = {}
+        if ExtractionService._has_regions(template):
+            region_words, metadata["regions"] = ExtractionService._read_template_regions(
+                document, file_path, template, preprocessing, control, report_progress=not matcher.needs_page_words
+            )
+        
+        token_pages: List[TokenPage] = []
+        if matcher.needs_page_words:
+            if document.file_type.lower() == "pdf":
+                token_pages, pdf_metadata = ExtractionService._ocr_pdf(
+                    file_path, preprocessing, document.content_hash, control
+                )
+                metadata.update(pdf_metadata)
+            elif control is None or not control.should_stop():
+                token_pages = [ExtractionService._ocr_image_file(
+                    file_path, preprocessing, document.content_hash, control
+                )]
+        else:
+            token_pages = ExtractionService._region_token_pages(region_words)
+        
+        fields = matcher.match([page.words for page in token_pages], region_words)
+        return fields, metadata, token_pages
+    
+    @staticmethod
+    def _region_token_pages(region_words: Dict[str, Tuple[OCRData, int, Box]]) -> List[TokenPage]:
+        """Words of all field regions, grouped by page"""
+        by_page: Dict[int, OCRData] = {}
+        for words, page_number, _ in region_words.values():
+            page_words = by_page.setdefault(page_number, empty_ocr_data())
+            for column in page_words:
+                page_words[column].extend(words[column])
+        return [TokenPage(page_number, SOURCE_REGIONS, by_page[page_number]) for page_number in sorted(by_page)]
+    
+    @staticmethod
+    def _read_template_regions(
+        document: Document,
+        file_path: str,
+        template: Template,
+        preprocessing: PreprocessingPipeline,
+        control: Optional[JobControl] = None,
+        report_progress: bool = True
+    ) -> Tuple[Dict[str, Tuple[OCRData, int, Box]], List[Dict[str, Any]]]:
+        """Read the words inside every field region of a template
+        
+        Each page is aligned with the template through its anchors, then the
+        field regions are cropped and OCR'd together in one batched call (or
+        read from the PDF text layer when the page has one). When the job is
+        stopped, pages not read yet are skipped and their fields not found.
+        
+        Returns:
+            Words, page number and pixel box per field name, and alignment
+            metadata per page
+        """
+        anchors = template.anchors or []
+        region_fields = [field for field in template.fields if field.get("region")]
+        page_numbers = sorted({field["region"].get("page", 1) for field in region_fields})
+        
+        field_words: Dict[str, Tuple[OCRData, int, Box]] = {}
+        pages_metadata = []
+        for done, page_number in enumerate(page_numbers, start=1):
+            if control is not None and control.should_stop():
+                break
+            page_fields = [field for field in region_fields if field["region"].get("page", 1) == page_number]
+            page_anchors = [anchor for anchor in anchors if anchor["region"].get("page", 1) == page_number]
             
-            # Simple extraction - in a real app would use more sophisticated techniques
-            # like named entity recognition, regex patterns, etc.
-            return {
-                "full_text": {"value": text, "confidence": 0.8},
-            }
+            try:
+                words_per_field, page_metadata = ExtractionService._read_page_regions(
+                    document, file_path, page_number, page_fields, page_anchors, preprocessing, control
+                )
+            except OCRTimeout:
+                control.ocr_timed_out(page_number)
+                break
+            for field, (words, box) in zip(page_fields, words_per_field):
+                field_words[field["name"]] = (words, page_number, box)
+            pages_metadata.append(page_metadata)
             
-        except Exception as e:
-            print(f"Error extracting from image: {str(e)}")
-            return {"error": {"value": str(e), "confidence": 0.0}}
+            if control is not None and report_progress:
+                control.report_progress(done, len(page_numbers))
+        
+        return field_words, pages_metadata
     
     @staticmethod
-    def _extract_from_pdf(file_path: str) -> Dict[str, Dict[str, Any]]:
-        """Extract data from a PDF file"""
-        # In a real app, would use a PDF library like PyPDF2 or pdfplumber
-        # This is a simplified placeholder
-        return {
-            "note": {"value": "PDF extraction not fully implemented", "confidence": 0.5},
-        }
\ No newline at end of file
+    def _read_page_regions(
+        document: Document,
+        file_path: str,
+        page_number: int,
+        fields: List[Dict[str, Any]],
+        anchors: List[Dict[str, Any]],
+        preprocessing: PreprocessingPipeline,
+        control: Optional[JobControl] = None
+    ) -> Tuple[List[Tuple[OCRData, Box]], Dict[str, Any]]:
+        """Words inside each field region of one page, with the region's pixel box"""
+        page_words = None
+        gray = None
+        if document.file_type.lower() == "pdf":
+            dpi = ExtractionService._render_dpi(preprocessing)
+            page_words, gray, width, height = load_page(
+                file_path,
+                page_number - 1,
+                dpi,
+                settings.PDF_TEXT_LAYER_MIN_CHARS if settings.PDF_TEXT_LAYER_ENABLED else None
+            )
+            if gray is not None:
+                gray = preprocessing.prepare_page(gray, dpi)
+        else:
+            if page_number != 1:
+                raise ValueError(f"Template region on page {page_number}, but images have a single page")
+            gray = preprocessing.load_image(file_path)
+            height, width = gray.shape
+        
+        def region_ocr(canvas: np.ndarray) -> OCRData:
+            return ExtractionService._run_region_ocr(
+                canvas, preprocessing, timeout=control.ocr_timeout() if control is not None else None
+            )
+        
+        transform, anchors_found = align_page(
+            gray, width, height, anchors,
+            ocr=region_ocr,
+            page_words=page_words
+        )
+        boxes = [transform.to_box(field["region"]) for field in fields]
+        
+        if page_words is not None:
+            words_per_box = [words_in_box(page_words, box) for box in boxes]
+        else:
+            words_per_box = ocr_regions(gray, boxes, region_ocr)
+        
+        page_metadata = {
+            "page": page_number,
+            "source": SOURCE_TEXT_LAYER if page_words is not None else SOURCE_OCR,
+            "anchors_found": anchors_found,
+            "transform": transform.as_dict(),
+        }
+        return list(zip(words_per_box, boxes)), page_metadata
@@ -0,0 +1,224 @@
+import os
+import struct
+import logging
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Pixels (BMP: bytes) read at a time when a whole source is scanned (histogram, thumbnail) or a region is read
+SCAN_BAND_PIXELS = 16 * 1024 * 1024
+
+# Pixel box: left, top, right, bottom (exclusive)
+Region = Tuple[int, int, int, int]
+
+BMP_HEADER = struct.Struct("<2sI4xI")  # Signature, file size, pixel data offset
+BMP_INFO_HEADER = struct.Struct("<IiiHHI12xI")  # Header size, width, height, planes, bits, compression, colors used
+BMP_INFO_HEADER_SIZES = (40, 52, 56, 108, 124)  # BITMAPINFOHEADER and its extensions
+BI_RGB = 0
+BI_BITFIELDS = 3
+BGRA_MASKS = (0x00FF0000, 0x0000FF00, 0x000000FF)  # Red, green, blue
+GRAY_WEIGHTS = np.array([0.114, 0.587, 0.299])  # Blue, green, red, as cv2.COLOR_BGR2GRAY
+
+
+class ImageSource:
+    """
+    Grayscale image whose pixels are read region by region.
+
+    Sources backed by the file itself never hold the whole image, so a
+    region costs memory in proportion to its own size. Scans of the whole
+    image (histogram, thumbnail) go through it in bands.
+    """
+    width: int
+    height: int
+
+    @property
+    def pixel_count(self) -> int:
+        return self.width * self.height
+
+    def read(self, region: Region) -> np.ndarray:
+        """Writable copy of a region, clipped to the image"""
+        raise NotImplementedError
+
+    def read_all(self) -> np.ndarray:
+        """The whole image, for images small enough to process in one piece"""
+        return self.read((0, 0, self.width, self.height))
+
+    def _bands(self):
+        band_height = max(1, SCAN_BAND_PIXELS // max(self.width, 1))
+        for top in range(0, self.height, band_height):
+            yield top, self.read((0, top, self.width, min(self.height, top + band_height)))
+
+    def histogram(self) -> np.ndarray:
+        """Gray level histogram of the whole image (256 bins)"""
+        histogram = np.zeros(256, dtype=np.int64)
+        for _, band in self._bands():
+            histogram += _histogram(band)
+        return histogram
+
+    def thumbnail(self, max_side: int) -> np.ndarray:
+        """The image scaled down so its long side is at most `max_side`"""
+        scale = min(1.0, max_side / max(self.width, self.height))
+        width = max(1, int(round(self.width * scale)))
+        height = max(1, int(round(self.height * scale)))
+        thumbnail = np.empty((height, width), dtype=np.uint8)
+        for top, band in self._bands():
+            first = int(round(top * scale))
+            last = min(height, int(round((top + band.shape[0]) * scale)))
+            if last > first:
+                thumbnail[first:last] = cv2.resize(band, (width, last - first), interpolation=cv2.INTER_AREA)
+        return thumbnail
+
+
+class DecodedImageSource(ImageSource):
+    """An image decoded in full, for formats that cannot be read region by region"""
+
+    def __init__(self, gray: np.ndarray):
+        self.gray = gray
+        self.height, self.width = gray.shape[:2]
+
+    def read(self, region: Region) -> np.ndarray:
+        left, top, right, bottom = _clip(region, self.width, self.height)
+        return self.gray[top:bottom, left:right].copy()
+
+    def read_all(self) -> np.ndarray:
+        return self.gray
+
+    def thumbnail(self, max_side: int) -> np.ndarray:
+        scale = min(1.0, max_side / max(self.width, self.height))
+        if scale >= 1.0:
+            return self.gray
+        return cv2.resize(self.gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+
+class BmpImageSource(ImageSource):
+    """
+    An uncompressed BMP, read straight from the file.
+
+    Only the bytes of a requested region are read, a band of rows at a
+    time, and converted to gray, so even a multi-gigabyte scan is read in
+    memory bounded by the region.
+    Supports 1, 4 and 8 bit palette images and 24 and 32 bit color.
+    `reduce` scales the image down by an integer factor while reading, as
+    the decode stage does for other formats.
+    """
+    def __init__(self, file_path: str, pixel_offset: int, width: int, height: int, bits: int,
+                 palette: Optional[np.ndarray], reduce: int = 1):
+        self.file_path = file_path
+        self.bits = bits
+        self.reduce = reduce
+        self.source_width = width
+        self.source_height = abs(height)
+        self.bottom_up = height > 0
+        self.pixel_offset = pixel_offset
+        self.stride = (bits * width + 31) // 32 * 4
+        self.lut = None
+        if palette is not None:
+            self.lut = np.zeros(256, dtype=np.uint8)
+            self.lut[:len(palette)] = np.clip(np.rint(palette.astype(np.float64) @ GRAY_WEIGHTS), 0, 255)
+        self.width = self.source_width // reduce
+        self.height = self.source_height // reduce
+
+    def read(self, region: Region) -> np.ndarray:
+        left, top, right, bottom = _clip(region, self.width, self.height)
+        r = self.reduce
+        gray = self._read_source(left * r, top * r, right * r, bottom * r)
+        if r > 1:
+            gray = cv2.resize(gray, (right - left, bottom - top), interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _read_source(self, left: int, top: int, right: int, bottom: int) -> np.ndarray:
+        """Gray pixels of a region at full resolution"""
+        if self.bits == 24:
+            pixels = self._read_rows(top, bottom, left * 3, right * 3).reshape(bottom - top, right - left, 3)
+            return cv2.cvtColor(pixels, cv2.COLOR_BGR2GRAY)
+        if self.bits == 32:
+            pixels = self._read_rows(top, bottom, left * 4, right * 4).reshape(bottom - top, right - left, 4)
+            return cv2.cvtColor(pixels, cv2.COLOR_BGRA2GRAY)
+        if self.bits == 8:
+            indices = self._read_rows(top, bottom, left, right)
+        elif self.bits == 4:
+            packed = self._read_rows(top, bottom, left // 2, (right + 1) // 2)
+            indices = np.empty((packed.shape[0], packed.shape[1] * 2), dtype=np.uint8)
+            indices[:, 0::2] = packed >> 4
+            indices[:, 1::2] = packed & 0x0F
+            indices = indices[:, left % 2:left % 2 + right - left]
+        else:
+            packed = self._read_rows(top, bottom, left // 8, (right + 7) // 8)
+            indices = np.unpackbits(packed, axis=1)[:, left % 8:left % 8 + right - left]
+        return cv2.LUT(np.ascontiguousarray(indices), self.lut)
+
+    def _read_rows(self, top: int, bottom: int, first_byte: int, last_byte: int) -> np.ndarray:
+        """Bytes `first_byte:last_byte` of image rows `top:bottom`, top row first"""
+        rows = np.empty((bottom - top, last_byte - first_byte), dtype=np.uint8)
+        band_rows = max(1, SCAN_BAND_PIXELS // self.stride)
+        with open(self.file_path, "rb") as f:
+            for start in range(top, bottom, band_rows):
+                end = min(bottom, start + band_rows)
+                first_row = self.source_height - end if self.bottom_up else start
+                f.seek(self.pixel_offset + first_row * self.stride)
+                band = np.fromfile(f, dtype=np.uint8, count=(end - start) * self.stride).reshape(end - start, self.stride)
+                band = band[:, first_byte:last_byte]
+                rows[start - top:end - top] = band[::-1] if self.bottom_up else band
+        return rows
+
+
+def open_bmp(file_path: str, reduce: int = 1) -> Optional[BmpImageSource]:
+    """Open an uncompressed BMP for region reads; None for other files and BMP variants"""
+    try:
+        with open(file_path, "rb") as f:
+            header = f.read(BMP_HEADER.size + BMP_INFO_HEADER.size)
+            if len(header) < BMP_HEADER.size + BMP_INFO_HEADER.size:
+                return None
+            signature, _, pixel_offset = BMP_HEADER.unpack_from(header)
+            if signature != b"BM":
+                return None
+            header_size, width, height, planes, bits, compression, colors_used = BMP_INFO_HEADER.unpack_from(
+                header, BMP_HEADER.size
+            )
+            if header_size not in BMP_INFO_HEADER_SIZES or planes != 1 or width <= 0 or height == 0:
+                return None
+            if bits not in (1, 4, 8, 24, 32):
+                return None
+
+            if compression == BI_BITFIELDS and bits == 32:
+                # Color masks follow a bare BITMAPINFOHEADER and are part of the larger headers
+                f.seek(BMP_HEADER.size + 40)
+                masks = struct.unpack("<3I", f.read(12))
+                if masks != BGRA_MASKS:
+                    return None
+            elif compression != BI_RGB:
+                return None
+
+            palette = None
+            if bits <= 8:
+                entries = colors_used or 2 ** bits
+                f.seek(BMP_HEADER.size + header_size)
+                palette = np.frombuffer(f.read(entries * 4), dtype=np.uint8).reshape(-1, 4)[:, :3]  # Blue, green, red
+                if len(palette) < 2 ** bits:
+                    # Out-of-range indices read as black
+                    palette = np.vstack([palette, np.zeros((2 ** bits - len(palette), 3), dtype=np.uint8)])
+    except (OSError, struct.error, ValueError):
+        return None
+
+    stride = (bits * width + 31) // 32 * 4
+    try:
+        if os.path.getsize(file_path) < pixel_offset + stride * abs(height):
+            logger.debug(f"Truncated BMP {file_path}")
+            return None
+    except OSError:
+        return None
+    return BmpImageSource(file_path, pixel_offset, width, height, bits, palette, reduce)
+
+
+def _histogram(gray: np.ndarray) -> np.ndarray:
+    # Counts are exact in float32 up to 2 ** 24, the most pixels a scan band holds
+    return cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+
+
+def _clip(region: Region, width: int, height: int) -> Region:
+    left, top, right, bottom = region
+    left, top = max(0, left), max(0, top)
+    return left, top, max(left, min(width, right)), max(top, min(height, bottom))
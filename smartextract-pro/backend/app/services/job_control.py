@@ -0,0 +1,120 @@
+import time
+import logging
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.extraction import ExtractionJob, ExtractionStatus
+
+logger = logging.getLogger(__name__)
+
+# Shortest OCR time limit handed out, so a nearly spent budget still lets a call start and fail cleanly
+MIN_OCR_TIMEOUT = 0.1
+
+
+class JobControl:
+    """
+    Progress, cancellation and time budgets of one running extraction job.
+
+    Extraction calls into it between pages and regions. Progress is written
+    at most once per PROGRESS_UPDATE_INTERVAL and the cancel flag is read at
+    most once per CANCEL_CHECK_INTERVAL. Once the job is cancelled or out of
+    time, `status` and `reason` are set, remaining pages are skipped and
+    whatever was extracted so far is kept.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        job_id: str,
+        time_budget: Optional[float] = None,
+        page_budget: Optional[float] = None
+    ):
+        """
+        Initialize the control of a job that starts now
+
+        Args:
+            db: Session used for progress writes and cancel checks (calling thread only)
+            job_id: ID of the job
+            time_budget: Seconds the whole job may run (None or 0: no limit)
+            page_budget: Seconds OCR of one page or region canvas may take (None or 0: no limit)
+        """
+        self.db = db
+        self.job_id = job_id
+        self.time_budget = time_budget or None
+        self.page_budget = page_budget or None
+        self.deadline = time.monotonic() + self.time_budget if self.time_budget else None
+        self.status: Optional[ExtractionStatus] = None
+        self.reason: Optional[str] = None
+        self._last_progress = 0.0
+        self._last_cancel_check = 0.0
+
+    @property
+    def stopped(self) -> bool:
+        """Whether the job was cancelled or ran out of time"""
+        return self.status is not None
+
+    def stop(self, status: ExtractionStatus, reason: str) -> None:
+        """Stop the job; the first reason given is kept"""
+        if self.status is None:
+            self.status = status
+            self.reason = reason
+            logger.info(f"Stopping extraction job {self.job_id}: {reason}")
+
+    def should_stop(self) -> bool:
+        """Check the time budget and (rate-limited) the job's cancel flag"""
+        if self.stopped:
+            return True
+
+        now = time.monotonic()
+        if self.deadline is not None and now >= self.deadline:
+            self.stop(ExtractionStatus.FAILED, f"Job exceeded its time budget of {self.time_budget:g}s")
+            return True
+
+        if now - self._last_cancel_check >= settings.CANCEL_CHECK_INTERVAL:
+            self._last_cancel_check = now
+            cancel_requested = self.db.query(ExtractionJob.cancel_requested).filter(
+                ExtractionJob.id == self.job_id
+            ).scalar()
+            self.db.rollback()  # End the read transaction so later reads see new commits
+            if cancel_requested:
+                self.stop(ExtractionStatus.CANCELLED, "Cancelled by user")
+                return True
+        return False
+
+    def report_progress(self, done: int, total: int) -> None:
+        """Record page progress on the job, at most once per PROGRESS_UPDATE_INTERVAL"""
+        now = time.monotonic()
+        if done < total and now - self._last_progress < settings.PROGRESS_UPDATE_INTERVAL:
+            return
+        self._last_progress = now
+        self.db.query(ExtractionJob).filter(ExtractionJob.id == self.job_id).update(
+            {"progress": round(100.0 * done / max(total, 1), 1)},
+            synchronize_session=False
+        )
+        self.db.commit()
+
+    def ocr_timeout(self, page_started: Optional[float] = None) -> Optional[float]:
+        """
+        Time limit for the next OCR call: the page budget, capped by what is left of the job's
+
+        Args:
+            page_started: time.monotonic() when OCR of the page began, for
+                pages OCR'd in several calls (tiles) that share its budget
+        """
+        limits = []
+        if self.page_budget is not None:
+            limits.append(self.page_budget - (time.monotonic() - page_started if page_started is not None else 0.0))
+        if self.deadline is not None:
+            limits.append(self.deadline - time.monotonic())
+        if not limits:
+            return None
+        return max(MIN_OCR_TIMEOUT, min(limits))
+
+    def ocr_timed_out(self, page_number: int) -> None:
+        """Stop the job after OCR of a page was killed for running too long"""
+        if self.page_budget is None or (self.deadline is not None and time.monotonic() >= self.deadline):
+            self.stop(ExtractionStatus.FAILED, f"Job exceeded its time budget of {self.time_budget:g}s")
+        else:
+            self.stop(ExtractionStatus.FAILED, f"OCR of page {page_number} exceeded the page time budget of {self.page_budget:g}s")
@@ -0,0 +1,251 @@
+import json
+import select
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import Engine, select as sql_select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.extraction import ExtractionJob, ExtractionStatus
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "extraction_job_events"
+
+# Every insert and every status or progress change of a job is announced on
+# NOTIFY_CHANNEL, whoever writes it (API, queue, worker, bulk statement).
+# Notifications are delivered at commit, and identical ones in a transaction
+# are folded into one. Installed by the first listener that finds it missing.
+NOTIFY_TRIGGER_SQL = [
+    f"""
+        CREATE OR REPLACE FUNCTION notify_extraction_job_event() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{NOTIFY_CHANNEL}', json_build_object(
+                'job_id', NEW.id,
+                'user_id', NEW.user_id,
+                'status', NEW.status,
+                'progress', NEW.progress,
+                'error_message', left(NEW.error_message, 500)
+            )::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """,
+    """
+        CREATE TRIGGER extraction_job_events
+        AFTER INSERT OR UPDATE OF status, progress ON extraction_jobs
+        FOR EACH ROW EXECUTE FUNCTION notify_extraction_job_event()
+    """,
+]
+
+FINISHED_STATUSES = {
+    ExtractionStatus.COMPLETED, ExtractionStatus.FAILED, ExtractionStatus.PARTIAL, ExtractionStatus.CANCELLED
+}
+
+
+class JobEvent(NamedTuple):
+    """State of a job after a change"""
+    job_id: str
+    user_id: str
+    status: ExtractionStatus
+    progress: float
+    error_message: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    @classmethod
+    def from_job(cls, job: ExtractionJob) -> "JobEvent":
+        return cls(job.id, job.user_id, job.status, job.progress or 0.0, job.error_message)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status.value,
+            "progress": self.progress,
+            "error_message": self.error_message,
+        }
+
+
+class Subscription:
+    """
+    Events for one stream: every job of a user, or a single job.
+
+    Events are coalesced per job, so a slow client only ever holds the
+    latest state of each job it has not received yet.
+    """
+    def __init__(self, hub: "JobEventHub", user_id: str, job_id: Optional[str] = None):
+        self.hub = hub
+        self.user_id = user_id
+        self.job_id = job_id
+        self._loop = asyncio.get_running_loop()
+        self._pending: Dict[str, JobEvent] = {}
+        self._ready = asyncio.Event()
+
+    def matches(self, event: JobEvent) -> bool:
+        return event.user_id == self.user_id and (self.job_id is None or event.job_id == self.job_id)
+
+    def deliver(self, event: JobEvent) -> None:
+        """Queue an event (thread-safe)"""
+        self._loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: JobEvent) -> None:
+        self._pending[event.job_id] = event
+        self._ready.set()
+
+    async def next_events(self, timeout: float) -> List[JobEvent]:
+        """Wait up to `timeout` seconds for events; empty when none came"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        events, self._pending = list(self._pending.values()), {}
+        return events
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class JobEventHub:
+    """
+    Fans job changes out to the event streams of this process.
+
+    A single background thread watches for changes for all streams: with
+    PostgreSQL it LISTENs for the notifications of a trigger on
+    extraction_jobs; with other databases (SQLite) it reads the jobs
+    changed since its last look, every JOB_EVENTS_POLL_INTERVAL seconds.
+    The thread only runs while someone is subscribed.
+    """
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._subscriptions: List[Subscription] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop: Optional[threading.Event] = None
+
+    def subscribe(self, user_id: str, job_id: Optional[str] = None) -> Subscription:
+        """Start receiving the events of a user's jobs (or one of them); call from the event loop"""
+        subscription = Subscription(self, user_id, job_id)
+        with self._lock:
+            self._subscriptions.append(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                # Each watcher thread gets its own stop flag, so one still winding down is never revived
+                self._stop = threading.Event()
+                target = self._listen if self.engine.dialect.name == "postgresql" else self._poll
+                self._thread = threading.Thread(target=target, args=(self._stop,), name="job-events", daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            if not self._subscriptions and self._stop is not None:
+                self._stop.set()
+                self._thread = None
+
+    def stop(self) -> None:
+        """Stop watching, e.g. at shutdown"""
+        with self._lock:
+            self._subscriptions = []
+            if self._stop is not None:
+                self._stop.set()
+            self._thread = None
+
+    def publish(self, event: JobEvent) -> None:
+        """Hand an event to every matching stream"""
+        with self._lock:
+            subscriptions = [subscription for subscription in self._subscriptions if subscription.matches(event)]
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def _listen(self, stop: threading.Event) -> None:
+        """Deliver PostgreSQL notifications, reconnecting after errors"""
+        while not stop.is_set():
+            connection = None
+            try:
+                connection = self.engine.raw_connection()
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1 FROM pg_trigger WHERE tgname = 'extraction_job_events'")
+                    if cursor.fetchone() is None:
+                        for statement in NOTIFY_TRIGGER_SQL:
+                            cursor.execute(statement)
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                connection.commit()
+
+                dbapi_connection = connection.dbapi_connection
+                while not stop.is_set():
+                    # Wake up at least every second to notice stop()
+                    if select.select([dbapi_connection], [], [], 1.0) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notification = dbapi_connection.notifies.pop(0)
+                        self._publish_payload(notification.payload)
+            except Exception as e:
+                logger.error(f"Job event listener error: {e}")
+                stop.wait(5)
+            finally:
+                if connection is not None:
+                    connection.invalidate()  # Never hand a LISTENing connection back to the pool
+
+    def _publish_payload(self, payload: str) -> None:
+        data = json.loads(payload)
+        self.publish(JobEvent(
+            job_id=data["job_id"],
+            user_id=data["user_id"],
+            status=ExtractionStatus[data["status"]],  # Enum columns store member names
+            progress=data["progress"] or 0.0,
+            error_message=data["error_message"],
+        ))
+
+    def _poll(self, stop: threading.Event) -> None:
+        """Deliver the changes of jobs updated since the previous look"""
+        last_seen: Dict[str, tuple] = {}
+        since = datetime.utcnow() - timedelta(seconds=1)
+        while not stop.wait(settings.JOB_EVENTS_POLL_INTERVAL):
+            try:
+                with Session(self.engine) as db:
+                    jobs = db.execute(
+                        sql_select(
+                            ExtractionJob.id,
+                            ExtractionJob.user_id,
+                            ExtractionJob.status,
+                            ExtractionJob.progress,
+                            ExtractionJob.error_message,
+                            ExtractionJob.updated_at
+                        ).where(ExtractionJob.updated_at >= since)
+                    ).all()
+            except Exception as e:
+                logger.error(f"Job event poller error: {e}")
+                continue
+
+            # Timestamps may have one-second resolution: looks overlap, and what was already sent is skipped
+            for job_id, user_id, status, progress, error_message, updated_at in jobs:
+                since = max(since, updated_at - timedelta(seconds=1))
+                state = (status, progress)
+                if last_seen.get(job_id) == state:
+                    continue
+                last_seen[job_id] = state
+                self.publish(JobEvent(job_id, user_id, status, progress or 0.0, error_message))
+
+            if len(last_seen) > 10000:
+                last_seen.clear()
+
+
+_job_event_hub: Optional[JobEventHub] = None
+
+
+def get_job_event_hub() -> JobEventHub:
+    """Return this process's event hub"""
+    global _job_event_hub
+    if _job_event_hub is None:
+        from ..core.database import background_engine
+        _job_event_hub = JobEventHub(background_engine)
+    return _job_event_hub
@@ -0,0 +1,140 @@
+import uuid
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import select, insert, update
+from sqlalchemy.orm import Session
+
+from ..models.extraction import ExtractionJob, ExtractionStatus, ExtractedData, ExtractionPage
+from .token_store import TokenPage, pack_tokens
+from .webhook_outbox import FinishedJob, enqueue_job_events
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobOutcome:
+    """
+    Everything a finished extraction writes to the database.
+
+    Built without touching the job's rows, so it can be computed in a worker
+    process and persisted later, together with the outcomes of other jobs.
+    """
+    job_id: str
+    status: ExtractionStatus
+    error_message: Optional[str] = None
+    pipeline_key: Optional[str] = None
+    extra_metadata: Optional[Dict[str, Any]] = None
+    processing_seconds: Optional[float] = None  # Time spent extracting; None when nothing was extracted
+    extracted_data: List[Dict[str, Any]] = field(default_factory=list)  # extraction_data rows
+    pages: List[Dict[str, Any]] = field(default_factory=list)  # extraction_pages rows
+
+    def add_fields(self, fields: Dict[str, Dict[str, Any]], now: Optional[datetime] = None) -> None:
+        """Add extracted fields as rows"""
+        now = now or datetime.utcnow()
+        for field_name, data in fields.items():
+            self.extracted_data.append({
+                "id": str(uuid.uuid4()),
+                "field_name": field_name,
+                "field_type": data.get("field_type", "text"),
+                "extracted_value": data["value"],
+                "confidence": data["confidence"],
+                "is_valid": data.get("is_valid", True),
+                "validation_errors": data.get("validation_errors"),
+                "extra_metadata": data.get("metadata"),
+                "job_id": self.job_id,
+                "created_at": now,
+                "updated_at": now,
+            })
+
+    def add_pages(self, token_pages: List[TokenPage], now: Optional[datetime] = None) -> None:
+        """Add the words of every page as packed rows"""
+        now = now or datetime.utcnow()
+        for token_page in token_pages:
+            self.pages.append({
+                "id": str(uuid.uuid4()),
+                "page_number": token_page.page,
+                "source": token_page.source,
+                "width": token_page.width,
+                "height": token_page.height,
+                "word_count": len(token_page.words["text"]),
+                "tokens": pack_tokens(token_page.words),
+                "job_id": self.job_id,
+                "created_at": now,
+            })
+
+
+def persist_outcomes(db: Session, outcomes: List[JobOutcome], lease_owner: Optional[str] = None) -> List[JobOutcome]:
+    """
+    Write the outcomes of any number of jobs in one transaction.
+
+    Extracted data and pages go in with one executemany INSERT each and the
+    jobs' final states with one executemany UPDATE; their webhook events are
+    added to the outbox, then everything is committed once. When
+    `lease_owner` is given, outcomes of jobs whose lease was lost (another
+    worker re-claimed them) are dropped: that run's result wins.
+
+    Returns:
+        The outcomes that were written
+    """
+    if not outcomes:
+        return []
+
+    if lease_owner is not None:
+        query = select(ExtractionJob.id).where(
+            ExtractionJob.id.in_([outcome.job_id for outcome in outcomes]),
+            ExtractionJob.lease_owner == lease_owner
+        )
+        if db.get_bind().dialect.name == "postgresql":
+            query = query.with_for_update()
+        held = set(db.execute(query).scalars().all())
+        for outcome in outcomes:
+            if outcome.job_id not in held:
+                logger.warning(f"Lease on extraction job {outcome.job_id} was lost, discarding its result")
+        outcomes = [outcome for outcome in outcomes if outcome.job_id in held]
+        if not outcomes:
+            db.rollback()
+            return []
+
+    try:
+        data_rows = [row for outcome in outcomes for row in outcome.extracted_data]
+        if data_rows:
+            db.execute(insert(ExtractedData), data_rows)
+        page_rows = [row for outcome in outcomes for row in outcome.pages]
+        if page_rows:
+            db.execute(insert(ExtractionPage), page_rows)
+
+        now = datetime.utcnow()
+        job_rows = [
+            {
+                "id": outcome.job_id,
+                "status": outcome.status,
+                "error_message": outcome.error_message,
+                "pipeline_key": outcome.pipeline_key,
+                "extra_metadata": outcome.extra_metadata,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "finished_at": now,
+                "processing_seconds": outcome.processing_seconds,
+                "updated_at": now,
+            }
+            for outcome in outcomes
+        ]
+        # Failed jobs keep the progress they reached; rows of one UPDATE must share their keys
+        completed = [{**row, "progress": 100.0} for row in job_rows if row["status"] == ExtractionStatus.COMPLETED]
+        others = [row for row in job_rows if row["status"] != ExtractionStatus.COMPLETED]
+        for rows in (completed, others):
+            if rows:
+                db.execute(update(ExtractionJob), rows)
+        enqueue_job_events(db, [
+            FinishedJob(outcome.job_id, outcome.status, outcome.error_message, outcome.extracted_data)
+            for outcome in outcomes
+        ], now)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return outcomes
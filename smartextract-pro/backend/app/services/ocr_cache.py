@@ -0,0 +1,162 @@
+import os
+import json
+import zlib
+import uuid
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+
+from ..core.config import settings
+from .ocr_data import OCRData
+
+logger = logging.getLogger(__name__)
+
+
+def make_ocr_cache_key(
+    source_hash: str,
+    preprocessing: Dict[str, Any],
+    engine_version: str,
+    lang: str,
+    psm: int
+) -> str:
+    """Build the cache key for one OCR call"""
+    key = {
+        "source": source_hash,
+        "preprocessing": preprocessing,
+        "engine": engine_version,
+        "lang": lang,
+        "psm": psm,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class OCRCache:
+    """Interface for OCR result caches"""
+
+    def get(self, key: str) -> Optional[OCRData]:
+        """Return the cached OCR output for a key, or None"""
+        raise NotImplementedError
+
+    def put(self, key: str, value: OCRData) -> None:
+        """Store the OCR output for a key"""
+        raise NotImplementedError
+
+
+class NullOCRCache(OCRCache):
+    """Cache that never stores anything"""
+
+    def get(self, key: str) -> Optional[OCRData]:
+        return None
+
+    def put(self, key: str, value: OCRData) -> None:
+        pass
+
+
+class DiskLRUCache(OCRCache):
+    """
+    On-disk OCR cache with least-recently-used eviction.
+
+    Entries are compressed JSON files sharded by the first two characters of
+    the key. Reads bump the file's modification time, and once the total size
+    passes `max_bytes` the least recently used entries are removed until the
+    cache is back under 90% of the limit. Writes are atomic, so several worker
+    processes can share one directory.
+    """
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        Initialize the cache
+
+        Args:
+            directory: Directory holding the cache entries
+            max_bytes: Maximum total size of the entries in bytes
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size: Optional[int] = None  # Estimated total size, computed lazily
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json.z")
+
+    def get(self, key: str) -> Optional[OCRData]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+            os.utime(path)  # Mark as recently used
+            return json.loads(zlib.decompress(payload))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable OCR cache entry {key}: {e}")
+            self._remove(path)
+            return None
+
+    def put(self, key: str, value: OCRData) -> None:
+        path = self._path(key)
+        payload = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "wb") as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write OCR cache entry {key}: {e}")
+            self._remove(temp_path)
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(payload)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> List[os.DirEntry]:
+        entries = []
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                entries.extend(entry for entry in os.scandir(shard.path) if entry.name.endswith(".json.z"))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until under 90% of the limit"""
+        entries = [(entry.stat(), entry.path) for entry in self._entries()]
+        entries.sort(key=lambda item: item[0].st_mtime)
+
+        total = sum(stat.st_size for stat, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for stat, path in entries:
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= stat.st_size
+                removed += 1
+
+        self._size = total
+        logger.info(f"Evicted {removed} OCR cache entries")
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+
+@lru_cache(maxsize=1)
+def get_ocr_cache() -> OCRCache:
+    """Return the OCR cache configured in settings"""
+    if not settings.OCR_CACHE_ENABLED:
+        return NullOCRCache()
+    return DiskLRUCache(settings.OCR_CACHE_DIR, settings.OCR_CACHE_MAX_BYTES)
@@ -0,0 +1,74 @@
+from typing import Dict, Any, List, Sequence, Tuple
+
+# Word-level OCR output in columnar form, as produced by tesseract's
+# image_to_data: one list per column, one entry per word.
+OCRData = Dict[str, List[Any]]
+OCR_DATA_COLUMNS = ("text", "left", "top", "width", "height", "conf", "block_num", "par_num", "line_num")
+
+# Pixel box: left, top, width, height
+Box = Tuple[int, int, int, int]
+
+
+def empty_ocr_data() -> OCRData:
+    """OCR output with no words"""
+    return {column: [] for column in OCR_DATA_COLUMNS}
+
+
+def words_only(raw: Dict[str, List[Any]]) -> OCRData:
+    """Keep the word-level entries of tesseract output"""
+    keep = [i for i, text in enumerate(raw["text"]) if str(text).strip()]
+    data = {column: [raw[column][i] for i in keep] for column in OCR_DATA_COLUMNS}
+    data["conf"] = [float(conf) for conf in data["conf"]]
+    return data
+
+
+def select_words(data: OCRData, indices: Sequence[int]) -> OCRData:
+    """Subset of the words, in the given order"""
+    return {column: [data[column][i] for i in indices] for column in OCR_DATA_COLUMNS}
+
+
+def words_in_box(data: OCRData, box: Box) -> OCRData:
+    """Words whose center lies inside a pixel box"""
+    left, top, width, height = box
+    indices = [
+        i for i in range(len(data["text"]))
+        if left <= data["left"][i] + data["width"][i] / 2 < left + width
+        and top <= data["top"][i] + data["height"][i] / 2 < top + height
+    ]
+    return select_words(data, indices)
+
+
+def to_text(data: OCRData) -> str:
+    """Rebuild plain text from word-level OCR output"""
+    lines: List[str] = []
+    current_line = None
+    words: List[str] = []
+    for i, text in enumerate(data["text"]):
+        line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        if line != current_line and words:
+            lines.append(" ".join(words))
+            words = []
+        current_line = line
+        words.append(str(text))
+    if words:
+        lines.append(" ".join(words))
+    return "\n".join(lines)
+
+
+def mean_confidence(data: OCRData) -> float:
+    """Mean word confidence on a 0 to 1 scale"""
+    confidences = [conf for conf in data["conf"] if conf >= 0]
+    if not confidences:
+        return 0.0
+    return round(sum(confidences) / len(confidences) / 100.0, 4)
+
+
+def bounding_box(data: OCRData) -> Box:
+    """Box around all words, or an empty box when there are none"""
+    if not data["text"]:
+        return (0, 0, 0, 0)
+    left = min(data["left"])
+    top = min(data["top"])
+    right = max(l + w for l, w in zip(data["left"], data["width"]))
+    bottom = max(t + h for t, h in zip(data["top"], data["height"]))
+    return (left, top, right - left, bottom - top)
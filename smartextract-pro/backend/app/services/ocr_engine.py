@@ -0,0 +1,210 @@
+import atexit
+import logging
+import threading
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+import pytesseract
+
+from ..core.config import settings
+from .ocr_data import OCRData, empty_ocr_data, words_only
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tesserocr
+except ImportError:  # Optional: needs libtesseract at build time
+    tesserocr = None
+
+# Engine version in pipeline settings when tesseract cannot be run
+UNAVAILABLE_VERSION = "unavailable"
+
+
+class OCRTimeout(Exception):
+    """Recognition was stopped because it ran past its time limit"""
+
+
+class OCREngine:
+    """Interface for word-level OCR engines"""
+    name = "base"
+
+    def version(self) -> str:
+        """Engine and tesseract version, part of every OCR cache key"""
+        raise NotImplementedError
+
+    def image_to_data(self, image: np.ndarray, psm: int, timeout: Optional[float] = None) -> OCRData:
+        """
+        Recognize a grayscale image and return its words with boxes
+
+        Raises:
+            OCRTimeout: Recognition took longer than `timeout` seconds
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release resources held by the engine"""
+
+
+class PytesseractEngine(OCREngine):
+    """
+    Runs the tesseract command line through pytesseract.
+
+    Every call starts a tesseract process, which writes the image to a
+    temporary file and loads the language model again; used when no
+    in-process binding is installed.
+    """
+    name = "pytesseract"
+
+    def __init__(self, lang: str):
+        self.lang = lang
+
+    def version(self) -> str:
+        return f"{self.name}:{pytesseract.get_tesseract_version()}"
+
+    def image_to_data(self, image: np.ndarray, psm: int, timeout: Optional[float] = None) -> OCRData:
+        try:
+            raw = pytesseract.image_to_data(
+                image,
+                lang=self.lang,
+                config=f"--psm {psm}",
+                output_type=pytesseract.Output.DICT,
+                timeout=timeout or 0  # The tesseract process is killed when it runs past this
+            )
+        except RuntimeError as e:
+            if "timeout" in str(e).lower():
+                raise OCRTimeout(f"OCR timed out after {timeout:.1f}s") from e
+            raise
+        return words_only(raw)
+
+
+class TesserocrEngine(OCREngine):
+    """
+    Runs tesseract in-process through the tesserocr binding.
+
+    Tesseract API handles are not thread-safe, so the engine keeps a small
+    pool of them: a call borrows a handle (creating one only when all are
+    busy), so the language model is loaded once per concurrent caller and
+    reused for every following image. Images are passed as raw pixels, with
+    no temporary file or encoding.
+    """
+    name = "tesserocr"
+
+    def __init__(self, lang: str):
+        self.lang = lang
+        self._idle: List["tesserocr.PyTessBaseAPI"] = []
+        self._all: List["tesserocr.PyTessBaseAPI"] = []
+        self._lock = threading.Lock()
+
+    def version(self) -> str:
+        return f"{self.name}:{tesserocr.tesseract_version().split()[1]}"
+
+    def _acquire(self) -> "tesserocr.PyTessBaseAPI":
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        api = tesserocr.PyTessBaseAPI(lang=self.lang)
+        with self._lock:
+            self._all.append(api)
+        return api
+
+    def _release(self, api: "tesserocr.PyTessBaseAPI") -> None:
+        with self._lock:
+            self._idle.append(api)
+
+    def image_to_data(self, image: np.ndarray, psm: int, timeout: Optional[float] = None) -> OCRData:
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+
+        api = self._acquire()
+        try:
+            api.SetPageSegMode(psm)
+            api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+            # Tesseract checks the deadline while recognizing and gives up cleanly
+            recognized = api.Recognize(int(timeout * 1000) if timeout else 0)
+            if not recognized and timeout:
+                api.Clear()
+                raise OCRTimeout(f"OCR timed out after {timeout:.1f}s")
+            data = self._collect_words(api)
+            api.Clear()
+        finally:
+            self._release(api)
+        return data
+
+    @staticmethod
+    def _collect_words(api: "tesserocr.PyTessBaseAPI") -> OCRData:
+        """Words in the same columnar layout as pytesseract's image_to_data"""
+        data = empty_ocr_data()
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+
+        level = tesserocr.RIL.WORD
+        block_num = par_num = line_num = 0
+        for word in tesserocr.iterate_level(iterator, level):
+            if word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                block_num, par_num, line_num = block_num + 1, 0, 0
+            if word.IsAtBeginningOf(tesserocr.RIL.PARA):
+                par_num, line_num = par_num + 1, 0
+            if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                line_num += 1
+
+            text = word.GetUTF8Text(level)
+            box = word.BoundingBox(level)
+            if not text or not text.strip() or box is None:
+                continue
+            left, top, right, bottom = box
+            data["text"].append(text.strip())
+            data["left"].append(left)
+            data["top"].append(top)
+            data["width"].append(right - left)
+            data["height"].append(bottom - top)
+            data["conf"].append(float(word.Confidence(level)))
+            data["block_num"].append(block_num)
+            data["par_num"].append(max(par_num, 1))
+            data["line_num"].append(max(line_num, 1))
+        return data
+
+    def close(self) -> None:
+        with self._lock:
+            apis, self._all, self._idle = self._all, [], []
+        for api in apis:
+            api.End()
+
+
+@lru_cache(maxsize=1)
+def get_ocr_engine() -> OCREngine:
+    """
+    Return this process's OCR engine, as configured by OCR_ENGINE.
+
+    "auto" uses tesserocr when it is installed and falls back to pytesseract.
+    """
+    choice = settings.OCR_ENGINE.lower()
+    if choice not in ("auto", "tesserocr", "pytesseract"):
+        raise ValueError(f"Unknown OCR engine: {settings.OCR_ENGINE}")
+
+    engine: OCREngine
+    if choice != "pytesseract" and tesserocr is not None:
+        engine = TesserocrEngine(settings.OCR_LANGUAGE)
+    else:
+        if choice == "tesserocr":
+            logger.warning("tesserocr is not installed, falling back to pytesseract")
+        engine = PytesseractEngine(settings.OCR_LANGUAGE)
+
+    atexit.register(engine.close)
+    logger.info(f"Using OCR engine {engine.name}")
+    return engine
+
+
+def engine_version() -> str:
+    """
+    Version of this process's OCR engine, or UNAVAILABLE_VERSION when
+    tesseract cannot be run. Documents that need no OCR (PDFs with a text
+    layer) are still extracted then; the others fail when they are OCR'd.
+    """
+    try:
+        return get_ocr_engine().version()
+    except OSError as e:
+        logger.warning(f"OCR engine is unavailable: {e}")
+        return UNAVAILABLE_VERSION
@@ -0,0 +1,227 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from .ocr_data import OCRData, empty_ocr_data
+
+logger = logging.getLogger(__name__)
+
+# Where a page's words came from
+SOURCE_TEXT_LAYER = "text_layer"
+SOURCE_OCR = "ocr"
+SOURCE_OCR_CACHE = "ocr_cache"
+
+# Characters PDF producers emit for glyphs without a usable unicode mapping
+UNMAPPED_CHARS = {"\ufffd", "\x00"}
+
+# Callbacks used by the pipeline
+PageLookup = Callable[[int], Optional[OCRData]]  # page index -> cached result, or None
+PageOCR = Callable[[int, np.ndarray], Optional[OCRData]]  # page index, grayscale raster -> OCR output, or None if abandoned
+PageDone = Callable[[int, int], None]  # pages done, total pages
+StopCheck = Callable[[], bool]  # True once remaining pages should be skipped
+
+
+def page_sizes(file_path: str, dpi: int) -> List[Tuple[int, int]]:
+    """Width and height in pixels at `dpi` of every page"""
+    with fitz.open(file_path) as pdf:
+        return [
+            (int(round(page.rect.width * dpi / 72.0)), int(round(page.rect.height * dpi / 72.0)))
+            for page in pdf
+        ]
+
+
+def render_page(page: "fitz.Page", dpi: int) -> np.ndarray:
+    """Rasterize one page to a grayscale image at the given DPI"""
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+    return image[:, :pix.width]
+
+
+def extract_text_layer(page: "fitz.Page", dpi: int, min_chars: int) -> Optional[OCRData]:
+    """
+    Read the words of a page's native text layer with their positions.
+
+    Words are assembled from the per-character boxes and scaled to pixel
+    coordinates at `dpi`, so they line up with OCR output for the same page.
+
+    Returns:
+        Word-level data in the same columnar format as OCR output, or None
+        when the page has no usable text (scanned page, unmapped fonts, ...)
+    """
+    scale = dpi / 72.0
+    data = empty_ocr_data()
+    total_chars = 0
+    unmapped_chars = 0
+
+    def add_word(chars, block_num: int, line_num: int) -> None:
+        x0 = min(char["bbox"][0] for char in chars)
+        y0 = min(char["bbox"][1] for char in chars)
+        x1 = max(char["bbox"][2] for char in chars)
+        y1 = max(char["bbox"][3] for char in chars)
+        data["text"].append("".join(char["c"] for char in chars))
+        data["left"].append(int(round(x0 * scale)))
+        data["top"].append(int(round(y0 * scale)))
+        data["width"].append(max(1, int(round((x1 - x0) * scale))))
+        data["height"].append(max(1, int(round((y1 - y0) * scale))))
+        data["conf"].append(100.0)
+        data["block_num"].append(block_num)
+        data["par_num"].append(1)
+        data["line_num"].append(line_num)
+
+    raw = page.get_text("rawdict")
+    for block_num, block in enumerate(raw.get("blocks", []), start=1):
+        if block.get("type") != 0:  # Image block
+            continue
+        for line_num, line in enumerate(block.get("lines", []), start=1):
+            word = []
+            for span in line.get("spans", []):
+                for char in span.get("chars", []):
+                    if char["c"].isspace():
+                        if word:
+                            add_word(word, block_num, line_num)
+                            word = []
+                        continue
+                    total_chars += 1
+                    if char["c"] in UNMAPPED_CHARS:
+                        unmapped_chars += 1
+                    word.append(char)
+            if word:
+                add_word(word, block_num, line_num)
+
+    if total_chars < min_chars or unmapped_chars > total_chars * 0.1:
+        return None
+    return data
+
+
+def load_page(
+    file_path: str,
+    index: int,
+    dpi: int,
+    text_layer_min_chars: Optional[int] = None
+) -> Tuple[Optional[OCRData], Optional[np.ndarray], int, int]:
+    """
+    Load a single page, preferring its text layer over rasterizing it.
+
+    Returns:
+        Text layer words (or None), raster (None when the text layer was
+        usable), and the page size in pixels at `dpi`
+    """
+    with fitz.open(file_path) as pdf:
+        if not 0 <= index < pdf.page_count:
+            raise ValueError(f"PDF has no page {index + 1}")
+        page = pdf[index]
+        width = int(round(page.rect.width * dpi / 72.0))
+        height = int(round(page.rect.height * dpi / 72.0))
+
+        if text_layer_min_chars is not None:
+            words = extract_text_layer(page, dpi, text_layer_min_chars)
+            if words is not None:
+                return words, None, width, height
+
+        image = render_page(page, dpi)
+        return None, image, image.shape[1], image.shape[0]
+
+
+def ocr_pdf_pages(
+    file_path: str,
+    dpi: int,
+    ocr_page: PageOCR,
+    max_workers: int,
+    lookup_page: Optional[PageLookup] = None,
+    on_page_done: Optional[PageDone] = None,
+    text_layer_min_chars: Optional[int] = None,
+    should_stop: Optional[StopCheck] = None
+) -> Tuple[List[Optional[OCRData]], List[Optional[str]]]:
+    """
+    Extract the words of every page of a PDF, OCR'ing in parallel with bounded memory.
+
+    When `text_layer_min_chars` is set, pages whose native text layer has at
+    least that many usable characters are read directly and never OCR'd.
+    Remaining pages are looked up with `lookup_page` (e.g. in the OCR cache),
+    and only pages still missing are rasterized lazily on the calling thread
+    and OCR'd on a pool of `max_workers` threads (tesseract and OpenCV release
+    the GIL). At most `max_workers` rendered pages are in flight at any time,
+    so memory stays flat regardless of the page count. `on_page_done` and
+    `should_stop` are always called from the calling thread, so they may use
+    the caller's database session.
+
+    Once `should_stop` returns True (or `ocr_page` abandons a page by
+    returning None), no further pages are started; pages already being
+    OCR'd are allowed to finish.
+
+    Returns:
+        Word-level data per page and the source of each page, in page order;
+        both are None for pages that were not extracted
+    """
+    results: Dict[int, OCRData] = {}
+    sources: Dict[int, str] = {}
+    window = max(1, max_workers)
+    pending: Dict[Future, int] = {}
+    stopped = False
+
+    with fitz.open(file_path) as pdf:
+        total = pdf.page_count
+
+        def page_finished(index: int, data: OCRData, source: str) -> None:
+            results[index] = data
+            sources[index] = source
+            if on_page_done is not None:
+                on_page_done(len(results), total)
+
+        def collect(done_futures) -> None:
+            nonlocal stopped
+            for future in done_futures:
+                index = pending.pop(future)
+                data = None if future.cancelled() else future.result()
+                if data is None:
+                    stopped = True
+                else:
+                    page_finished(index, data, SOURCE_OCR)
+
+        def stop_requested() -> bool:
+            nonlocal stopped
+            stopped = stopped or (should_stop is not None and should_stop())
+            if stopped:
+                for future in pending:
+                    future.cancel()  # Only cancels pages not started yet
+            return stopped
+
+        with ThreadPoolExecutor(max_workers=window, thread_name_prefix="pdf-ocr") as executor:
+            try:
+                for index in range(total):
+                    if stop_requested():
+                        break
+                    page = pdf[index]
+
+                    if text_layer_min_chars is not None:
+                        text_layer = extract_text_layer(page, dpi, text_layer_min_chars)
+                        if text_layer is not None:
+                            page_finished(index, text_layer, SOURCE_TEXT_LAYER)
+                            continue
+
+                    cached = lookup_page(index) if lookup_page is not None else None
+                    if cached is not None:
+                        page_finished(index, cached, SOURCE_OCR_CACHE)
+                        continue
+
+                    while len(pending) >= window:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    if stop_requested():
+                        break
+                    image = render_page(page, dpi)
+                    pending[executor.submit(ocr_page, index, image)] = index
+                    del image  # The worker holds the only reference now
+
+                while pending:
+                    stop_requested()
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    return [results.get(index) for index in range(total)], [sources.get(index) for index in range(total)]
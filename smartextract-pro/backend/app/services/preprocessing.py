@@ -0,0 +1,300 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from .image_source import ImageSource, DecodedImageSource, open_bmp
+
+logger = logging.getLogger(__name__)
+
+# Stages in the order they run, with their default parameters. The first
+# three work on the page geometry and run once per page; binarize and
+# denoise run on every image handed to the OCR engine.
+STAGE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "decode": {"reduce": 1},  # Decode straight to grayscale at 1/reduce of the resolution
+    "resample": {"dpi": 300, "source_dpi": None},  # source_dpi: resolution of scanned images
+    "deskew": {"max_angle": 5.0},
+    "binarize": {"method": "otsu", "threshold": 150, "block_size": 31, "c": 10, "invert": False},
+    "denoise": {"size": 3},  # Median filter aperture
+}
+BINARIZE_METHODS = ("otsu", "adaptive", "fixed")
+
+DECODE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# Long side of the thumbnail used to estimate the skew angle
+SKEW_ESTIMATE_SIZE = 1000
+
+
+def normalize_stages(stages: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Validate stage definitions and fill in default parameters.
+
+    Each stage is a dict such as {"stage": "binarize", "method": "adaptive"}.
+    Stages may be listed at most once and always run in the order of
+    STAGE_DEFAULTS, so the result is a canonical form usable in cache keys.
+
+    Raises:
+        ValueError: Unknown stage or parameter, or invalid parameter value
+    """
+    by_name: Dict[str, Dict[str, Any]] = {}
+    for stage in stages:
+        name = stage.get("stage")
+        if name not in STAGE_DEFAULTS:
+            raise ValueError(f"Unknown preprocessing stage: {name}")
+        if name in by_name:
+            raise ValueError(f"Preprocessing stage listed twice: {name}")
+        params = {key: value for key, value in stage.items() if key != "stage"}
+        unknown = set(params) - set(STAGE_DEFAULTS[name])
+        if unknown:
+            raise ValueError(f"Unknown parameters for preprocessing stage {name}: {', '.join(sorted(unknown))}")
+        by_name[name] = {**STAGE_DEFAULTS[name], **{key: value for key, value in params.items() if value is not None}}
+
+    by_name.setdefault("decode", dict(STAGE_DEFAULTS["decode"]))
+    if by_name["decode"]["reduce"] not in DECODE_FLAGS:
+        raise ValueError(f"decode reduce must be one of {sorted(DECODE_FLAGS)}")
+    if "binarize" in by_name:
+        binarize = by_name["binarize"]
+        if binarize["method"] not in BINARIZE_METHODS:
+            raise ValueError(f"binarize method must be one of {', '.join(BINARIZE_METHODS)}")
+        if binarize["block_size"] < 3 or binarize["block_size"] % 2 == 0:
+            raise ValueError("binarize block_size must be an odd number of at least 3")
+    if "denoise" in by_name and (by_name["denoise"]["size"] < 3 or by_name["denoise"]["size"] % 2 == 0):
+        raise ValueError("denoise size must be an odd number of at least 3")
+
+    return [{"stage": name, **by_name[name]} for name in STAGE_DEFAULTS if name in by_name]
+
+
+class StageTimings:
+    """Wall time spent in each stage, summed over every image of a job"""
+
+    def __init__(self):
+        self._seconds: Dict[str, float] = {}
+        self._calls: Dict[str, int] = {}
+        self._lock = threading.Lock()  # PDF pages are preprocessed on several threads
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._seconds[stage] = self._seconds.get(stage, 0.0) + elapsed
+                self._calls[stage] = self._calls.get(stage, 0) + 1
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                stage: {"ms": round(seconds * 1000, 1), "calls": self._calls[stage]}
+                for stage, seconds in self._seconds.items()
+            }
+
+
+class PreprocessingPipeline:
+    """
+    Declarative image preprocessing ahead of OCR.
+
+    Pages go through the geometry stages once (prepare_page); every image
+    passed to the OCR engine, whether a full page or a canvas of stitched
+    regions, then goes through the binarize and denoise stages (prepare_for_ocr).
+    Stages work in place where OpenCV allows it and each one is timed.
+    """
+    def __init__(self, stages: Sequence[Dict[str, Any]]):
+        self.stages = normalize_stages(stages)
+        self._params = {stage["stage"]: stage for stage in self.stages}
+        self.timings = StageTimings()
+
+    @property
+    def spec(self) -> List[Dict[str, Any]]:
+        """Canonical stage list, part of OCR cache and pipeline keys"""
+        return self.stages
+
+    @property
+    def target_dpi(self) -> Optional[int]:
+        """Resolution pages are resampled to, if any"""
+        resample = self._params.get("resample")
+        return resample["dpi"] if resample else None
+
+    @property
+    def source_dpi(self) -> Optional[float]:
+        """Resolution of decoded scanned images, if configured"""
+        source_dpi = self._params.get("resample", {}).get("source_dpi")
+        return source_dpi / self._params["decode"]["reduce"] if source_dpi else None
+
+    def params(self, stage: str) -> Optional[Dict[str, Any]]:
+        """Parameters of a stage, or None when the pipeline does not have it"""
+        return self._params.get(stage)
+
+    def load_image(self, file_path: str) -> np.ndarray:
+        """Decode an image file and run the geometry stages"""
+        reduce = self._params["decode"]["reduce"]
+        with self.timings.measure("decode"):
+            gray = cv2.imread(file_path, DECODE_FLAGS[reduce])
+        if gray is None:
+            raise ValueError("Could not read image")
+
+        return self.prepare_page(gray, self.source_dpi)
+
+    def open_image(self, file_path: str) -> ImageSource:
+        """
+        Open an image file for reading, without the geometry stages.
+
+        Uncompressed BMPs are read region by region from the file; other
+        formats are decoded straight to grayscale in one piece.
+        """
+        reduce = self._params["decode"]["reduce"]
+        with self.timings.measure("decode"):
+            source = open_bmp(file_path, reduce)
+            if source is None:
+                gray = cv2.imread(file_path, DECODE_FLAGS[reduce])
+                if gray is None:
+                    raise ValueError("Could not read image")
+                source = DecodedImageSource(gray)
+        return source
+
+    def prepare_page(self, gray: np.ndarray, dpi: Optional[float] = None) -> np.ndarray:
+        """
+        Run the resample and deskew stages on a grayscale page.
+
+        Args:
+            gray: Page image
+            dpi: Resolution of the image; resampling is skipped when unknown
+        """
+        resample = self._params.get("resample")
+        if resample is not None:
+            if dpi:
+                with self.timings.measure("resample"):
+                    gray = resample_to_dpi(gray, dpi, resample["dpi"])
+            else:
+                logger.debug("Image resolution unknown, skipping resample stage")
+
+        deskew_params = self._params.get("deskew")
+        if deskew_params is not None:
+            with self.timings.measure("deskew"):
+                gray = deskew(gray, deskew_params["max_angle"])
+
+        return gray
+
+    def prepare_for_ocr(self, gray: np.ndarray, threshold: Optional[int] = None) -> np.ndarray:
+        """
+        Run the binarize and denoise stages.
+
+        Writable images are modified in place; read-only ones (e.g. rendered
+        PDF pages backed by the renderer's buffer) are copied once.
+
+        Args:
+            gray: Grayscale image
+            threshold: Otsu threshold to apply instead of computing one from
+                `gray`, e.g. that of the whole page for one of its tiles
+        """
+        binarize_params = self._params.get("binarize")
+        denoise_params = self._params.get("denoise")
+        if binarize_params is None and denoise_params is None:
+            return gray
+        if not gray.flags.writeable:
+            gray = gray.copy()
+
+        if binarize_params is not None:
+            params = {key: value for key, value in binarize_params.items() if key != "stage"}
+            if threshold is not None and params["method"] == "otsu":
+                params.update(method="fixed", threshold=threshold)
+            with self.timings.measure("binarize"):
+                binarize(gray, **params)
+        if denoise_params is not None:
+            with self.timings.measure("denoise"):
+                cv2.medianBlur(gray, denoise_params["size"], dst=gray)
+        return gray
+
+
+def resample_to_dpi(gray: np.ndarray, dpi: float, target_dpi: float) -> np.ndarray:
+    """Scale an image from `dpi` to `target_dpi`"""
+    scale = target_dpi / dpi
+    if abs(scale - 1.0) < 0.02:
+        return gray
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+
+
+def estimate_skew(gray: np.ndarray, max_angle: float) -> float:
+    """
+    Estimate the rotation (in degrees, OpenCV convention) that levels the text lines.
+
+    Ink pixels of a thumbnail are projected onto the vertical axis for every
+    candidate angle at once; the angle giving the sharpest row profile (text
+    lines and gaps best separated) wins. A coarse pass is refined around the
+    best angle.
+    """
+    scale = min(1.0, SKEW_ESTIMATE_SIZE / max(gray.shape))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    ys, xs = np.nonzero(ink)
+    if len(xs) < 100:
+        return 0.0
+    xs = xs.astype(np.float32) - small.shape[1] / 2
+    ys = ys.astype(np.float32)
+
+    def best_angle(angles: np.ndarray) -> float:
+        radians = np.deg2rad(angles).astype(np.float32)[:, None]
+        # Row of every ink pixel after rotating by each candidate angle
+        rows = np.rint(ys * np.cos(radians) - xs * np.sin(radians)).astype(np.int64)
+        rows -= rows.min()
+        bins = int(rows.max()) + 1
+        rows += np.arange(len(angles))[:, None] * bins
+        profiles = np.bincount(rows.ravel(), minlength=len(angles) * bins).reshape(len(angles), bins)
+        scores = np.square(profiles, dtype=np.float64).sum(axis=1)
+        return float(angles[int(np.argmax(scores))])
+
+    coarse = best_angle(np.arange(-max_angle, max_angle + 0.5, 0.5))
+    return round(best_angle(np.arange(coarse - 0.5, coarse + 0.55, 0.1)), 2)
+
+
+def deskew(gray: np.ndarray, max_angle: float) -> np.ndarray:
+    """Rotate a page so its text lines are horizontal"""
+    angle = estimate_skew(gray, max_angle)
+    if abs(angle) < 0.1:
+        return gray
+    height, width = gray.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        gray, matrix, (width, height),
+        flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=255
+    )
+
+
+def otsu_threshold(histogram: np.ndarray) -> int:
+    """Otsu threshold of a 256-bin gray level histogram, as cv2.THRESH_OTSU computes it for an image"""
+    total = histogram.sum()
+    if total == 0:
+        return 0
+    probabilities = histogram.astype(np.float64) / total
+    levels = np.arange(256, dtype=np.float64)
+    weight = np.cumsum(probabilities)
+    cumulative_mean = np.cumsum(probabilities * levels)
+    mean = cumulative_mean[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (mean * weight - cumulative_mean) ** 2 / (weight * (1.0 - weight))
+    variance[~np.isfinite(variance)] = 0.0
+    return int(np.argmax(variance))
+
+
+def binarize(gray: np.ndarray, method: str, threshold: int, block_size: int, c: int, invert: bool) -> np.ndarray:
+    """Binarize a grayscale image in place"""
+    threshold_type = cv2.THRESH_BINARY_INV if invert else cv2.THRESH_BINARY
+    if method == "otsu":
+        cv2.threshold(gray, 0, 255, threshold_type | cv2.THRESH_OTSU, dst=gray)
+    elif method == "adaptive":
+        # Local threshold: copes with shadows and uneven lighting
+        cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, threshold_type, block_size, c, dst=gray)
+    else:
+        cv2.threshold(gray, threshold, 255, threshold_type, dst=gray)
+    return gray
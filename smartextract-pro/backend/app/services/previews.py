@@ -0,0 +1,234 @@
+import os
+import uuid
+import asyncio
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from ..core.config import settings
+from ..models.document import Document
+from .image_source import open_bmp
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_FILE_TYPES = {"pdf", "jpg", "jpeg", "png", "tiff", "bmp"}
+PREVIEW_MEDIA_TYPE = "image/jpeg"
+
+# Previews that could not be made, remembered per process
+FAILURES_KEPT = 1024
+
+
+class PreviewUnavailable(ValueError):
+    """No preview can be made: the file type has none, the page does not exist or the file cannot be rendered"""
+
+
+class PreviewsBusy(RuntimeError):
+    """Too many previews are being rendered to take on another"""
+
+
+def preview_key(storage_key: str, page: int, size: int) -> str:
+    """
+    Storage key of a preview: next to the original, whose key holds the
+    content hash, by page and size. Documents with the same contents share
+    their previews, and the storage sweep deletes them with the original.
+    """
+    return f"{storage_key}.p{page}.w{size}.jpg"
+
+
+def preview_etag(content_hash: str, page: int, size: int) -> str:
+    return f'"{content_hash}.p{page}.w{size}"'
+
+
+def render_preview(file_path: str, file_type: str, page: int, size: int) -> np.ndarray:
+    """
+    A page of a document scaled so its long side is `size` pixels (images
+    are not scaled up).
+
+    Raises:
+        PreviewUnavailable: The page does not exist
+    """
+    if file_type == "pdf":
+        with fitz.open(file_path) as pdf:
+            if not 1 <= page <= pdf.page_count:
+                raise PreviewUnavailable(f"Page {page} does not exist")
+            pdf_page = pdf[page - 1]
+            zoom = size / max(pdf_page.rect.width, pdf_page.rect.height)
+            pix = pdf_page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+            rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width * 3]
+            return cv2.cvtColor(rgb.reshape(pix.height, pix.width, 3), cv2.COLOR_RGB2BGR)
+
+    if page != 1:
+        raise PreviewUnavailable(f"Page {page} does not exist")
+    source = open_bmp(file_path)
+    if source is not None:
+        return source.thumbnail(size)  # Read in bands, so huge scans stay within bounded memory
+    image = cv2.imread(file_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise PreviewUnavailable("Could not read image")
+    scale = size / max(image.shape[:2])
+    if scale < 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return image
+
+
+def generate_preview(storage_key: str, file_type: str, page: int, size: int) -> None:
+    """Render a preview and store it, unless it is stored already; runs in a preview process"""
+    storage = get_storage()
+    key = preview_key(storage_key, page, size)
+    if storage.exists(key):
+        return
+
+    with storage.local_path(storage_key) as file_path:
+        try:
+            image = render_preview(file_path, file_type, page, size)
+        except (PreviewUnavailable, OSError):
+            raise
+        except Exception as e:
+            # Damaged or unsupported contents: rendering again would fail again
+            logger.warning(f"Could not render preview of {storage_key}: {e}")
+            raise PreviewUnavailable("Could not render document") from None
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, settings.PREVIEW_JPEG_QUALITY])
+    if not ok:
+        raise PreviewUnavailable("Could not encode preview")
+
+    temp_path = os.path.join(settings.UPLOAD_FOLDER, f"{uuid.uuid4()}.part")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(encoded.tobytes())
+        storage.put(key, temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class PreviewRenderer:
+    """
+    Renders previews in a small process pool, off the API's event loop and
+    threads.
+
+    Requests for a preview that is being rendered wait for that render
+    instead of starting another, and previews that cannot be made are
+    remembered, so a repeat request never renders again. At most
+    PREVIEW_MAX_PENDING renders are queued or running. When a rendering
+    process dies (e.g. killed for running out of memory) the pool is
+    replaced, like ExtractionWorkerPool.restart.
+    """
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.max_workers = max(1, max_workers or settings.PREVIEW_WORKERS)
+        self.max_pending = max_pending or settings.PREVIEW_MAX_PENDING
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight: Dict[str, Future] = {}
+        self._failed: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, storage_key: str, file_type: str, page: int, size: int) -> Future:
+        """
+        Render a preview unless it is being rendered already
+
+        Raises:
+            PreviewsBusy: PREVIEW_MAX_PENDING renders are pending
+        """
+        key = preview_key(storage_key, page, size)
+        with self._lock:
+            if key in self._failed:
+                future: Future = Future()
+                future.set_exception(PreviewUnavailable(self._failed[key]))
+                return future
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            if len(self._in_flight) >= self.max_pending:
+                raise PreviewsBusy(f"{len(self._in_flight)} previews are being rendered")
+            if self._executor is None:
+                self._executor = self._start()
+            executor = self._executor
+            try:
+                future = executor.submit(generate_preview, storage_key, file_type, page, size)
+            except BrokenProcessPool:
+                self._drop(executor)
+                executor = self._executor = self._start()
+                future = executor.submit(generate_preview, storage_key, file_type, page, size)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda done: self._finished(key, done, executor))
+        return future
+
+    def _start(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _drop(self, executor: ProcessPoolExecutor) -> None:
+        """Stop using a broken pool; the next render starts a new one (called with the lock held)"""
+        if self._executor is executor:
+            logger.warning("Preview rendering process died, replacing the pool")
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _finished(self, key: str, future: Future, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            self._in_flight.pop(key, None)
+            error = None if future.cancelled() else future.exception()
+            if isinstance(error, BrokenProcessPool):
+                self._drop(executor)  # Not remembered as failed: a new pool may render it
+            elif isinstance(error, PreviewUnavailable):
+                self._failed[key] = str(error)
+                while len(self._failed) > FAILURES_KEPT:
+                    self._failed.popitem(last=False)
+            elif error is not None:
+                logger.warning(f"Could not render preview {key}: {error}")
+
+    def stop(self) -> None:
+        """Stop the rendering processes, dropping queued renders"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+preview_renderer = PreviewRenderer()
+
+
+async def ensure_preview(document: Document, page: int, size: int) -> str:
+    """
+    Storage key of a preview of a document, rendered first when missing.
+
+    Raises:
+        PreviewUnavailable: The document has no such preview
+        PreviewsBusy: Too many previews are being rendered, or the renderer was restarted
+        asyncio.TimeoutError: Rendering takes longer than PREVIEW_RENDER_TIMEOUT; it goes on
+    """
+    if not document.storage_key or document.file_type.lower() not in PREVIEW_FILE_TYPES:
+        raise PreviewUnavailable("No previews for this document")
+    key = preview_key(document.storage_key, page, size)
+    if await run_in_threadpool(get_storage().exists, key):
+        return key
+
+    future = preview_renderer.submit(document.storage_key, document.file_type.lower(), page, size)
+    # Shielded: other requests may be waiting for the same render
+    try:
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), settings.PREVIEW_RENDER_TIMEOUT)
+    except BrokenProcessPool:
+        raise PreviewsBusy("Preview renderer was restarted") from None
+    return key
+
+
+def render_upload_previews(document: Document) -> None:
+    """Start rendering the first page's previews of a new document (PREVIEW_ON_UPLOAD_SIZES)"""
+    if not document.storage_key or document.file_type.lower() not in PREVIEW_FILE_TYPES:
+        return
+    for name in settings.PREVIEW_ON_UPLOAD_SIZES:
+        size = settings.PREVIEW_SIZES.get(name)
+        if size is None:
+            continue
+        try:
+            preview_renderer.submit(document.storage_key, document.file_type.lower(), 1, size)
+        except PreviewsBusy:
+            return  # Rendered on first request instead
@@ -0,0 +1,252 @@
+import os
+import uuid
+import errno
+import posixpath
+import shutil
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import BinaryIO, Iterator, List, Optional
+
+from ..core.config import settings
+
+COPY_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def content_key(content_hash: str, extension: str) -> str:
+    """
+    Storage key of a file's contents: its SHA-256, sharded by the first two
+    pairs of hex digits (65536 directories of a few hundred files each at
+    ten million files), with the extension tools downstream go by.
+    """
+    content_hash = content_hash.lower()
+    name = f"{content_hash}.{extension}" if extension else content_hash
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{name}"
+
+
+class StorageBackend:
+    """
+    Interface for where document files are kept.
+
+    Files are addressed by key (see content_key) and immutable once stored:
+    the same key always holds the same bytes, so a key that exists never
+    has to be written again. Which files are still referenced is tracked in
+    the database (see app/services/content_store.py), not by backends.
+    """
+
+    def put(self, key: str, source_path: str) -> None:
+        """Store a local file under `key`, taking it over: `source_path` is gone afterwards"""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def size(self, key: str) -> int:
+        """
+        Raises:
+            FileNotFoundError: Nothing is stored under `key`
+        """
+        raise NotImplementedError
+
+    def open(self, key: str) -> BinaryIO:
+        """
+        Open a stored file for reading
+
+        Raises:
+            FileNotFoundError: Nothing is stored under `key`
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """Delete a stored file; deleting a missing key is not an error"""
+        raise NotImplementedError
+
+    def keys(self, prefix: str) -> List[str]:
+        """Keys starting with `prefix`, e.g. the files derived from a stored file (see app/services/previews.py)"""
+        raise NotImplementedError
+
+    def filesystem_path(self, key: str) -> Optional[str]:
+        """Path of a stored file on this machine, or None when the backend keeps files elsewhere"""
+        return None
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        """
+        A path to read a stored file from for the duration of the block, for
+        libraries that need a file name (OpenCV, pdf2image). Backends without
+        local files download a temporary copy.
+
+        Raises:
+            FileNotFoundError: Nothing is stored under `key`
+        """
+        path = self.filesystem_path(key)
+        if path is not None:
+            yield path
+            return
+
+        fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(key)[1], dir=settings.UPLOAD_FOLDER)
+        try:
+            with os.fdopen(fd, "wb") as target, self.open(key) as source:
+                shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+            yield temp_path
+        finally:
+            os.remove(temp_path)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Files under a local directory, at the relative path of their key.
+
+    Files are moved in with an atomic rename where `root` is on the same
+    file system as the source, so a file is never seen half-written.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def put(self, key: str, source_path: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.replace(source_path, path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Different file system: copy next to the target, then rename
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                shutil.copyfile(source_path, temp_path)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            os.remove(source_path)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self._path(key))
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self, prefix: str) -> List[str]:
+        directory, name = posixpath.split(prefix)
+        try:
+            names = os.listdir(self._path(directory) if directory else self.root)
+        except FileNotFoundError:
+            return []
+        return [posixpath.join(directory, entry) for entry in sorted(names) if entry.startswith(name)]
+
+    def filesystem_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+
+class ObjectStoreClient:
+    """
+    The operations ObjectStoreBackend needs from an object store, e.g. a
+    thin wrapper around an S3 or GCS client with a fixed bucket
+    """
+
+    def upload_file(self, source_path: str, key: str) -> None:
+        raise NotImplementedError
+
+    def open(self, key: str) -> BinaryIO:
+        """A readable stream of an object; FileNotFoundError when it does not exist"""
+        raise NotImplementedError
+
+    def size(self, key: str) -> Optional[int]:
+        """Size of an object, or None when it does not exist"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def list_keys(self, prefix: str) -> List[str]:
+        raise NotImplementedError
+
+
+class DirectoryObjectStore(ObjectStoreClient):
+    """
+    Object store emulated on a local directory, standing in for a real one
+    in development and tests. Objects are copies, as they would be remotely.
+    """
+
+    def __init__(self, root: str):
+        self._storage = LocalStorage(root)
+
+    def upload_file(self, source_path: str, key: str) -> None:
+        path = self._storage.filesystem_path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, path)
+
+    def open(self, key: str) -> BinaryIO:
+        return self._storage.open(key)
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self._storage.size(key)
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str) -> None:
+        self._storage.delete(key)
+
+    def list_keys(self, prefix: str) -> List[str]:
+        return self._storage.keys(prefix)
+
+
+class ObjectStoreBackend(StorageBackend):
+    """Files kept in an object store; reading them by path downloads a temporary copy"""
+
+    def __init__(self, client: ObjectStoreClient):
+        self.client = client
+
+    def put(self, key: str, source_path: str) -> None:
+        self.client.upload_file(source_path, key)
+        os.remove(source_path)
+
+    def exists(self, key: str) -> bool:
+        return self.client.size(key) is not None
+
+    def size(self, key: str) -> int:
+        size = self.client.size(key)
+        if size is None:
+            raise FileNotFoundError(key)
+        return size
+
+    def open(self, key: str) -> BinaryIO:
+        return self.client.open(key)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+    def keys(self, prefix: str) -> List[str]:
+        return self.client.list_keys(prefix)
+
+
+@lru_cache(maxsize=1)
+def get_storage() -> StorageBackend:
+    """Return the storage backend configured in settings"""
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.STORAGE_ROOT)
+    if settings.STORAGE_BACKEND == "directory-object-store":
+        return ObjectStoreBackend(DirectoryObjectStore(settings.STORAGE_ROOT))
+    raise ValueError(f"Unknown storage backend: {settings.STORAGE_BACKEND}")
@@ -0,0 +1,322 @@
+import re
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from ..core.config import settings
+from ..models.template import Template
+from .ocr_data import OCRData, Box, select_words, mean_confidence, bounding_box
+
+logger = logging.getLogger(__name__)
+
+# Date formats tried, in order, for date fields
+DATE_FORMATS = (
+    "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d.%m.%Y", "%d-%m-%Y",
+    "%d %b %Y", "%d %B %Y", "%b %d %Y", "%B %d %Y", "%b %d, %Y", "%B %d, %Y",
+)
+CHECKED_MARKS = {"x", "v", "yes", "true", "✓", "✔", "☑", "☒"}
+NUMBER_PATTERN = re.compile(r"[-+]?\d[\d,. ]*")
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^0-9a-z]", "", word.lower())
+
+
+class PageIndex:
+    """
+    Searchable view of one page's words, built once and shared by all fields.
+
+    Holds the page text with the character offset of every word, and a map
+    from normalized word to its positions so keyword lookups do not scan.
+    """
+    def __init__(self, data: OCRData, page_number: int):
+        self.data = data
+        self.page_number = page_number
+        self.normalized = [_normalize_word(str(word)) for word in data["text"]]
+        self.lines = list(zip(data["block_num"], data["par_num"], data["line_num"]))
+        self.positions: Dict[str, List[int]] = {}
+        for i, word in enumerate(self.normalized):
+            if word:
+                self.positions.setdefault(word, []).append(i)
+
+        parts: List[str] = []
+        self.offsets: List[int] = []
+        length = 0
+        for i, word in enumerate(data["text"]):
+            if i:
+                separator = " " if self.lines[i] == self.lines[i - 1] else "\n"
+                parts.append(separator)
+                length += 1
+            self.offsets.append(length)
+            parts.append(str(word))
+            length += len(str(word))
+        self.text = "".join(parts)
+
+    def words_for_span(self, start: int, end: int) -> List[int]:
+        """Indices of the words covering a character span of the page text"""
+        first = max(0, bisect.bisect_right(self.offsets, start) - 1)
+        last = bisect.bisect_left(self.offsets, end)
+        return list(range(first, max(first + 1, last)))
+
+    def find_keyword(self, keyword: Tuple[str, ...]) -> Optional[int]:
+        """Index of the word right after the first occurrence of a keyword phrase on one line"""
+        for start in self.positions.get(keyword[0], ()):
+            end = start + len(keyword)
+            if tuple(self.normalized[start:end]) == keyword and len(set(self.lines[start:end])) == 1:
+                return end
+        return None
+
+    def line_after(self, index: int) -> List[int]:
+        """
+        Word indices following a keyword that ends right before `index`: the
+        rest of the keyword's line, or the next line when nothing follows it.
+        """
+        keyword_line = self.lines[index - 1]
+        words = []
+        i = index
+        while i < len(self.lines) and self.lines[i] == keyword_line:
+            words.append(i)
+            i += 1
+        # Skip separators such as ":" or "#" after the keyword
+        while words and not self.normalized[words[0]]:
+            words.pop(0)
+        if words or i >= len(self.lines):
+            return words
+
+        next_line = self.lines[i]
+        while i < len(self.lines) and self.lines[i] == next_line:
+            words.append(i)
+            i += 1
+        return words
+
+
+class CompiledField:
+    """A template field with its pattern and keywords compiled for matching"""
+    __slots__ = ("name", "type", "required", "pattern", "keywords", "options", "has_region")
+
+    def __init__(self, field: Dict[str, Any]):
+        self.name = field["name"]
+        self.type = field.get("type", "text")
+        self.required = field.get("required", True)
+        self.pattern = re.compile(field["pattern"], re.IGNORECASE | re.MULTILINE) if field.get("pattern") else None
+
+        # Keywords printed next to the value on the page; the label is used when none are given
+        phrases = field.get("keywords") or ([field["label"]] if field.get("label") else [])
+        normalized = (tuple(_normalize_word(word) for word in phrase.split() if _normalize_word(word)) for phrase in phrases)
+        self.keywords = tuple(keyword for keyword in normalized if keyword)
+        self.options = {option.lower(): option for option in field.get("options") or []}
+        self.has_region = bool(field.get("region"))
+
+
+class TemplateMatcher:
+    """Extracts template fields from word-level OCR output"""
+
+    def __init__(self, template_id: str, fields: List[Dict[str, Any]]):
+        self.template_id = template_id
+        self.fields = [CompiledField(field) for field in fields]
+
+    @property
+    def needs_page_words(self) -> bool:
+        """Whether any field is searched on the whole page rather than in a region"""
+        return any(not field.has_region for field in self.fields)
+
+    def match(
+        self,
+        pages: Sequence[OCRData] = (),
+        region_words: Optional[Dict[str, Tuple[OCRData, int, Box]]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Extract every field.
+
+        Args:
+            pages: Word-level output per page, searched for fields without a region
+            region_words: Words read from each region field, with page number and box
+
+        Returns:
+            Extracted value, confidence and validation state per field name
+        """
+        region_words = region_words or {}
+        indexes = [PageIndex(page, number) for number, page in enumerate(pages, start=1)] if self.needs_page_words else []
+
+        results = {}
+        for field in self.fields:
+            if field.has_region:
+                words, page_number, box = region_words.get(field.name, (None, None, None))
+                results[field.name] = self._match_region(field, words, page_number, box)
+            else:
+                results[field.name] = self._match_pages(field, indexes)
+        return results
+
+    def _match_region(self, field: CompiledField, words: Optional[OCRData], page_number: Optional[int], box: Optional[Box]) -> Dict[str, Any]:
+        if not words or not words["text"]:
+            return self._result(field, None, None, page_number, box)
+        index = PageIndex(words, page_number)
+        return self._match_in(field, index, list(range(len(words["text"])))) or self._result(field, None, None, page_number, box)
+
+    def _match_pages(self, field: CompiledField, indexes: List[PageIndex]) -> Dict[str, Any]:
+        for index in indexes:
+            candidates = None
+            for keyword in field.keywords:
+                after = index.find_keyword(keyword)
+                if after is not None:
+                    candidates = index.line_after(after)
+                    break
+            if candidates is None and field.pattern is None:
+                continue
+            result = self._match_in(field, index, candidates)
+            if result is None and candidates is not None and field.pattern is not None:
+                # Keyword found but the value next to it does not fit: search the whole page
+                result = self._match_in(field, index, None)
+            if result is not None:
+                return result
+        return self._result(field, None, None, None, None)
+
+    def _match_in(self, field: CompiledField, index: PageIndex, candidates: Optional[List[int]]) -> Optional[Dict[str, Any]]:
+        """Match a field within candidate words (or the whole page when None)"""
+        if candidates is not None and not candidates:
+            return None
+
+        if candidates is not None:
+            start = index.offsets[candidates[0]]
+            end = index.offsets[candidates[-1]] + len(str(index.data["text"][candidates[-1]]))
+        else:
+            start, end = 0, len(index.text)
+
+        if field.pattern is not None:
+            found = field.pattern.search(index.text, start, end)
+            if found is None:
+                return None
+            group = 1 if found.re.groups else 0
+            start, end = found.span(group)
+            raw_value = found.group(group)
+        else:
+            raw_value = index.text[start:end]
+
+        words = select_words(index.data, index.words_for_span(start, end))
+        return self._result(field, raw_value, words, index.page_number, bounding_box(words))
+
+    def _result(
+        self,
+        field: CompiledField,
+        raw_value: Optional[str],
+        words: Optional[OCRData],
+        page_number: Optional[int],
+        box: Optional[Box]
+    ) -> Dict[str, Any]:
+        value, validation_errors = self._convert(field, raw_value.strip() if raw_value else "")
+        if field.required and not value:
+            validation_errors.setdefault("required", "No value found for required field")
+
+        return {
+            "value": value or None,
+            "confidence": mean_confidence(words) if words else 0.0,
+            "field_type": field.type,
+            "is_valid": not validation_errors,
+            "validation_errors": validation_errors or None,
+            "metadata": {"page": page_number, "bbox": list(box)} if box is not None else None,
+        }
+
+    @staticmethod
+    def _convert(field: CompiledField, raw_value: str) -> Tuple[str, Dict[str, str]]:
+        """Normalize a raw value to the field type"""
+        if not raw_value:
+            if field.type == "checkbox":
+                return "false", {}
+            return "", {}
+
+        if field.type == "number":
+            found = NUMBER_PATTERN.search(raw_value)
+            if found:
+                number = found.group(0).replace(" ", "").strip(".,")
+                if "," in number and "." in number:
+                    # 1.234,56 and 1,234.56: the last separator is the decimal point
+                    thousands = "." if number.rfind(",") > number.rfind(".") else ","
+                    number = number.replace(thousands, "").replace(",", ".")
+                elif number.count(",") == 1 and len(number.rsplit(",", 1)[1]) != 3:
+                    number = number.replace(",", ".")  # Decimal comma: 12,5
+                else:
+                    number = number.replace(",", "")
+                try:
+                    return format(Decimal(number).normalize(), "f"), {}
+                except InvalidOperation:
+                    pass
+            return raw_value, {"type": "Not a valid number"}
+
+        if field.type == "date":
+            candidate = " ".join(raw_value.split()).strip(" .")
+            for date_format in DATE_FORMATS:
+                try:
+                    return datetime.strptime(candidate, date_format).date().isoformat(), {}
+                except ValueError:
+                    continue
+            return raw_value, {"type": "Not a recognized date"}
+
+        if field.type == "checkbox":
+            # Any single mark recognized in the box counts as ticked
+            return ("true" if raw_value.lower() in CHECKED_MARKS or len(raw_value) == 1 else "false"), {}
+
+        if field.type == "select" and field.options:
+            option = field.options.get(raw_value.lower())
+            if option is None:
+                for lowered, original in field.options.items():
+                    if lowered in raw_value.lower():
+                        option = original
+                        break
+            if option is None:
+                return raw_value, {"options": "Value is not one of the field options"}
+            return option, {}
+
+        return raw_value, {}
+
+
+class TemplateMatcherCache:
+    """
+    In-process LRU cache of compiled template matchers.
+
+    Entries are keyed by template id, version and updated_at, so a template
+    edited through any process is recompiled everywhere the next time a job
+    loads it; stale entries simply age out. invalidate() drops a template's
+    entries right away in the process that changed it.
+    """
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, int, Any], TemplateMatcher]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(template: Template) -> Tuple[str, int, Any]:
+        return (template.id, template.version, template.updated_at)
+
+    def get(self, template: Template) -> TemplateMatcher:
+        """Compiled matcher for the current version of a template"""
+        key = self._key(template)
+        with self._lock:
+            matcher = self._entries.get(key)
+            if matcher is not None:
+                self._entries.move_to_end(key)
+                return matcher
+
+        matcher = TemplateMatcher(template.id, template.fields or [])
+        with self._lock:
+            self._entries[key] = matcher
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return matcher
+
+    def invalidate(self, template_id: str) -> None:
+        """Drop all cached versions of a template"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == template_id]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+template_matcher_cache = TemplateMatcherCache(settings.TEMPLATE_MATCHER_CACHE_SIZE)
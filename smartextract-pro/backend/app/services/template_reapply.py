@@ -0,0 +1,198 @@
+import uuid
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from ..core.config import settings
+from ..models.extraction import ExtractionJob, ExtractionStatus, ExtractedData, ExtractionPage
+from ..models.template import Template
+from .extraction_service import ExtractionService
+from .ocr_data import OCRData, Box, words_in_box
+from .template_matcher import template_matcher_cache
+from .template_regions import align_page, SOURCE_REGIONS
+from .token_store import unpack_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class TemplateReapplyService:
+    """
+    Re-runs template field matching on finished jobs from their stored words.
+
+    Nothing is OCR'd: the packed page words saved with each job are matched
+    against the current template and the job's extracted data is replaced.
+    """
+
+    @staticmethod
+    def reapply_job(db: Session, job_id: str, user_id: str, template: Optional[Template] = None) -> ExtractionJob:
+        """
+        Re-apply a template (by default the job's own) to one completed job
+
+        Raises:
+            LookupError: Job not found
+            ValueError: Job cannot be re-matched from its stored words
+        """
+        job = db.query(ExtractionJob).options(
+            joinedload(ExtractionJob.document), selectinload(ExtractionJob.pages)
+        ).filter(
+            ExtractionJob.id == job_id,
+            ExtractionJob.user_id == user_id
+        ).first()
+        if not job:
+            raise LookupError(f"Extraction job with ID {job_id} not found")
+        if job.status != ExtractionStatus.COMPLETED:
+            raise ValueError(f"Extraction job is not completed. Current status: {job.status}")
+
+        template = template or job.template
+        if template is None:
+            raise ValueError("Extraction job has no template to re-apply")
+
+        fields = TemplateReapplyService.match_job(job, template)
+        TemplateReapplyService._replace_results(db, job, template, fields)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def reapply_template(
+        db: Session,
+        template: Template,
+        user_id: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        on_batch: Optional[Callable[[Dict[str, int]], None]] = None
+    ) -> Dict[str, int]:
+        """
+        Re-apply a template to every completed job that used it
+
+        Jobs are walked in id order in batches. Each batch loads its jobs and
+        all their pages in two queries and is committed as one transaction,
+        so every job's results are replaced atomically and memory stays flat.
+        Jobs that cannot be re-matched from their words are skipped.
+
+        Returns:
+            Number of jobs re-applied and skipped
+        """
+        batch_size = batch_size or settings.TEMPLATE_REAPPLY_BATCH_SIZE
+        counts = {"reapplied": 0, "skipped": 0}
+        last_id = ""
+
+        while True:
+            query = db.query(ExtractionJob).options(
+                joinedload(ExtractionJob.document), selectinload(ExtractionJob.pages)
+            ).filter(
+                ExtractionJob.template_id == template.id,
+                ExtractionJob.status == ExtractionStatus.COMPLETED,
+                ExtractionJob.id > last_id
+            )
+            if user_id is not None:
+                query = query.filter(ExtractionJob.user_id == user_id)
+            jobs = query.order_by(ExtractionJob.id).limit(batch_size).all()
+            if not jobs:
+                break
+
+            for job in jobs:
+                try:
+                    fields = TemplateReapplyService.match_job(job, template)
+                except ValueError as e:
+                    logger.info(f"Not re-applying template {template.id} to job {job.id}: {e}")
+                    counts["skipped"] += 1
+                    continue
+                TemplateReapplyService._replace_results(db, job, template, fields)
+                counts["reapplied"] += 1
+
+            last_id = jobs[-1].id
+            db.commit()  # Committed objects are only weakly held, so the batch's pages are freed
+            if on_batch is not None:
+                on_batch(dict(counts))
+
+        return counts
+
+    @staticmethod
+    def match_job(job: ExtractionJob, template: Template) -> Dict[str, Dict[str, Any]]:
+        """
+        Match a template's fields against a job's stored words
+
+        Raises:
+            ValueError: The stored words cannot stand in for a new extraction
+        """
+        pages = sorted(job.pages, key=lambda page: page.page_number)
+        if not pages:
+            raise ValueError("No words were stored for this job")
+        if any(page.source == SOURCE_REGIONS for page in pages):
+            raise ValueError("Only the old template regions were recognized; the document must be extracted again")
+        if (job.extra_metadata or {}).get("ocr_key") != ExtractionService.ocr_key(job.document, template):
+            raise ValueError("OCR settings differ from those the job ran with; the document must be extracted again")
+
+        words_by_page = {page.page_number: unpack_tokens(page.tokens) for page in pages}
+        region_words = TemplateReapplyService._region_words(template, pages, words_by_page)
+
+        matcher = template_matcher_cache.get(template)
+        return matcher.match([words_by_page[page.page_number] for page in pages], region_words)
+
+    @staticmethod
+    def _region_words(
+        template: Template,
+        pages: List[ExtractionPage],
+        words_by_page: Dict[int, OCRData]
+    ) -> Dict[str, Tuple[OCRData, int, Box]]:
+        """Words inside each field region, after aligning every page on the template anchors"""
+        region_fields = [field for field in template.fields or [] if field.get("region")]
+        if not region_fields:
+            return {}
+
+        pages_by_number = {page.page_number: page for page in pages}
+        anchors = template.anchors or []
+        field_words: Dict[str, Tuple[OCRData, int, Box]] = {}
+        for page_number in sorted({field["region"].get("page", 1) for field in region_fields}):
+            page = pages_by_number.get(page_number)
+            if page is None:
+                continue  # The fields on a missing page are simply not found
+            if page.width is None or page.height is None:
+                raise ValueError("The stored words have no page size to place regions on")
+
+            words = words_by_page[page_number]
+            page_anchors = [anchor for anchor in anchors if anchor["region"].get("page", 1) == page_number]
+            transform, _ = align_page(None, page.width, page.height, page_anchors, page_words=words)
+            for field in region_fields:
+                if field["region"].get("page", 1) == page_number:
+                    box = transform.to_box(field["region"])
+                    field_words[field["name"]] = (words_in_box(words, box), page_number, box)
+        return field_words
+
+    @staticmethod
+    def _replace_results(db: Session, job: ExtractionJob, template: Template, fields: Dict[str, Dict[str, Any]]) -> None:
+        """Swap a job's extracted data for new results (committed by the caller)"""
+        now = datetime.utcnow()
+        db.execute(
+            delete(ExtractedData)
+            .where(ExtractedData.job_id == job.id)
+            .execution_options(synchronize_session=False)
+        )
+        if fields:
+            db.execute(insert(ExtractedData), [
+                {
+                    "id": str(uuid.uuid4()),
+                    "field_name": field_name,
+                    "field_type": data.get("field_type", "text"),
+                    "extracted_value": data["value"],
+                    "confidence": data["confidence"],
+                    "is_valid": data.get("is_valid", True),
+                    "validation_errors": data.get("validation_errors"),
+                    "extra_metadata": data.get("metadata"),
+                    "job_id": job.id,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for field_name, data in fields.items()
+            ])
+
+        job.template_id = template.id
+        job.pipeline_key = ExtractionService.pipeline_key(job.document, template)
+        job.extra_metadata = {
+            **(job.extra_metadata or {}),
+            "template_id": template.id,
+            "reapplied": {"template_version": template.version, "at": now.isoformat()},
+        }
@@ -0,0 +1,191 @@
+import re
+import logging
+from typing import Callable, Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ocr_data import OCRData, Box, empty_ocr_data, select_words, bounding_box
+
+logger = logging.getLogger(__name__)
+
+# Source of page words holding only what was read inside template regions
+SOURCE_REGIONS = "regions"
+
+# OCR callable used for batched crops: grayscale image -> word-level output
+RegionOCR = Callable[[np.ndarray], OCRData]
+
+# White rows inserted between stitched crops so tesseract keeps them apart
+CROP_GAP = 24
+
+# Scale factors outside this range mean the anchors were matched wrongly
+MIN_SCALE, MAX_SCALE = 0.8, 1.25
+
+
+class PageTransform:
+    """
+    Maps normalized template coordinates to pixels on a scanned page.
+
+    Starts as a plain scale to the page size; anchors found on the page
+    correct it for shifted or slightly scaled scans.
+    """
+    def __init__(self, width: int, height: int, sx: float = 1.0, dx: float = 0.0, sy: float = 1.0, dy: float = 0.0):
+        self.width = width
+        self.height = height
+        self.sx, self.dx, self.sy, self.dy = sx, dx, sy, dy
+
+    def to_box(self, region: Dict[str, Any]) -> Box:
+        """Pixel box for a normalized region, clipped to the page"""
+        left = int(round(self.sx * region["x"] * self.width + self.dx))
+        top = int(round(self.sy * region["y"] * self.height + self.dy))
+        right = int(round(self.sx * (region["x"] + region["width"]) * self.width + self.dx))
+        bottom = int(round(self.sy * (region["y"] + region["height"]) * self.height + self.dy))
+        left, right = max(0, left), min(self.width, right)
+        top, bottom = max(0, top), min(self.height, bottom)
+        return (left, top, max(0, right - left), max(0, bottom - top))
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"sx": round(self.sx, 4), "dx": round(self.dx, 1), "sy": round(self.sy, 4), "dy": round(self.dy, 1)}
+
+
+def expand_region(region: Dict[str, Any], margin: float) -> Dict[str, Any]:
+    """Grow a normalized region by `margin` on every side"""
+    x = max(0.0, region["x"] - margin)
+    y = max(0.0, region["y"] - margin)
+    return {
+        "x": x,
+        "y": y,
+        "width": min(1.0, region["x"] + region["width"] + margin) - x,
+        "height": min(1.0, region["y"] + region["height"] + margin) - y,
+    }
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^0-9a-z]", "", str(text).lower())
+
+
+def find_phrase(data: OCRData, phrase: str) -> Optional[Box]:
+    """Box of the first run of consecutive words on one line that spells `phrase`"""
+    target = [_normalize(word) for word in phrase.split() if _normalize(word)]
+    if not target:
+        return None
+    words = [_normalize(text) for text in data["text"]]
+    lines = list(zip(data["block_num"], data["par_num"], data["line_num"]))
+    for start in range(len(words) - len(target) + 1):
+        end = start + len(target)
+        if words[start:end] == target and len(set(lines[start:end])) == 1:
+            return bounding_box(select_words(data, range(start, end)))
+    return None
+
+
+def ocr_regions(gray: np.ndarray, boxes: Sequence[Box], ocr: RegionOCR, max_canvas_height: int = 8000) -> List[OCRData]:
+    """
+    OCR several regions of a page with as few engine calls as possible.
+
+    The crops are stacked vertically on a white canvas (separated by a white
+    gap) and recognized in one call per canvas; words are then mapped back to
+    their crop by vertical position and shifted to page coordinates.
+
+    Returns:
+        Word-level output per box, in page coordinates
+    """
+    results = [empty_ocr_data() for _ in boxes]
+    batch: List[int] = []
+    batch_height = 0
+
+    def flush() -> None:
+        if not batch:
+            return
+        canvas_width = max(boxes[i][2] for i in batch)
+        canvas_height = sum(boxes[i][3] for i in batch) + CROP_GAP * (len(batch) + 1)
+        canvas = np.full((canvas_height, canvas_width), 255, dtype=np.uint8)
+
+        offsets = []
+        y = CROP_GAP
+        for i in batch:
+            left, top, width, height = boxes[i]
+            canvas[y:y + height, :width] = gray[top:top + height, left:left + width]
+            offsets.append(y)
+            y += height + CROP_GAP
+
+        data = ocr(canvas)
+        for w in range(len(data["text"])):
+            center_y = data["top"][w] + data["height"][w] / 2
+            for i, offset in zip(batch, offsets):
+                left, top, width, height = boxes[i]
+                if offset - CROP_GAP / 2 <= center_y < offset + height + CROP_GAP / 2:
+                    for column in data:
+                        results[i][column].append(data[column][w])
+                    results[i]["left"][-1] += left
+                    results[i]["top"][-1] += top - offset
+                    break
+
+    for i, box in enumerate(boxes):
+        if box[2] <= 0 or box[3] <= 0:
+            continue
+        if batch and batch_height + box[3] + CROP_GAP > max_canvas_height:
+            flush()
+            batch, batch_height = [], 0
+        batch.append(i)
+        batch_height += box[3] + CROP_GAP
+    flush()
+
+    return results
+
+
+def align_page(
+    gray: Optional[np.ndarray],
+    width: int,
+    height: int,
+    anchors: List[Dict[str, Any]],
+    ocr: Optional[RegionOCR] = None,
+    page_words: Optional[OCRData] = None
+) -> Tuple[PageTransform, int]:
+    """
+    Estimate where the template sits on a page from its anchors.
+
+    Each anchor is a piece of fixed text with its expected normalized region.
+    Anchors are looked up in `page_words` when the page's words are already
+    known (e.g. from a PDF text layer); otherwise their search windows are
+    OCR'd in one batched call. One anchor gives a translation; two or more
+    spread along an axis also give a scale on that axis.
+
+    Returns:
+        The page transform and the number of anchors found
+    """
+    transform = PageTransform(width, height)
+    if not anchors:
+        return transform, 0
+
+    if page_words is not None:
+        found = [find_phrase(page_words, anchor["text"]) for anchor in anchors]
+    else:
+        windows = [transform.to_box(expand_region(anchor["region"], anchor.get("search_margin", 0.05))) for anchor in anchors]
+        window_words = ocr_regions(gray, windows, ocr)
+        found = [find_phrase(words, anchor["text"]) for words, anchor in zip(window_words, anchors)]
+
+    expected_x, expected_y, actual_x, actual_y = [], [], [], []
+    for anchor, box in zip(anchors, found):
+        if box is None:
+            continue
+        region = anchor["region"]
+        expected_x.append((region["x"] + region["width"] / 2) * width)
+        expected_y.append((region["y"] + region["height"] / 2) * height)
+        actual_x.append(box[0] + box[2] / 2)
+        actual_y.append(box[1] + box[3] / 2)
+
+    if not actual_x:
+        logger.info("No template anchors found on page, using unaligned regions")
+        return transform, 0
+
+    transform.sx, transform.dx = _fit_axis(expected_x, actual_x, width)
+    transform.sy, transform.dy = _fit_axis(expected_y, actual_y, height)
+    return transform, len(actual_x)
+
+
+def _fit_axis(expected: List[float], actual: List[float], size: int) -> Tuple[float, float]:
+    """Scale and offset mapping expected to actual positions along one axis"""
+    if len(expected) >= 2 and max(expected) - min(expected) > 0.1 * size:
+        scale, offset = np.polyfit(expected, actual, 1)
+        if MIN_SCALE <= scale <= MAX_SCALE:
+            return float(scale), float(offset)
+    return 1.0, float(np.median(np.subtract(actual, expected)))
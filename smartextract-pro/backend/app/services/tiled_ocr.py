@@ -0,0 +1,364 @@
+import math
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from ..core.config import settings
+from .image_source import ImageSource
+from .ocr_data import OCRData, OCR_DATA_COLUMNS, empty_ocr_data
+from .preprocessing import PreprocessingPipeline, estimate_skew, otsu_threshold, SKEW_ESTIMATE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Words within this many pixels of a tile edge inside the page may be cut by it
+EDGE_MARGIN = 2
+
+# A word touching a tile edge is a duplicate when this much of it is covered by a word of the neighbouring tile
+DUPLICATE_COVERAGE = 0.3
+
+
+def tiling_spec() -> Dict[str, int]:
+    """Tiling settings, part of the OCR cache and pipeline keys of images"""
+    return {
+        "min_pixels": settings.TILED_OCR_MIN_PIXELS,
+        "tile_size": settings.OCR_TILE_SIZE,
+        "overlap": settings.OCR_TILE_OVERLAP,
+    }
+
+
+def should_tile(source: ImageSource) -> bool:
+    """Whether an image is large enough to be processed in tiles"""
+    return 0 < settings.TILED_OCR_MIN_PIXELS <= source.pixel_count
+
+
+class Tile(NamedTuple):
+    """A tile of the page and the part of it whose words it owns"""
+    index: int
+    row: int
+    column: int
+    left: int
+    top: int
+    right: int
+    bottom: int
+    core: Tuple[int, int, int, int]  # left, top, right, bottom
+
+
+def plan_tiles(width: int, height: int, tile_size: int, overlap: int) -> List[Tile]:
+    """
+    Cover a page with tiles of at most `tile_size` pixels a side that
+    overlap their neighbours by `overlap` pixels.
+
+    Each tile owns the words centered in its core, which reaches halfway
+    into the overlaps, so every word no wider than the overlap is read
+    whole by exactly one tile.
+    """
+    overlap = min(overlap, tile_size // 2)
+
+    def spans(length: int) -> List[Tuple[int, int]]:
+        count = max(1, math.ceil((length - overlap) / (tile_size - overlap)))
+        step = (length - overlap) / count if count > 1 else length
+        return [
+            (int(round(i * step)), min(length, int(round(i * step)) + int(math.ceil(step)) + overlap))
+            for i in range(count)
+        ]
+
+    def cores(parts: List[Tuple[int, int]], length: int) -> List[Tuple[int, int]]:
+        bounds = [0] + [(parts[i][1] + parts[i + 1][0]) // 2 for i in range(len(parts) - 1)] + [length]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    rows, columns = spans(height), spans(width)
+    row_cores, column_cores = cores(rows, height), cores(columns, width)
+    tiles = []
+    for row, ((top, bottom), (core_top, core_bottom)) in enumerate(zip(rows, row_cores)):
+        for column, ((left, right), (core_left, core_right)) in enumerate(zip(columns, column_cores)):
+            tiles.append(Tile(
+                len(tiles), row, column, left, top, right, bottom, (core_left, core_top, core_right, core_bottom)
+            ))
+    return tiles
+
+
+class PageGeometry:
+    """
+    The resample and deskew stages as one affine map from the decoded image
+    to the prepared page, so each tile can be produced from the source
+    region it needs without preparing the whole page.
+    """
+    def __init__(self, source: ImageSource, preprocessing: PreprocessingPipeline):
+        self.scale = 1.0
+        resample = preprocessing.params("resample")
+        if resample is not None and preprocessing.source_dpi:
+            scale = resample["dpi"] / preprocessing.source_dpi
+            if abs(scale - 1.0) >= 0.02:
+                self.scale = scale
+        self.width = int(round(source.width * self.scale))
+        self.height = int(round(source.height * self.scale))
+
+        self.angle = 0.0
+        deskew_params = preprocessing.params("deskew")
+        if deskew_params is not None:
+            with preprocessing.timings.measure("deskew"):
+                angle = estimate_skew(source.thumbnail(SKEW_ESTIMATE_SIZE), deskew_params["max_angle"])
+            if abs(angle) >= 0.1:
+                self.angle = angle
+
+        # Source pixel -> page pixel: scale, then rotate about the page center
+        rotation = np.vstack([cv2.getRotationMatrix2D((self.width / 2, self.height / 2), self.angle, 1.0), [0, 0, 1]])
+        self.matrix = rotation @ np.diag([self.scale, self.scale, 1.0])
+        self.inverse = np.linalg.inv(self.matrix)
+
+    def source_region(self, tile: Tile, source: ImageSource) -> Tuple[int, int, int, int]:
+        """Source pixels a tile is computed from, with a margin for interpolation"""
+        corners = np.array([
+            [tile.left, tile.top, 1], [tile.right, tile.top, 1],
+            [tile.left, tile.bottom, 1], [tile.right, tile.bottom, 1]
+        ], dtype=np.float64)
+        points = corners @ self.inverse.T
+        margin = 2 + int(math.ceil(1 / min(self.scale, 1.0)))
+        return (
+            max(0, int(math.floor(points[:, 0].min())) - margin),
+            max(0, int(math.floor(points[:, 1].min())) - margin),
+            min(source.width, int(math.ceil(points[:, 0].max())) + margin),
+            min(source.height, int(math.ceil(points[:, 1].max())) + margin),
+        )
+
+    def read_tile(self, source: ImageSource, tile: Tile, preprocessing: PreprocessingPipeline) -> np.ndarray:
+        """Grayscale pixels of a tile of the prepared page"""
+        width, height = tile.right - tile.left, tile.bottom - tile.top
+        if self.scale == 1.0 and self.angle == 0.0:
+            with preprocessing.timings.measure("decode"):
+                return source.read((tile.left, tile.top, tile.right, tile.bottom))
+
+        region = self.source_region(tile, source)
+        with preprocessing.timings.measure("decode"):
+            pixels = source.read(region)
+
+        if self.angle == 0.0:
+            # Scaling only: resize as resample_to_dpi does for a whole page, then cut the tile out
+            with preprocessing.timings.measure("resample"):
+                interpolation = cv2.INTER_AREA if self.scale < 1 else cv2.INTER_CUBIC
+                resized = cv2.resize(pixels, None, fx=self.scale, fy=self.scale, interpolation=interpolation)
+                x = max(0, int(round(tile.left - region[0] * self.scale)))
+                y = max(0, int(round(tile.top - region[1] * self.scale)))
+                crop = resized[y:y + height, x:x + width]
+                tile_pixels = np.full((height, width), 255, dtype=np.uint8)
+                tile_pixels[:crop.shape[0], :crop.shape[1]] = crop
+                return tile_pixels
+
+        shift_to_tile = np.array([[1, 0, -tile.left], [0, 1, -tile.top], [0, 0, 1]], dtype=np.float64)
+        shift_from_region = np.array([[1, 0, region[0]], [0, 1, region[1]], [0, 0, 1]], dtype=np.float64)
+        matrix = (shift_to_tile @ self.matrix @ shift_from_region)[:2]
+        with preprocessing.timings.measure("deskew"):
+            return cv2.warpAffine(
+                pixels, matrix, (width, height),
+                flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT, borderValue=255
+            )
+
+
+def ocr_tiled(
+    source: ImageSource,
+    preprocessing: PreprocessingPipeline,
+    ocr: Callable[[np.ndarray], OCRData],
+    should_stop: Optional[Callable[[], bool]] = None,
+    on_tile: Optional[Callable[[int, int], None]] = None
+) -> Tuple[OCRData, int, int, Dict[str, Any]]:
+    """
+    OCR a page tile by tile, in memory bounded by the tile size.
+
+    The page is never prepared as a whole: each tile is read from the
+    source, resampled and deskewed on its own, binarized with the Otsu
+    threshold of the whole image (so blank tiles stay blank) and OCR'd.
+    Tiles without ink are skipped. The words of all tiles are then merged
+    (see `merge_tile_words`).
+
+    Args:
+        source: Decoded image
+        preprocessing: Pipeline of the page
+        ocr: Recognizes a binarized tile
+        should_stop: Polled between tiles; when true, the remaining tiles are skipped
+        on_tile: Called with (tiles done, total tiles) after each tile
+
+    Returns:
+        Words in page coordinates, page width and height, and tiling metadata
+    """
+    geometry = PageGeometry(source, preprocessing)
+    tiles = plan_tiles(geometry.width, geometry.height, settings.OCR_TILE_SIZE, settings.OCR_TILE_OVERLAP)
+
+    threshold = None
+    binarize_params = preprocessing.params("binarize")
+    if binarize_params is not None and binarize_params["method"] == "otsu":
+        with preprocessing.timings.measure("binarize"):
+            threshold = otsu_threshold(source.histogram())
+
+    words_per_tile: List[OCRData] = []
+    skipped = 0
+    for tile in tiles:
+        if should_stop is not None and should_stop():
+            break
+        binary = preprocessing.prepare_for_ocr(geometry.read_tile(source, tile, preprocessing), threshold)
+        if binary.min() == binary.max():
+            words = empty_ocr_data()
+            skipped += 1
+        else:
+            words = ocr(binary)
+        del binary
+        words_per_tile.append(words)
+        if on_tile is not None:
+            on_tile(len(words_per_tile), len(tiles))
+
+    merged = merge_tile_words(tiles[:len(words_per_tile)], words_per_tile)
+    metadata = {
+        "tiles": len(tiles),
+        "tiles_read": len(words_per_tile),
+        "blank_tiles": skipped,
+        "tile_size": settings.OCR_TILE_SIZE,
+        "overlap": settings.OCR_TILE_OVERLAP,
+    }
+    logger.info(
+        f"OCR'd {geometry.width}x{geometry.height} page in {metadata['tiles_read']}/{metadata['tiles']} tiles "
+        f"({skipped} blank, {len(merged['text'])} words)"
+    )
+    return merged, geometry.width, geometry.height, metadata
+
+
+def merge_tile_words(tiles: Sequence[Tile], words_per_tile: Sequence[OCRData]) -> OCRData:
+    """
+    Merge the words of overlapping tiles into the words of the page.
+
+    Every word appears in one or two tiles, possibly cut by a tile edge in
+    one of them. A tile keeps the words centered in its core; a word that
+    touches an edge of its tile inside the page is only kept when no word of
+    the neighbouring tile covers it, so cut copies are dropped but words
+    longer than the overlap survive. Text lines cut by seams are joined
+    again: lines of neighbouring tiles that sit side by side are numbered
+    as one line, with their words in reading order.
+    """
+    if not tiles:
+        return empty_ocr_data()
+    page_right = max(tile.right for tile in tiles)
+    page_bottom = max(tile.bottom for tile in tiles)
+    by_position = {(tile.row, tile.column): tile.index for tile in tiles}
+
+    # Word boxes in page coordinates, per tile
+    boxes: List[np.ndarray] = []
+    keep: List[np.ndarray] = []
+    at_edge: List[np.ndarray] = []
+    for tile, words in zip(tiles, words_per_tile):
+        box = np.column_stack([
+            np.asarray(words["left"], dtype=np.int64) + tile.left,
+            np.asarray(words["top"], dtype=np.int64) + tile.top,
+            np.asarray(words["width"], dtype=np.int64),
+            np.asarray(words["height"], dtype=np.int64),
+        ]).reshape(-1, 4)
+        left, top, right, bottom = box[:, 0], box[:, 1], box[:, 0] + box[:, 2], box[:, 1] + box[:, 3]
+        center_x, center_y = left + box[:, 2] / 2, top + box[:, 3] / 2
+        core_left, core_top, core_right, core_bottom = tile.core
+        in_core = (center_x >= core_left) & (center_x < core_right) & (center_y >= core_top) & (center_y < core_bottom)
+        touches = (
+            ((left <= tile.left + EDGE_MARGIN) & (tile.left > 0))
+            | ((top <= tile.top + EDGE_MARGIN) & (tile.top > 0))
+            | ((right >= tile.right - EDGE_MARGIN) & (tile.right < page_right))
+            | ((bottom >= tile.bottom - EDGE_MARGIN) & (tile.bottom < page_bottom))
+        )
+        boxes.append(box)
+        keep.append(in_core & ~touches)
+        at_edge.append(in_core & touches)
+
+    def neighbours(tile: Tile) -> List[int]:
+        return [
+            by_position[(tile.row + dr, tile.column + dc)]
+            for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+            if (dr or dc) and (tile.row + dr, tile.column + dc) in by_position
+        ]
+
+    # Words cut by a tile edge: keep them only when the neighbour has no whole copy
+    for tile in tiles:
+        candidates = np.flatnonzero(at_edge[tile.index])
+        if not len(candidates):
+            continue
+        others = [boxes[n][keep[n]] for n in neighbours(tile)]
+        others = np.vstack(others) if others else np.zeros((0, 4), dtype=np.int64)
+        for i in candidates:
+            x, y, w, h = boxes[tile.index][i]
+            overlap_w = np.clip(np.minimum(x + w, others[:, 0] + others[:, 2]) - np.maximum(x, others[:, 0]), 0, None)
+            overlap_h = np.clip(np.minimum(y + h, others[:, 1] + others[:, 3]) - np.maximum(y, others[:, 1]), 0, None)
+            if not len(others) or (overlap_w * overlap_h).max() < DUPLICATE_COVERAGE * max(w * h, 1):
+                keep[tile.index][i] = True
+
+    # Lines of the kept words, keyed by tile and tesseract's numbering, in reading order
+    line_keys: List[Tuple[int, int, int, int]] = []
+    line_words: Dict[Tuple[int, int, int, int], List[Tuple[int, int]]] = {}
+    line_boxes: Dict[Tuple[int, int, int, int], List[int]] = {}
+    for tile, words in zip(tiles, words_per_tile):
+        for i in np.flatnonzero(keep[tile.index]):
+            key = (tile.index, words["block_num"][i], words["par_num"][i], words["line_num"][i])
+            x, y, w, h = (int(value) for value in boxes[tile.index][i])
+            if key not in line_words:
+                line_keys.append(key)
+                line_words[key] = []
+                line_boxes[key] = [x, y, x + w, y + h]
+            else:
+                bounds = line_boxes[key]
+                bounds[:] = [min(bounds[0], x), min(bounds[1], y), max(bounds[2], x + w), max(bounds[3], y + h)]
+            line_words[key].append((tile.index, i))
+
+    # Join lines of neighbouring tiles that continue each other across a seam
+    parent = {key: key for key in line_keys}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    lines_by_tile: Dict[int, List[Tuple[int, int, int, int]]] = {}
+    for key in line_keys:
+        lines_by_tile.setdefault(key[0], []).append(key)
+    overlap = settings.OCR_TILE_OVERLAP
+    for tile in tiles:
+        near_seam = [
+            key for key in lines_by_tile.get(tile.index, [])
+            if line_boxes[key][0] < tile.core[0] + overlap or line_boxes[key][2] > tile.core[2] - overlap
+            or line_boxes[key][1] < tile.core[1] + overlap or line_boxes[key][3] > tile.core[3] - overlap
+        ]
+        for neighbour in neighbours(tile):
+            if neighbour < tile.index:
+                continue
+            for key in near_seam:
+                left, top, right, bottom = line_boxes[key]
+                for other in lines_by_tile.get(neighbour, []):
+                    o_left, o_top, o_right, o_bottom = line_boxes[other]
+                    line_height = max(bottom - top, o_bottom - o_top, 1)
+                    shared_height = min(bottom, o_bottom) - max(top, o_top)
+                    gap = max(left, o_left) - min(right, o_right)
+                    if shared_height >= 0.5 * min(bottom - top, o_bottom - o_top) and gap <= 1.5 * line_height:
+                        parent[find(other)] = find(key)
+
+    groups: Dict[Tuple[int, int, int, int], List[Tuple[int, int, int, int]]] = {}
+    for key in line_keys:
+        groups.setdefault(find(key), []).append(key)
+
+    merged = empty_ocr_data()
+    block_numbers: Dict[Tuple[int, int], int] = {}
+    for group in groups.values():
+        first = group[0]
+        block = block_numbers.setdefault((first[0], first[1]), len(block_numbers) + 1)
+        members = sorted(
+            (word for key in group for word in line_words[key]),
+            key=lambda word: boxes[word[0]][word[1]][0]
+        )
+        for tile_index, i in members:
+            words = words_per_tile[tile_index]
+            x, y, w, h = (int(value) for value in boxes[tile_index][i])
+            for column in OCR_DATA_COLUMNS:
+                if column not in ("left", "top", "width", "height", "block_num", "par_num", "line_num"):
+                    merged[column].append(words[column][i])
+            merged["left"].append(x)
+            merged["top"].append(y)
+            merged["width"].append(w)
+            merged["height"].append(h)
+            merged["block_num"].append(block)
+            merged["par_num"].append(first[2])
+            merged["line_num"].append(first[3])
+    return merged
@@ -0,0 +1,88 @@
+import zlib
+import struct
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+
+from .ocr_data import OCRData, OCR_DATA_COLUMNS
+
+# Packed layout: header (magic, word count), then a zlib stream holding one
+# little-endian array per numeric column, the UTF-8 byte length of every
+# word and finally all words concatenated. Columns compress far better than
+# rows, and nothing is stored per word besides its values.
+MAGIC = b"SXT1"
+HEADER = struct.Struct("<4sI")
+NUMERIC_COLUMNS = {
+    "left": "<i4",
+    "top": "<i4",
+    "width": "<i4",
+    "height": "<i4",
+    "conf": "<i2",  # Confidence x 100, -100 for unknown
+    "block_num": "<u2",
+    "par_num": "<u2",
+    "line_num": "<u2",
+}
+TEXT_LENGTH_DTYPE = "<u2"
+COMPRESSION_LEVEL = 6
+
+
+class TokenPage(NamedTuple):
+    """Words of one page, where they came from and the page size in pixels"""
+    page: int
+    source: str
+    words: OCRData
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+def pack_tokens(data: OCRData) -> bytes:
+    """Pack word-level OCR output into a compressed columnar blob"""
+    count = len(data["text"])
+    encoded = [str(text).encode("utf-8") for text in data["text"]]
+
+    parts = []
+    for column, dtype in NUMERIC_COLUMNS.items():
+        values = np.asarray(data[column], dtype=np.float64 if column == "conf" else np.int64)
+        if column == "conf":
+            values = np.rint(np.maximum(values, -1) * 100)
+        parts.append(values.astype(dtype).tobytes())
+    parts.append(np.fromiter((len(text) for text in encoded), dtype=TEXT_LENGTH_DTYPE, count=count).tobytes())
+    parts.append(b"".join(encoded))
+
+    return HEADER.pack(MAGIC, count) + zlib.compress(b"".join(parts), COMPRESSION_LEVEL)
+
+
+def unpack_arrays(blob: bytes) -> Dict[str, np.ndarray]:
+    """
+    Unpack a blob into one NumPy array per column.
+
+    Numeric columns are zero-copy views on the decompressed buffer; `text`
+    is an object array of strings.
+    """
+    magic, count = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Not a packed token blob")
+    payload = zlib.decompress(blob[HEADER.size:])
+
+    arrays: Dict[str, np.ndarray] = {}
+    offset = 0
+    for column, dtype in NUMERIC_COLUMNS.items():
+        arrays[column] = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+        offset += arrays[column].nbytes
+    lengths = np.frombuffer(payload, dtype=TEXT_LENGTH_DTYPE, count=count, offset=offset)
+    offset += lengths.nbytes
+
+    ends = offset + np.cumsum(lengths, dtype=np.int64)
+    starts = ends - lengths
+    arrays["text"] = np.array(
+        [payload[start:end].decode("utf-8") for start, end in zip(starts.tolist(), ends.tolist())],
+        dtype=object
+    )
+    arrays["conf"] = arrays["conf"] / 100.0
+    return arrays
+
+
+def unpack_tokens(blob: bytes) -> OCRData:
+    """Unpack a blob back into columnar OCR output (plain lists)"""
+    arrays = unpack_arrays(blob)
+    return {column: arrays[column].tolist() for column in OCR_DATA_COLUMNS}
@@ -0,0 +1,288 @@
+import os
+import uuid
+import errno
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect, Request
+
+from ..core.config import settings
+from ..models.document import Document, DocumentType
+from ..models.upload_session import UploadSession
+from .upload_stream import UploadTooLarge, check_extension, run_io, store_document
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# Expired sessions deleted per transaction
+GC_BATCH_SIZE = 500
+
+
+class UploadOffsetMismatch(ValueError):
+    """A chunk starts past the bytes received so far"""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Chunk must start at or before offset {offset}")
+        self.offset = offset
+
+
+class UploadIncomplete(ValueError):
+    """An upload was finalized before all of its bytes were received"""
+
+
+async def create_session(
+    db: Session,
+    user_id: str,
+    filename: str,
+    size: int,
+    mime_type: Optional[str] = None,
+    document_type: DocumentType = DocumentType.OTHER
+) -> UploadSession:
+    """
+    Start a resumable upload of a file of `size` bytes.
+
+    The file is preallocated in full, so the disk space is reserved up
+    front and chunks are written straight to their place in it.
+
+    Raises:
+        UploadTooLarge: `size` is over RESUMABLE_UPLOAD_MAX_SIZE
+        ValueError: The file type is not allowed
+        OSError: The file could not be preallocated, e.g. the disk is full
+    """
+    check_extension(filename)
+    if size > settings.RESUMABLE_UPLOAD_MAX_SIZE:
+        raise UploadTooLarge(f"Upload exceeds {settings.RESUMABLE_UPLOAD_MAX_SIZE} bytes")
+
+    upload_session = UploadSession(
+        filename=filename,
+        mime_type=mime_type,
+        document_type=document_type,
+        size=size,
+        offset=0,
+        expires_at=datetime.utcnow() + timedelta(seconds=settings.UPLOAD_SESSION_TTL),
+        user_id=user_id
+    )
+    upload_session.temp_path = os.path.join(settings.UPLOAD_FOLDER, f"{uuid.uuid4()}.upload")
+    await run_io(_preallocate, upload_session.temp_path, size)
+    try:
+        db.add(upload_session)
+        db.commit()
+    except Exception:
+        db.rollback()
+        await run_io(_remove, upload_session.temp_path)
+        raise
+    db.refresh(upload_session)
+    return upload_session
+
+
+async def write_chunk(db: Session, upload_session: UploadSession, offset: int, request: Request) -> UploadSession:
+    """
+    Write the body of `request` into an upload at `offset`.
+
+    The body is streamed into the preallocated file as it arrives, off the
+    event loop. A chunk may start before the current offset (a retry of a
+    chunk whose response was lost) but not after it, so the received bytes
+    never have gaps. Whatever was written is recorded even when the client
+    disconnects halfway, so it can resume from there; each chunk also
+    extends the session's expiry.
+
+    Raises:
+        UploadOffsetMismatch: `offset` is past the bytes received so far
+        UploadTooLarge: The chunk runs past the declared size
+    """
+    if offset < 0 or offset > upload_session.offset:
+        raise UploadOffsetMismatch(upload_session.offset)
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and offset + int(content_length) > upload_session.size:
+        raise UploadTooLarge(f"Chunk runs past the declared size of {upload_session.size} bytes")
+
+    fd = await run_io(os.open, upload_session.temp_path, os.O_WRONLY)
+    written = position = offset
+    pending: Optional[asyncio.Future] = None
+    try:
+        # One write in flight while the next part of the body is received
+        try:
+            async for chunk in request.stream():
+                if not chunk:
+                    continue
+                if position + len(chunk) > upload_session.size:
+                    raise UploadTooLarge(f"Chunk runs past the declared size of {upload_session.size} bytes")
+                if pending is not None:
+                    written = await pending
+                pending = asyncio.ensure_future(run_io(_write_at, fd, chunk, position))
+                position += len(chunk)
+        except ClientDisconnect:
+            logger.info(f"Client disconnected during a chunk of upload session {upload_session.id}")
+        if pending is not None:
+            written, pending = await pending, None
+    finally:
+        if pending is not None:
+            results = await asyncio.gather(pending, return_exceptions=True)
+            if not isinstance(results[0], BaseException):
+                written = results[0]
+        await run_io(_sync_and_close, fd)
+        if written > upload_session.offset:
+            _record_progress(db, upload_session.id, written)
+
+    db.refresh(upload_session)
+    return upload_session
+
+
+def _record_progress(db: Session, session_id: str, offset: int) -> None:
+    """Advance a session's offset (never backwards, as retried chunks may finish out of order)"""
+    db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == session_id, UploadSession.offset < offset)
+        .values({
+            UploadSession.offset: offset,
+            UploadSession.expires_at: datetime.utcnow() + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+        })
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+async def finalize_session(db: Session, upload_session: UploadSession) -> Document:
+    """
+    Turn a completely received upload into a document.
+
+    The file is hashed and the session claimed (deleted, committed), then
+    the file is moved into place like a direct upload and the document
+    added. Should that fail, the upload is gone: its file is deleted.
+
+    Raises:
+        UploadIncomplete: Not all bytes were received yet
+        LookupError: The session was finalized or deleted concurrently
+    """
+    if upload_session.offset < upload_session.size:
+        raise UploadIncomplete(
+            f"Upload incomplete: {upload_session.offset} of {upload_session.size} bytes received"
+        )
+    content_hash = await run_io(_hash_file, upload_session.temp_path)
+
+    # Read before the row is gone
+    owner_id, temp_path, filename, size = (
+        upload_session.user_id, upload_session.temp_path, upload_session.filename, upload_session.size
+    )
+    mime_type, document_type = upload_session.mime_type, upload_session.document_type
+
+    # Deleting the row first claims the session against a concurrent finalize
+    claimed = db.query(UploadSession).filter(
+        UploadSession.id == upload_session.id
+    ).delete(synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        raise LookupError("Upload session not found")
+    db.commit()
+    try:
+        document = await store_document(
+            db,
+            owner_id=owner_id,
+            temp_path=temp_path,
+            filename=filename,
+            size=size,
+            content_hash=content_hash,
+            mime_type=mime_type,
+            document_type=document_type
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        await run_io(_remove, temp_path)
+        raise
+    db.refresh(document)
+    return document
+
+
+async def delete_session(db: Session, upload_session: UploadSession) -> None:
+    """Abort an upload, deleting its file"""
+    await run_io(_remove, upload_session.temp_path)
+    db.delete(upload_session)
+    db.commit()
+
+
+def collect_expired_sessions(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete upload sessions past their expiry and their files; returns how many"""
+    now = now or datetime.utcnow()
+    expired = db.query(UploadSession.id, UploadSession.temp_path).filter(
+        UploadSession.expires_at < now
+    ).limit(GC_BATCH_SIZE).all()
+
+    removed = []
+    for session_id, temp_path in expired:
+        # A chunk may have extended the session since it was read
+        if db.query(UploadSession).filter(
+            UploadSession.id == session_id,
+            UploadSession.expires_at < now
+        ).delete(synchronize_session=False):
+            removed.append(temp_path)
+    db.commit()
+
+    for temp_path in removed:
+        _remove(temp_path)
+    if removed:
+        logger.info(f"Deleted {len(removed)} expired upload session(s)")
+    return len(removed)
+
+
+def _preallocate(path: str, size: int) -> None:
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        _reserve(fd, size)
+    except OSError:
+        os.close(fd)
+        _remove(path)
+        raise
+    os.close(fd)
+
+
+def _reserve(fd: int, size: int) -> None:
+    if size and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                raise  # e.g. ENOSPC
+    os.ftruncate(fd, size)  # Sparse where the file system cannot reserve space
+
+
+def _write_at(fd: int, data: bytes, position: int) -> int:
+    """Write all of `data` at `position`, returning the offset after it"""
+    view = memoryview(data)
+    os.lseek(fd, position, os.SEEK_SET)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+    return position + len(data)
+
+
+def _sync_and_close(fd: int) -> None:
+    # Received bytes must be on disk before the offset says so
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _hash_file(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not delete upload file {path}: {e}")
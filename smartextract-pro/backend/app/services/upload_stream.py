@@ -0,0 +1,264 @@
+import os
+import uuid
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, NamedTuple, Optional, Set, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+
+from ..core.config import settings
+from ..models.document import Document, DocumentStatus, DocumentType
+from .content_store import add_reference, put_content, reserve_reference
+from .storage import content_key
+
+# Bytes of boundaries, part headers and small form fields a request may carry besides the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+_io_executor: Optional[ThreadPoolExecutor] = None
+_io_executor_lock = threading.Lock()
+
+
+class UploadTooLarge(ValueError):
+    """The uploaded file is larger than allowed"""
+
+
+class ReceivedUpload(NamedTuple):
+    """A file streamed from a request into a temporary file"""
+    filename: str
+    content_type: Optional[str]
+    temp_path: str
+    size: int
+    content_hash: str  # SHA-256
+
+
+async def run_io(function: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run blocking file I/O on the upload I/O threads.
+
+    The pool is bounded by UPLOAD_IO_WORKERS, so concurrent uploads queue
+    for the disk instead of occupying the event loop or the threads that
+    serve every other request.
+    """
+    global _io_executor
+    if _io_executor is None:
+        with _io_executor_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(settings.UPLOAD_IO_WORKERS, thread_name_prefix="upload-io")
+    return await asyncio.get_running_loop().run_in_executor(_io_executor, function, *args)
+
+
+class _TempFileWriter:
+    """Writes and hashes chunks of a file, one chunk in flight while the next is received"""
+
+    def __init__(self, temp_path: str):
+        self.temp_path = temp_path
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self._file = None
+        self._pending: Optional[asyncio.Future] = None
+
+    def _write(self, data: bytes) -> None:
+        if self._file is None:
+            self._file = open(self.temp_path, "wb")
+        self.sha256.update(data)
+        self._file.write(data)
+
+    def _close(self, discard: bool) -> None:
+        if self._file is not None:
+            self._file.close()
+        if discard and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    async def write(self, data: bytes) -> None:
+        if self._pending is not None:
+            await self._pending
+        self.size += len(data)
+        self._pending = asyncio.ensure_future(run_io(self._write, data))
+
+    async def close(self, discard: bool = False) -> None:
+        try:
+            if self._pending is not None:
+                await asyncio.gather(self._pending, return_exceptions=discard)
+                self._pending = None
+            if self._file is None and not discard:
+                await run_io(self._write, b"")  # Empty file: create it
+        finally:
+            await run_io(self._close, discard)
+
+
+async def receive_upload(
+    request: Request,
+    field_name: str,
+    directory: str,
+    max_bytes: int,
+    allowed_extensions: Optional[Set[str]] = None
+) -> ReceivedUpload:
+    """
+    Stream the file of a multipart/form-data request into `directory`.
+
+    The body is parsed as it arrives and the file's bytes go straight to a
+    temporary file, hashed on the way; nothing is spooled first. Writes
+    happen on the upload I/O threads, overlapping with receiving the next
+    chunk. The caller moves the file into place (an atomic rename within
+    `directory`) or deletes it.
+
+    Args:
+        request: Request whose body has not been read yet
+        field_name: Form field holding the file; other fields are ignored
+        directory: Where the temporary file is written
+        max_bytes: Largest file accepted (0: no limit)
+        allowed_extensions: File extensions accepted, checked as soon as the part headers arrive
+
+    Raises:
+        UploadTooLarge: The request announces, or has sent, more than `max_bytes` of file
+        ValueError: The body is not multipart/form-data or has no file in `field_name`
+    """
+    body_limit = max_bytes + MULTIPART_OVERHEAD if max_bytes else None
+    content_length = request.headers.get("content-length")
+    if body_limit is not None and content_length and content_length.isdigit() and int(content_length) > body_limit:
+        raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type.strip().lower() != b"multipart/form-data" or not boundary:
+        raise ValueError("Expected a multipart/form-data body")
+
+    # The parser calls back synchronously while a chunk is fed to it; the
+    # file's bytes are collected and written once it returns
+    headers: List[Tuple[bytes, bytes]] = []
+    header_field = bytearray()
+    header_value = bytearray()
+    data = bytearray()
+    part = {"filename": None, "content_type": None, "in_file": False, "done": False}
+
+    def on_part_begin() -> None:
+        headers.clear()
+
+    def on_header_field(chunk: bytes, start: int, end: int) -> None:
+        header_field.extend(chunk[start:end])
+
+    def on_header_value(chunk: bytes, start: int, end: int) -> None:
+        header_value.extend(chunk[start:end])
+
+    def on_header_end() -> None:
+        headers.append((bytes(header_field).lower(), bytes(header_value)))
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished() -> None:
+        if part["filename"] is not None:
+            return  # Only the first file is kept
+        part_headers = dict(headers)
+        _, options = parse_options_header(part_headers.get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode("utf-8", "replace") == field_name and b"filename" in options:
+            part["filename"] = options[b"filename"].decode("utf-8", "replace")
+            if allowed_extensions is not None:
+                check_extension(part["filename"], allowed_extensions)  # Before any of the file is received
+            part["content_type"] = part_headers.get(b"content-type", b"").decode("latin-1") or None
+            part["in_file"] = True
+
+    def on_part_data(chunk: bytes, start: int, end: int) -> None:
+        if part["in_file"]:
+            data.extend(chunk[start:end])
+
+    def on_part_end() -> None:
+        if part["in_file"]:
+            part["in_file"] = False
+            part["done"] = True
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    writer = _TempFileWriter(os.path.join(directory, f"{uuid.uuid4()}.part"))
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if body_limit is not None and received > body_limit:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            parser.write(chunk)
+            if data:
+                if max_bytes and writer.size + len(data) > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+                await writer.write(bytes(data))
+                data.clear()
+        parser.finalize()
+
+        if not part["done"]:
+            raise ValueError(f"No file in form field '{field_name}'")
+        await writer.close()
+    except BaseException:
+        await writer.close(discard=True)
+        raise
+
+    return ReceivedUpload(
+        part["filename"], part["content_type"], writer.temp_path, writer.size, writer.sha256.hexdigest()
+    )
+
+
+async def store_document(
+    db: Session,
+    owner_id: str,
+    temp_path: str,
+    filename: str,
+    size: int,
+    content_hash: str,
+    mime_type: Optional[str] = None,
+    document_type: DocumentType = DocumentType.OTHER
+) -> Document:
+    """
+    Move a completely received file into storage and add its document.
+
+    Storage is content-addressed: when an identical file is stored already,
+    the stored copy is shared and the new one dropped. The file is recorded
+    in its own transaction first, which commits whatever `db` has pending
+    (see reserve_reference); the document and its file reference are then
+    added to `db` but not committed.
+    """
+    file_ext = file_extension(filename)
+    key = content_key(content_hash, file_ext)
+    reserve_reference(db, key, size)
+    await run_io(put_content, key, temp_path)
+    add_reference(db, key, size)
+
+    document = Document(
+        id=str(uuid.uuid4()),
+        filename=filename,
+        storage_key=key,
+        file_type=file_ext,
+        file_size=size,
+        mime_type=mime_type,
+        content_hash=content_hash,
+        status=DocumentStatus.UPLOADED,
+        document_type=document_type,
+        owner_id=owner_id
+    )
+    db.add(document)
+    return document
+
+
+def file_extension(filename: str) -> str:
+    """Lower-case extension of a file name, without the dot"""
+    return os.path.splitext(filename)[1].lower().replace('.', '')
+
+
+def check_extension(filename: str, allowed_extensions: Optional[Set[str]] = None) -> None:
+    """
+    Raises:
+        ValueError: The file's extension is not in `allowed_extensions` (default: ALLOWED_EXTENSIONS)
+    """
+    if allowed_extensions is None:
+        allowed_extensions = settings.ALLOWED_EXTENSIONS
+    if file_extension(filename) not in allowed_extensions:
+        raise ValueError(f"File type not allowed. Allowed types: {', '.join(allowed_extensions)}")
@@ -0,0 +1,79 @@
+import socket
+import ipaddress
+from typing import Union
+from urllib.parse import urlsplit
+
+from ..core.config import settings
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+# Host names that always mean this machine, whatever DNS says
+LOCAL_HOST_NAMES = {"localhost", "localhost.localdomain", "ip6-localhost", "ip6-loopback"}
+
+
+class DestinationRefused(ValueError):
+    """A webhook URL points at an address the server must not send requests to"""
+
+
+def _is_public(address: IPAddress) -> bool:
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    # Not global: loopback, private, link-local (cloud metadata), shared and reserved ranges
+    return address.is_global and not address.is_multicast
+
+
+def _host(url: str) -> str:
+    host = urlsplit(url).hostname
+    if not host:
+        raise DestinationRefused("URL has no host")
+    return host.rstrip(".").lower()
+
+
+def _allowed(host: str) -> bool:
+    return host in {allowed.lower() for allowed in settings.WEBHOOK_ALLOWED_HOSTS}
+
+
+def check_url(url: str) -> None:
+    """
+    Refuse a webhook URL that names a non-public destination outright (an
+    address literal or localhost); names are resolved when sending
+
+    Raises:
+        DestinationRefused: The URL must not be used
+    """
+    host = _host(url)
+    if _allowed(host):
+        return
+    if host in LOCAL_HOST_NAMES or host.endswith(".localhost"):
+        raise DestinationRefused(f"{host} is not a public host")
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return
+    if not _is_public(address):
+        raise DestinationRefused(f"{host} is not a public address")
+
+
+def check_destination(url: str) -> None:
+    """
+    Refuse to send to a webhook URL unless every address its host resolves
+    to is public. Run right before each request, so a name that was public
+    when the endpoint was registered cannot be pointed at the internal
+    network later. Hosts in WEBHOOK_ALLOWED_HOSTS are not checked.
+
+    Raises:
+        DestinationRefused: The URL must not be sent to
+    """
+    check_url(url)
+    host = _host(url)
+    if _allowed(host):
+        return
+    port = urlsplit(url).port or (443 if url.lower().startswith("https:") else 80)
+    try:
+        addresses = socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)
+    except socket.gaierror:
+        raise DestinationRefused(f"Cannot resolve {host}") from None
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if not _is_public(address):
+            raise DestinationRefused(f"{host} does not resolve to a public address")
@@ -0,0 +1,162 @@
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import select, insert, func
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.extraction import ExtractionJob, ExtractionStatus
+from ..models.webhook import WebhookEndpoint, WebhookOutbox, WebhookDeliveryStatus
+
+logger = logging.getLogger(__name__)
+
+# Final job states announced to webhooks, as extraction.<status>
+WEBHOOK_STATUSES = {
+    ExtractionStatus.COMPLETED, ExtractionStatus.FAILED, ExtractionStatus.PARTIAL, ExtractionStatus.CANCELLED
+}
+
+# Deliveries per endpoint the latency percentiles are computed from, newest first
+METRICS_SAMPLE_SIZE = 10000
+
+
+class FinishedJob(NamedTuple):
+    """Final state of a job, as announced to webhooks"""
+    job_id: str
+    status: ExtractionStatus
+    error_message: Optional[str] = None
+    fields: Sequence[Dict[str, Any]] = ()  # extraction_data rows
+
+
+def enqueue_job_events(db: Session, jobs: Sequence[FinishedJob], now: Optional[datetime] = None) -> int:
+    """
+    Add an outbox event per finished job and active endpoint of its owner.
+
+    Does not commit: call it in the transaction that writes the jobs' final
+    states, so that an event exists exactly when the state it announces
+    does. Costs one query when the owners have no endpoints.
+
+    Returns:
+        Number of events added
+    """
+    jobs = {job.job_id: job for job in jobs if job.status in WEBHOOK_STATUSES}
+    if not jobs:
+        return 0
+
+    targets = db.execute(
+        select(ExtractionJob.id, ExtractionJob.document_id, ExtractionJob.template_id, WebhookEndpoint.id)
+        .join(WebhookEndpoint, WebhookEndpoint.user_id == ExtractionJob.user_id)
+        .where(ExtractionJob.id.in_(list(jobs)), WebhookEndpoint.is_active.is_(True))
+    ).all()
+    if not targets:
+        return 0
+
+    now = now or datetime.utcnow()
+    rows = []
+    for job_id, document_id, template_id, endpoint_id in targets:
+        job = jobs[job_id]
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "event": f"extraction.{job.status.value}",
+            "payload": {
+                "job_id": job_id,
+                "document_id": document_id,
+                "template_id": template_id,
+                "status": job.status.value,
+                "error_message": job.error_message,
+                "fields": {
+                    row["field_name"]: {
+                        "value": row["extracted_value"],
+                        "confidence": row["confidence"],
+                        "is_valid": row["is_valid"],
+                    }
+                    for row in job.fields
+                },
+            },
+            "status": WebhookDeliveryStatus.PENDING,
+            "attempts": 0,
+            "created_at": now,
+            "endpoint_id": endpoint_id,
+            "job_id": job_id,
+        })
+    db.execute(insert(WebhookOutbox), rows)
+    return len(rows)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 3)
+
+
+def delivery_metrics(db: Session, user_id: str) -> Dict[str, Any]:
+    """
+    Delivery lag of a user's endpoints.
+
+    `oldest_pending_seconds` is how far behind an endpoint is right now;
+    the latency percentiles are the times from event to delivery over the
+    last WEBHOOK_METRICS_WINDOW seconds.
+    """
+    now = datetime.utcnow()
+    window_start = now - timedelta(seconds=settings.WEBHOOK_METRICS_WINDOW)
+    endpoints = db.query(WebhookEndpoint).filter(WebhookEndpoint.user_id == user_id).all()
+    endpoint_ids = [endpoint.id for endpoint in endpoints]
+
+    pending = {
+        endpoint_id: (count, oldest)
+        for endpoint_id, count, oldest in db.execute(
+            select(WebhookOutbox.endpoint_id, func.count(), func.min(WebhookOutbox.created_at))
+            .where(
+                WebhookOutbox.endpoint_id.in_(endpoint_ids),
+                WebhookOutbox.status == WebhookDeliveryStatus.PENDING
+            )
+            .group_by(WebhookOutbox.endpoint_id)
+        ).all()
+    }
+    failed = dict(db.execute(
+        select(WebhookOutbox.endpoint_id, func.count())
+        .where(
+            WebhookOutbox.endpoint_id.in_(endpoint_ids),
+            WebhookOutbox.status == WebhookDeliveryStatus.FAILED
+        )
+        .group_by(WebhookOutbox.endpoint_id)
+    ).all())
+
+    results = []
+    for endpoint in endpoints:
+        deliveries = db.execute(
+            select(WebhookOutbox.created_at, WebhookOutbox.delivered_at)
+            .where(
+                WebhookOutbox.endpoint_id == endpoint.id,
+                WebhookOutbox.status == WebhookDeliveryStatus.DELIVERED,
+                WebhookOutbox.delivered_at >= window_start
+            )
+            .order_by(WebhookOutbox.delivered_at.desc())
+            .limit(METRICS_SAMPLE_SIZE)
+        ).all()
+        latencies = sorted((delivered_at - created_at).total_seconds() for created_at, delivered_at in deliveries)
+        pending_count, oldest_pending = pending.get(endpoint.id, (0, None))
+        results.append({
+            "endpoint_id": endpoint.id,
+            "url": endpoint.url,
+            "is_active": endpoint.is_active,
+            "pending": pending_count,
+            "oldest_pending_seconds": round((now - oldest_pending).total_seconds(), 3) if oldest_pending else 0.0,
+            "failed": failed.get(endpoint.id, 0),
+            "delivered": len(latencies),
+            "latency_p50_seconds": _percentile(latencies, 0.5),
+            "latency_p95_seconds": _percentile(latencies, 0.95),
+            "latency_max_seconds": _percentile(latencies, 1.0),
+            "consecutive_failures": endpoint.failure_count,
+            "retry_after": endpoint.retry_after,
+            "last_error": endpoint.last_error,
+        })
+
+    return {
+        "window_seconds": settings.WEBHOOK_METRICS_WINDOW,
+        "pending": sum(result["pending"] for result in results),
+        "oldest_pending_seconds": max((result["oldest_pending_seconds"] for result in results), default=0.0),
+        "endpoints": results,
+    }
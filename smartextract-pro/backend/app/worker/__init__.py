@@ -0,0 +1,31 @@
+# app/worker/__init__.py
+# Extraction worker subsystem: runs OCR jobs and webhook deliveries outside the API request threads
+from .pool import ExtractionWorkerPool
+from .queue import JobQueue
+from .runner import (
+    ExtractionWorker,
+    enqueue_extraction_job,
+    enqueue_extraction_jobs,
+    start_embedded_worker,
+    stop_embedded_worker
+)
+from .webhooks import (
+    WebhookDispatcher,
+    start_webhook_dispatcher,
+    stop_webhook_dispatcher,
+    notify_webhook_dispatcher
+)
+
+__all__ = [
+    'ExtractionWorkerPool',
+    'JobQueue',
+    'ExtractionWorker',
+    'enqueue_extraction_job',
+    'enqueue_extraction_jobs',
+    'start_embedded_worker',
+    'stop_embedded_worker',
+    'WebhookDispatcher',
+    'start_webhook_dispatcher',
+    'stop_webhook_dispatcher',
+    'notify_webhook_dispatcher'
+]
@@ -0,0 +1,49 @@
+"""
+Standalone extraction worker.
+
+Usage:
+    python -m app.worker [--concurrency N] [--poll-interval SECONDS] [--no-webhooks]
+"""
+import argparse
+import logging
+import signal
+
+from app.core.config import settings
+from .runner import ExtractionWorker
+from .webhooks import start_webhook_dispatcher, stop_webhook_dispatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a SmartExtract Pro extraction worker')
+    parser.add_argument('--concurrency', type=int, default=settings.EXTRACTION_WORKERS,
+                        help='Number of worker processes')
+    parser.add_argument('--poll-interval', type=float, default=settings.WORKER_POLL_INTERVAL,
+                        help='Seconds between queue polls when idle')
+    parser.add_argument('--no-webhooks', action='store_true',
+                        help='Do not deliver webhooks from this worker')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    worker = ExtractionWorker(concurrency=args.concurrency, poll_interval=args.poll_interval)
+
+    def handle_signal(signum, frame):
+        logging.getLogger(__name__).info("Shutting down extraction worker...")
+        worker.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    if not args.no_webhooks:
+        start_webhook_dispatcher()
+    try:
+        worker.run()
+    finally:
+        stop_webhook_dispatcher()
+
+
+if __name__ == "__main__":
+    main()
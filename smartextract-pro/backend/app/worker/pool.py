@@ -0,0 +1,117 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Optional
+
+from app.core.config import settings
+from app.services.job_results import JobOutcome
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker_process() -> None:
+    """Initializer run once in every worker process"""
+    # One worker process per core: keep tesseract from spawning its own
+    # OpenMP threads on top of that.
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+    # Never reuse database connections inherited from the parent process
+    from app.core.database import engine, background_engine
+    engine.dispose(close=False)
+    background_engine.dispose(close=False)
+
+
+def run_extraction_job(job_id: str) -> JobOutcome:
+    """Run a single extraction job inside a worker process.
+
+    The worker owns its database session for the lifetime of the job, so
+    nothing from the API request that created the job is shared. Results
+    are returned rather than written: the worker loop persists the outcomes
+    of several jobs in one transaction.
+    """
+    from app.core.database import SessionLocal
+    from app.models.extraction import ExtractionJob
+    from app.services.extraction_service import ExtractionService
+
+    db = SessionLocal()
+    try:
+        job = db.query(ExtractionJob).filter(ExtractionJob.id == job_id).first()
+        if not job:
+            raise ValueError(f"Extraction job with ID {job_id} not found")
+        return ExtractionService.extract(db, job)
+    finally:
+        db.close()
+        SessionLocal.remove()
+
+
+class ExtractionWorkerPool:
+    """
+    Process pool that runs extraction jobs off the API server.
+
+    OCR and image processing are CPU bound and blocking, so they run in
+    dedicated processes (one per core by default) instead of the API's
+    threadpool.
+    """
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Initialize the worker pool
+
+        Args:
+            max_workers: Number of worker processes (default: settings.EXTRACTION_WORKERS)
+        """
+        self.max_workers = max(1, max_workers or settings.EXTRACTION_WORKERS)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        """Start the worker processes if they are not running yet"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker_process,
+            )
+            logger.info(f"Started extraction worker pool with {self.max_workers} processes")
+
+    def submit(self, job_id: str) -> Future:
+        """Run an extraction job on one of the worker processes; the future's result is its JobOutcome"""
+        if self._executor is None:
+            self.start()
+        future = self._executor.submit(run_extraction_job, job_id)
+        future.add_done_callback(lambda f: self._on_job_done(job_id, f))
+        return future
+
+    def restart(self) -> None:
+        """Replace a broken pool (e.g. after a worker process was killed)"""
+        self.shutdown(wait=False)
+        self.start()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is None:
+                return
+            self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._executor = None
+            logger.info("Extraction worker pool stopped")
+
+    @staticmethod
+    def _on_job_done(job_id: str, future: Future) -> None:
+        """Log the outcome of a finished job"""
+        if future.cancelled():
+            logger.warning(f"Extraction job {job_id} was cancelled before it ran")
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Extraction job {job_id} crashed in worker: {error}")
+        else:
+            logger.info(f"Extraction job {job_id} finished with status {future.result().status.value}")
+
@@ -0,0 +1,313 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update, and_, or_, case, func, literal
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.extraction import ExtractionJob, ExtractionStatus, ExtractionPriority
+from app.services.webhook_outbox import FinishedJob, enqueue_job_events
+
+logger = logging.getLogger(__name__)
+
+
+def _per_tenant(user_id_column, overrides: Dict[str, Any], default: Any):
+    """SQL expression for a per-user setting: the user's override, else the default"""
+    if not overrides:
+        return literal(default)
+    return case(overrides, value=user_id_column, else_=literal(default))
+
+
+class JobQueue:
+    """
+    Lease-based job queue on top of the extraction_jobs table.
+
+    A PENDING row is a queued job. Claiming a job moves it to PROCESSING and
+    gives the claiming worker a time-limited lease that it keeps alive with
+    heartbeats. If a worker dies, its lease expires and any other worker
+    (on any node) can claim the job again. Which queued jobs are claimed
+    first is decided by a fair scheduler (see `_schedule`).
+    """
+    def __init__(
+        self,
+        worker_id: str,
+        lease_seconds: Optional[int] = None,
+        max_attempts: Optional[int] = None
+    ):
+        """
+        Initialize the queue
+
+        Args:
+            worker_id: Unique identifier of the worker holding leases
+            lease_seconds: Lease duration (default: settings.JOB_LEASE_SECONDS)
+            max_attempts: Claims allowed per job (default: settings.JOB_MAX_ATTEMPTS)
+        """
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+
+    def _claimable(self, now: datetime):
+        """Condition for jobs that may be claimed: queued, or stuck with an expired lease"""
+        return and_(
+            or_(
+                ExtractionJob.status == ExtractionStatus.PENDING,
+                and_(
+                    ExtractionJob.status == ExtractionStatus.PROCESSING,
+                    ExtractionJob.lease_expires_at < now
+                )
+            ),
+            ExtractionJob.attempts < self.max_attempts,
+            ExtractionJob.cancel_requested.is_(False)
+        )
+
+    def claim(self, db: Session, limit: int = 1, bulk_limit: Optional[int] = None) -> List[Tuple[str, ExtractionPriority]]:
+        """
+        Claim up to `limit` jobs for this worker, at most `bulk_limit` of them bulk
+
+        Returns:
+            IDs and priorities of the claimed jobs, in scheduling order
+        """
+        if limit <= 0:
+            return []
+
+        now = datetime.utcnow()
+        lease = {
+            "status": ExtractionStatus.PROCESSING,
+            "lease_owner": self.worker_id,
+            "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+            "heartbeat_at": now,
+            "attempts": ExtractionJob.attempts + 1,
+        }
+
+        try:
+            candidates = self._schedule(db, now, limit, bulk_limit)
+            if not candidates:
+                db.rollback()
+                return []
+            if db.get_bind().dialect.name == "postgresql":
+                job_ids = self._claim_skip_locked(db, now, list(candidates), lease)
+            else:
+                job_ids = self._claim_atomic_update(db, now, list(candidates), lease)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        claimed = [(job_id, priority) for job_id, priority in candidates.items() if job_id in job_ids]
+        if claimed:
+            logger.info(f"Worker {self.worker_id} claimed {len(claimed)} extraction job(s)")
+        return claimed
+
+    def _schedule(
+        self, db: Session, now: datetime, limit: int, bulk_limit: Optional[int]
+    ) -> Dict[str, ExtractionPriority]:
+        """
+        Pick the next jobs to run, by weighted fair queuing across users.
+
+        Interactive jobs always go before bulk ones. Within a priority, each
+        user's queued jobs are numbered in order after the jobs the user
+        already has running, and a job's turn is its number divided by the
+        user's weight: a user with 20k queued scans gets the same share of
+        the workers as a user with one invoice, and that invoice's turn comes
+        first. Jobs past a user's concurrency cap are not picked. Caps are
+        checked against committed rows, so workers claiming at the same
+        instant may overshoot a cap by a job or two.
+
+        Returns:
+            IDs and priorities of the picked jobs, in scheduling order
+        """
+        priority_rank = case((ExtractionJob.priority == ExtractionPriority.BULK, 1), else_=0)
+        queued = (
+            select(
+                ExtractionJob.id,
+                ExtractionJob.user_id,
+                ExtractionJob.priority,
+                ExtractionJob.created_at,
+                priority_rank.label("priority_rank"),
+                func.row_number().over(
+                    partition_by=ExtractionJob.user_id,
+                    order_by=(priority_rank, ExtractionJob.created_at)
+                ).label("position")
+            )
+            .where(self._claimable(now))
+            .subquery()
+        )
+        running = (
+            select(ExtractionJob.user_id, func.count().label("running"))
+            .where(
+                ExtractionJob.status == ExtractionStatus.PROCESSING,
+                ExtractionJob.lease_expires_at >= now
+            )
+            .group_by(ExtractionJob.user_id)
+            .subquery()
+        )
+
+        slot = func.coalesce(running.c.running, 0) + queued.c.position
+        weight = _per_tenant(queued.c.user_id, settings.TENANT_WEIGHTS, 1.0)
+        query = (
+            select(queued.c.id, queued.c.priority)
+            .outerjoin(running, running.c.user_id == queued.c.user_id)
+            .order_by(queued.c.priority_rank, slot * 1.0 / weight, queued.c.created_at)
+            .limit(limit)
+        )
+        if settings.TENANT_MAX_CONCURRENT_JOBS > 0 or settings.TENANT_CONCURRENCY_LIMITS:
+            cap = _per_tenant(
+                queued.c.user_id, settings.TENANT_CONCURRENCY_LIMITS, settings.TENANT_MAX_CONCURRENT_JOBS or None
+            )
+            query = query.where(or_(cap.is_(None), slot <= cap))
+
+        picked: Dict[str, ExtractionPriority] = {}
+        for job_id, priority in db.execute(query).all():
+            if priority == ExtractionPriority.BULK and bulk_limit is not None:
+                if bulk_limit <= 0:
+                    break  # Only bulk jobs follow
+                bulk_limit -= 1
+            picked[job_id] = priority
+        return picked
+
+    def _claim_skip_locked(self, db: Session, now: datetime, job_ids: List[str], lease: dict) -> Set[str]:
+        """Claim with SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never block each other"""
+        locked = db.execute(
+            select(ExtractionJob.id)
+            .where(ExtractionJob.id.in_(job_ids), self._claimable(now))
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+        if locked:
+            db.execute(
+                update(ExtractionJob)
+                .where(ExtractionJob.id.in_(locked))
+                .values(**lease)
+                .execution_options(synchronize_session=False)
+            )
+        return set(locked)
+
+    def _claim_atomic_update(self, db: Session, now: datetime, job_ids: List[str], lease: dict) -> Set[str]:
+        """
+        Claim with a single UPDATE statement.
+
+        SQLite has no row locks but serializes writers, so re-checking that
+        the jobs are still claimable inside the UPDATE makes the claim
+        atomic: a job another worker took in the meantime is skipped. The
+        claimed rows are then read back by lease.
+        """
+        db.execute(
+            update(ExtractionJob)
+            .where(ExtractionJob.id.in_(job_ids), self._claimable(now))
+            .values(**lease)
+            .execution_options(synchronize_session=False)
+        )
+
+        return set(db.execute(
+            select(ExtractionJob.id).where(
+                ExtractionJob.id.in_(job_ids),
+                ExtractionJob.lease_owner == self.worker_id,
+                ExtractionJob.heartbeat_at == now
+            )
+        ).scalars().all())
+
+    def heartbeat(self, db: Session, job_ids: List[str]) -> None:
+        """Extend the leases of jobs this worker is still processing"""
+        if not job_ids:
+            return
+        now = datetime.utcnow()
+        db.execute(
+            update(ExtractionJob)
+            .where(
+                ExtractionJob.id.in_(job_ids),
+                ExtractionJob.lease_owner == self.worker_id,
+                ExtractionJob.status == ExtractionStatus.PROCESSING
+            )
+            .values(
+                lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                heartbeat_at=now
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    def release(self, db: Session, job_id: str) -> None:
+        """Give a job back to the queue, e.g. after its worker process crashed (a cancelled job ends instead)"""
+        db.execute(
+            update(ExtractionJob)
+            .where(
+                ExtractionJob.id == job_id,
+                ExtractionJob.lease_owner == self.worker_id,
+                ExtractionJob.status == ExtractionStatus.PROCESSING
+            )
+            .values(
+                status=case(
+                    (ExtractionJob.cancel_requested.is_(True), literal(ExtractionStatus.CANCELLED, ExtractionJob.status.type)),
+                    else_=literal(ExtractionStatus.PENDING, ExtractionJob.status.type)
+                ),
+                lease_owner=None,
+                lease_expires_at=None
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    def _finish(self, db: Session, condition, status: ExtractionStatus, error_message: str) -> List[str]:
+        """
+        End the jobs matching `condition` with a final status and announce them to webhooks, in one transaction
+
+        Returns:
+            IDs of the ended jobs
+        """
+        statement = (
+            update(ExtractionJob)
+            .where(condition)
+            .values(status=status, error_message=error_message, lease_owner=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            if db.get_bind().dialect.update_returning:
+                job_ids = list(db.execute(statement.returning(ExtractionJob.id)).scalars().all())
+            else:
+                job_ids = list(db.execute(select(ExtractionJob.id).where(condition).with_for_update()).scalars().all())
+                if job_ids:
+                    db.execute(statement.where(ExtractionJob.id.in_(job_ids)))
+            enqueue_job_events(db, [FinishedJob(job_id, status, error_message) for job_id in job_ids])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return job_ids
+
+    def cancel_abandoned(self, db: Session) -> int:
+        """Mark running jobs that were cancelled and whose worker died as CANCELLED instead of re-running them"""
+        now = datetime.utcnow()
+        job_ids = self._finish(
+            db,
+            and_(
+                ExtractionJob.cancel_requested.is_(True),
+                ExtractionJob.status == ExtractionStatus.PROCESSING,
+                ExtractionJob.lease_expires_at < now
+            ),
+            ExtractionStatus.CANCELLED,
+            "Cancelled by user"
+        )
+        return len(job_ids)
+
+    def fail_exhausted(self, db: Session) -> int:
+        """Mark jobs that keep losing their lease as FAILED instead of retrying forever"""
+        now = datetime.utcnow()
+        job_ids = self._finish(
+            db,
+            and_(
+                ExtractionJob.attempts >= self.max_attempts,
+                or_(
+                    ExtractionJob.status == ExtractionStatus.PENDING,
+                    and_(
+                        ExtractionJob.status == ExtractionStatus.PROCESSING,
+                        ExtractionJob.lease_expires_at < now
+                    )
+                )
+            ),
+            ExtractionStatus.FAILED,
+            f"Job abandoned after {self.max_attempts} attempts"
+        )
+        if job_ids:
+            logger.warning(f"Marked {len(job_ids)} abandoned extraction job(s) as failed")
+        return len(job_ids)
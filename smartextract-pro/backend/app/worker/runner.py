@@ -0,0 +1,233 @@
+import os
+import time
+import uuid
+import socket
+import logging
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.database import BackgroundSessionLocal
+from app.models.extraction import ExtractionPriority
+from app.services.job_results import JobOutcome, persist_outcomes
+from app.services.content_store import collect_unreferenced_files
+from app.services.upload_sessions import collect_expired_sessions
+from .pool import ExtractionWorkerPool
+from .queue import JobQueue
+from .webhooks import notify_webhook_dispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionWorker:
+    """
+    Claims extraction jobs from the database queue and runs them on a
+    process pool. Any number of workers can run on any number of machines
+    against the same database.
+
+    Worker processes only compute results; the loop writes the outcomes of
+    finished jobs in groups, one transaction per group, so a busy worker
+    does not pay a commit per job.
+    """
+    def __init__(self, concurrency: Optional[int] = None, poll_interval: Optional[float] = None):
+        """
+        Initialize the worker
+
+        Args:
+            concurrency: Number of worker processes (default: settings.EXTRACTION_WORKERS)
+            poll_interval: Seconds to wait between polls when idle (default: settings.WORKER_POLL_INTERVAL)
+        """
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.pool = ExtractionWorkerPool(concurrency)
+        self.queue = JobQueue(self.worker_id)
+        self.poll_interval = poll_interval or settings.WORKER_POLL_INTERVAL
+        self._in_flight: Dict[str, Future] = {}
+        self._bulk_in_flight: Set[str] = set()
+        self._pending_outcomes: List[JobOutcome] = []
+        self._first_pending_at = 0.0
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_heartbeat = 0.0
+        self._last_upload_gc = 0.0
+        self._last_storage_gc = 0.0
+
+    def notify(self) -> None:
+        """Wake the worker up, e.g. right after a job was queued"""
+        self._wakeup.set()
+
+    def run(self) -> None:
+        """Claim and run jobs until stop() is called"""
+        logger.info(f"Extraction worker {self.worker_id} started")
+        self.pool.start()
+        try:
+            while not self._stop.is_set():
+                self._wakeup.clear()
+                try:
+                    self._tick()
+                except Exception as e:
+                    logger.error(f"Extraction worker loop error: {e}")
+                self._wakeup.wait(self._wait_timeout())
+        finally:
+            self.pool.shutdown(wait=True)
+            self._reap()
+            self._flush_outcomes()
+            logger.info(f"Extraction worker {self.worker_id} stopped")
+
+    def _wait_timeout(self) -> float:
+        """Seconds to sleep: until the next poll, or until pending results are due"""
+        if not self._pending_outcomes:
+            return self.poll_interval
+        due = self._first_pending_at + settings.RESULT_COMMIT_INTERVAL - time.monotonic()
+        return max(0.0, min(self.poll_interval, due))
+
+    def _tick(self) -> None:
+        """One iteration of the worker loop"""
+        self._reap()
+        if self._pending_outcomes and (
+            len(self._pending_outcomes) >= settings.RESULT_BATCH_SIZE
+            or not self._in_flight
+            or time.monotonic() - self._first_pending_at >= settings.RESULT_COMMIT_INTERVAL
+        ):
+            self._flush_outcomes()
+
+        db = BackgroundSessionLocal()
+        try:
+            now = time.monotonic()
+            if self._in_flight and now - self._last_heartbeat >= settings.JOB_HEARTBEAT_INTERVAL:
+                self.queue.heartbeat(db, list(self._in_flight))
+                self._last_heartbeat = now
+
+            free_slots = self.pool.max_workers - len(self._in_flight)
+            if free_slots > 0:
+                self.queue.fail_exhausted(db)
+                self.queue.cancel_abandoned(db)
+                bulk_limit = self.bulk_slots - len(self._bulk_in_flight)
+                for job_id, priority in self.queue.claim(db, free_slots, bulk_limit):
+                    self._submit(job_id, priority)
+
+            # Workers share UPLOAD_FOLDER and storage with the API, so they also sweep
+            # abandoned uploads and files of deleted documents
+            if now - self._last_upload_gc >= settings.UPLOAD_SESSION_GC_INTERVAL:
+                self._last_upload_gc = now
+                collect_expired_sessions(db)
+            if now - self._last_storage_gc >= settings.STORAGE_GC_INTERVAL:
+                self._last_storage_gc = now
+                collect_unreferenced_files(db)
+        finally:
+            db.close()
+            BackgroundSessionLocal.remove()
+
+    @property
+    def bulk_slots(self) -> int:
+        """Processes bulk jobs may occupy; the others are kept free for interactive jobs"""
+        return max(1, int(self.pool.max_workers * settings.BULK_WORKER_SHARE))
+
+    def _submit(self, job_id: str, priority: ExtractionPriority = ExtractionPriority.INTERACTIVE) -> None:
+        """Run a claimed job on the pool"""
+        future = self.pool.submit(job_id)
+        future.add_done_callback(lambda f: self._wakeup.set())
+        self._in_flight[job_id] = future
+        if priority == ExtractionPriority.BULK:
+            self._bulk_in_flight.add(job_id)
+
+    def _reap(self) -> None:
+        """Collect the outcomes of finished jobs and give crashed ones back to the queue"""
+        finished = [job_id for job_id, future in self._in_flight.items() if future.done()]
+        if not finished:
+            return
+
+        pool_broken = False
+        db = BackgroundSessionLocal()
+        try:
+            for job_id in finished:
+                future = self._in_flight.pop(job_id)
+                self._bulk_in_flight.discard(job_id)
+                error = None if future.cancelled() else future.exception()
+                if future.cancelled() or error is not None:
+                    pool_broken = pool_broken or isinstance(error, BrokenProcessPool)
+                    self.queue.release(db, job_id)
+                else:
+                    if not self._pending_outcomes:
+                        self._first_pending_at = time.monotonic()
+                    self._pending_outcomes.append(future.result())
+        finally:
+            db.close()
+            BackgroundSessionLocal.remove()
+
+        if pool_broken and not self._stop.is_set():
+            logger.warning("Extraction worker pool broke, restarting it")
+            self.pool.restart()
+
+    def _flush_outcomes(self) -> None:
+        """Write the results of all finished jobs in one transaction"""
+        if not self._pending_outcomes:
+            return
+
+        outcomes, self._pending_outcomes = self._pending_outcomes, []
+        db = BackgroundSessionLocal()
+        try:
+            written = persist_outcomes(db, outcomes, lease_owner=self.worker_id)
+            logger.info(f"Committed results of {len(written)} extraction job(s)")
+            if written:
+                notify_webhook_dispatcher()
+        except Exception as e:
+            # The leases are still ours: give the jobs back so they run again
+            logger.error(f"Failed to write results of {len(outcomes)} extraction job(s): {e}")
+            for outcome in outcomes:
+                self.queue.release(db, outcome.job_id)
+        finally:
+            db.close()
+            BackgroundSessionLocal.remove()
+
+    def start_in_thread(self) -> None:
+        """Run the worker loop in a background thread"""
+        self._thread = threading.Thread(target=self.run, name="extraction-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop claiming new jobs and wait for running ones to finish"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# Worker running inside the API process (settings.EMBEDDED_WORKER)
+_embedded_worker: Optional[ExtractionWorker] = None
+
+
+def start_embedded_worker() -> None:
+    """Start a worker inside the API process, for single-node deployments"""
+    global _embedded_worker
+    if _embedded_worker is None:
+        _embedded_worker = ExtractionWorker()
+        _embedded_worker.start_in_thread()
+
+
+def stop_embedded_worker() -> None:
+    """Stop the embedded worker, if any"""
+    global _embedded_worker
+    if _embedded_worker is not None:
+        _embedded_worker.stop()
+        _embedded_worker = None
+
+
+def enqueue_extraction_job(job_id: str) -> None:
+    """
+    Signal that a job was queued.
+
+    The committed PENDING row is the durable queue entry; this only wakes
+    a local worker so it does not wait for its next poll.
+    """
+    if _embedded_worker is not None:
+        _embedded_worker.notify()
+
+
+def enqueue_extraction_jobs(job_ids: List[str]) -> None:
+    """Signal that a batch of jobs was queued, with a single wake-up"""
+    if job_ids and _embedded_worker is not None:
+        _embedded_worker.notify()
@@ -0,0 +1,420 @@
+import os
+import hmac
+import json
+import time
+import uuid
+import random
+import socket
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import httpx
+from sqlalchemy import select, update, delete, and_, or_, case, func, literal
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import BackgroundSessionLocal
+from app.models.webhook import WebhookEndpoint, WebhookOutbox, WebhookDeliveryStatus
+from app.services.webhook_destinations import DestinationRefused, check_destination
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "X-SmartExtract-Signature"
+TIMESTAMP_HEADER = "X-SmartExtract-Timestamp"
+PRUNE_INTERVAL = 300  # Seconds between deletions of old delivered and failed events
+
+
+class Batch(NamedTuple):
+    """Events of one endpoint sent in one request"""
+    endpoint_id: str
+    url: str
+    secret: str
+    event_ids: List[str]
+    events: List[Dict[str, Any]]
+
+
+class DeliveryResult(NamedTuple):
+    endpoint_id: str
+    event_ids: List[str]
+    error: Optional[str] = None  # None when delivered
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    """Signature of a request body: HMAC-SHA256 of "<timestamp>.<body>" with the endpoint's secret"""
+    return hmac.new(secret.encode(), timestamp.encode() + b"." + body, hashlib.sha256).hexdigest()
+
+
+def backoff_seconds(failures: int) -> float:
+    """Time an endpoint is left alone after `failures` failed requests in a row, with jitter"""
+    delay = min(settings.WEBHOOK_BACKOFF_MAX, settings.WEBHOOK_BACKOFF_BASE * 2 ** (failures - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class WebhookDispatcher:
+    """
+    Delivers the webhook outbox.
+
+    Due events are claimed with a lease, like extraction jobs, so any number
+    of dispatchers can run against the same database. The events of an
+    endpoint are sent together, oldest first and up to WEBHOOK_BATCH_SIZE
+    per request: one at a time while the receiver keeps up, full batches
+    once it has fallen behind. Each endpoint has at most one request in
+    flight, sent over a shared client that keeps connections alive between
+    requests. A failed request backs the whole endpoint off exponentially;
+    events that failed WEBHOOK_MAX_ATTEMPTS times are marked FAILED.
+    Delivery is at least once: receivers should skip event IDs they have
+    already seen.
+    """
+    def __init__(self, concurrency: Optional[int] = None, poll_interval: Optional[float] = None):
+        """
+        Initialize the dispatcher
+
+        Args:
+            concurrency: Requests in flight (default: settings.WEBHOOK_DELIVERY_CONCURRENCY)
+            poll_interval: Seconds between outbox polls when idle (default: settings.WEBHOOK_POLL_INTERVAL)
+        """
+        self.dispatcher_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.concurrency = concurrency or settings.WEBHOOK_DELIVERY_CONCURRENCY
+        self.poll_interval = poll_interval or settings.WEBHOOK_POLL_INTERVAL
+        self._in_flight: Dict[str, Future] = {}  # By endpoint
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_prune = 0.0
+
+    def notify(self) -> None:
+        """Wake the dispatcher up, e.g. right after events were written"""
+        self._wakeup.set()
+
+    def run(self) -> None:
+        """Deliver events until stop() is called"""
+        logger.info(f"Webhook dispatcher {self.dispatcher_id} started")
+        client = httpx.Client(
+            timeout=settings.WEBHOOK_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+                keepalive_expiry=settings.WEBHOOK_KEEPALIVE_EXPIRY
+            ),
+            headers={"User-Agent": f"{settings.PROJECT_NAME} Webhooks"}
+        )
+        executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="webhook")
+        try:
+            while not self._stop.is_set():
+                self._wakeup.clear()
+                sent = 0
+                try:
+                    sent = self._tick(client, executor)
+                except Exception as e:
+                    logger.error(f"Webhook dispatcher loop error: {e}")
+                if not sent:
+                    self._wakeup.wait(self.poll_interval)
+        finally:
+            executor.shutdown(wait=True)
+            try:
+                self._reap()
+            finally:
+                client.close()
+            logger.info(f"Webhook dispatcher {self.dispatcher_id} stopped")
+
+    def _tick(self, client: httpx.Client, executor: ThreadPoolExecutor) -> int:
+        """One iteration of the dispatcher loop; returns the number of requests started"""
+        self._reap()
+
+        db = BackgroundSessionLocal()
+        try:
+            if time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+                self._prune(db)
+                self._last_prune = time.monotonic()
+            batches = self._claim(db, self.concurrency - len(self._in_flight))
+        finally:
+            db.close()
+            BackgroundSessionLocal.remove()
+
+        for batch in batches:
+            future = executor.submit(self._send, client, batch)
+            future.add_done_callback(lambda f: self._wakeup.set())
+            self._in_flight[batch.endpoint_id] = future
+        return len(batches)
+
+    def _claim(self, db: Session, limit: int) -> List[Batch]:
+        """
+        Lease the next events of up to `limit` endpoints, the endpoints that are furthest behind first
+
+        Endpoints that are backing off, inactive or already being sent to
+        are skipped.
+        """
+        if limit <= 0:
+            return []
+
+        now = datetime.utcnow()
+        due = and_(
+            WebhookOutbox.status == WebhookDeliveryStatus.PENDING,
+            or_(WebhookOutbox.lease_expires_at.is_(None), WebhookOutbox.lease_expires_at < now)
+        )
+        try:
+            endpoints = db.execute(
+                select(WebhookEndpoint.id, WebhookEndpoint.url, WebhookEndpoint.secret)
+                .join(WebhookOutbox, WebhookOutbox.endpoint_id == WebhookEndpoint.id)
+                .where(
+                    due,
+                    WebhookEndpoint.is_active.is_(True),
+                    or_(WebhookEndpoint.retry_after.is_(None), WebhookEndpoint.retry_after <= now),
+                    WebhookEndpoint.id.notin_(list(self._in_flight))
+                )
+                .group_by(WebhookEndpoint.id, WebhookEndpoint.url, WebhookEndpoint.secret)
+                .order_by(func.min(WebhookOutbox.created_at))
+                .limit(limit)
+            ).all()
+            if not endpoints:
+                db.rollback()
+                return []
+
+            queued = (
+                select(
+                    WebhookOutbox.id,
+                    func.row_number().over(
+                        partition_by=WebhookOutbox.endpoint_id,
+                        order_by=WebhookOutbox.created_at
+                    ).label("position")
+                )
+                .where(due, WebhookOutbox.endpoint_id.in_([endpoint.id for endpoint in endpoints]))
+                .subquery()
+            )
+            event_ids = list(db.execute(
+                select(queued.c.id).where(queued.c.position <= settings.WEBHOOK_BATCH_SIZE)
+            ).scalars().all())
+            if db.get_bind().dialect.name == "postgresql":
+                event_ids = list(db.execute(
+                    select(WebhookOutbox.id)
+                    .where(WebhookOutbox.id.in_(event_ids), due)
+                    .with_for_update(skip_locked=True)
+                ).scalars().all())
+
+            # Re-checking `due` makes the lease atomic; what another dispatcher took is not read back
+            lease_expires_at = now + timedelta(seconds=settings.WEBHOOK_LEASE_SECONDS)
+            if event_ids:
+                db.execute(
+                    update(WebhookOutbox)
+                    .where(WebhookOutbox.id.in_(event_ids), due)
+                    .values(lease_owner=self.dispatcher_id, lease_expires_at=lease_expires_at)
+                    .execution_options(synchronize_session=False)
+                )
+            events = db.execute(
+                select(
+                    WebhookOutbox.id,
+                    WebhookOutbox.endpoint_id,
+                    WebhookOutbox.event,
+                    WebhookOutbox.payload,
+                    WebhookOutbox.created_at
+                )
+                .where(
+                    WebhookOutbox.id.in_(event_ids),
+                    WebhookOutbox.lease_owner == self.dispatcher_id,
+                    WebhookOutbox.lease_expires_at == lease_expires_at
+                )
+                .order_by(WebhookOutbox.created_at)
+            ).all()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        batches = []
+        for endpoint in endpoints:
+            endpoint_events = [event for event in events if event.endpoint_id == endpoint.id]
+            if endpoint_events:
+                batches.append(Batch(
+                    endpoint_id=endpoint.id,
+                    url=endpoint.url,
+                    secret=endpoint.secret,
+                    event_ids=[event.id for event in endpoint_events],
+                    events=[
+                        {
+                            "id": event.id,
+                            "type": event.event,
+                            "created_at": event.created_at.isoformat() + "Z",
+                            "data": event.payload,
+                        }
+                        for event in endpoint_events
+                    ]
+                ))
+        return batches
+
+    def _send(self, client: httpx.Client, batch: Batch) -> DeliveryResult:
+        """
+        POST a batch to its endpoint (runs on the executor); any 2xx response delivers it
+
+        Errors recorded for the endpoint's owner to see say what went wrong,
+        never what the network answered: details are only logged.
+        """
+        try:
+            check_destination(batch.url)
+        except DestinationRefused as e:
+            return DeliveryResult(batch.endpoint_id, batch.event_ids, f"Destination refused: {e}")
+
+        body = json.dumps({"events": batch.events}, separators=(",", ":")).encode()
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            TIMESTAMP_HEADER: timestamp,
+            SIGNATURE_HEADER: f"sha256={sign(batch.secret, timestamp, body)}",
+        }
+        try:
+            response = client.post(batch.url, content=body, headers=headers)
+        except httpx.HTTPError as e:
+            logger.info(f"Webhook request to endpoint {batch.endpoint_id} failed: {type(e).__name__}: {e}")
+            if isinstance(e, httpx.TimeoutException):
+                return DeliveryResult(batch.endpoint_id, batch.event_ids, "Request timed out")
+            return DeliveryResult(batch.endpoint_id, batch.event_ids, "Request failed")
+        if not response.is_success:
+            return DeliveryResult(batch.endpoint_id, batch.event_ids, f"HTTP {response.status_code}")
+        return DeliveryResult(batch.endpoint_id, batch.event_ids)
+
+    def _reap(self) -> None:
+        """Record the results of finished requests"""
+        finished = [endpoint_id for endpoint_id, future in self._in_flight.items() if future.done()]
+        if not finished:
+            return
+
+        db = BackgroundSessionLocal()
+        try:
+            for endpoint_id in finished:
+                future = self._in_flight.pop(endpoint_id)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Webhook delivery to endpoint {endpoint_id} crashed: {e}")
+                    continue  # The lease expires and the events are sent again
+                self._record(db, result)
+        finally:
+            db.close()
+            BackgroundSessionLocal.remove()
+
+    def _record(self, db: Session, result: DeliveryResult) -> None:
+        """Mark a batch delivered, or count the failure and back its endpoint off"""
+        now = datetime.utcnow()
+        leased = and_(
+            WebhookOutbox.id.in_(result.event_ids),
+            WebhookOutbox.lease_owner == self.dispatcher_id
+        )
+        try:
+            if result.error is None:
+                db.execute(
+                    update(WebhookOutbox)
+                    .where(leased)
+                    .values(
+                        status=WebhookDeliveryStatus.DELIVERED,
+                        attempts=WebhookOutbox.attempts + 1,
+                        delivered_at=now,
+                        last_error=None,
+                        lease_owner=None,
+                        lease_expires_at=None
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                db.execute(
+                    update(WebhookEndpoint)
+                    .where(WebhookEndpoint.id == result.endpoint_id)
+                    .values(failure_count=0, retry_after=None, last_error=None)
+                    .execution_options(synchronize_session=False)
+                )
+            else:
+                db.execute(
+                    update(WebhookOutbox)
+                    .where(leased)
+                    .values(
+                        status=case(
+                            (
+                                WebhookOutbox.attempts + 1 >= settings.WEBHOOK_MAX_ATTEMPTS,
+                                literal(WebhookDeliveryStatus.FAILED, WebhookOutbox.status.type)
+                            ),
+                            else_=literal(WebhookDeliveryStatus.PENDING, WebhookOutbox.status.type)
+                        ),
+                        attempts=WebhookOutbox.attempts + 1,
+                        last_error=result.error,
+                        lease_owner=None,
+                        lease_expires_at=None
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                failures = (db.execute(
+                    select(WebhookEndpoint.failure_count).where(WebhookEndpoint.id == result.endpoint_id)
+                ).scalar() or 0) + 1
+                delay = backoff_seconds(failures)
+                db.execute(
+                    update(WebhookEndpoint)
+                    .where(WebhookEndpoint.id == result.endpoint_id)
+                    .values(
+                        failure_count=failures,
+                        retry_after=now + timedelta(seconds=delay),
+                        last_error=result.error
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                logger.warning(
+                    f"Webhook delivery of {len(result.event_ids)} event(s) to endpoint {result.endpoint_id} "
+                    f"failed ({result.error}), retrying in {delay:.0f}s"
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    def _prune(self, db: Session) -> None:
+        """Delete delivered and failed events older than WEBHOOK_RETENTION_SECONDS"""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.WEBHOOK_RETENTION_SECONDS)
+        result = db.execute(
+            delete(WebhookOutbox)
+            .where(
+                WebhookOutbox.status != WebhookDeliveryStatus.PENDING,
+                WebhookOutbox.created_at < cutoff
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if result.rowcount:
+            logger.info(f"Deleted {result.rowcount} old webhook event(s)")
+
+    def start_in_thread(self) -> None:
+        """Run the dispatcher loop in a background thread"""
+        self._thread = threading.Thread(target=self.run, name="webhook-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop claiming events and wait for requests in flight to finish"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# Dispatcher running in this process (the API with settings.EMBEDDED_WORKER, or a standalone worker)
+_dispatcher: Optional[WebhookDispatcher] = None
+
+
+def start_webhook_dispatcher() -> None:
+    """Start delivering webhooks from this process"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = WebhookDispatcher()
+        _dispatcher.start_in_thread()
+
+
+def stop_webhook_dispatcher() -> None:
+    """Stop this process's dispatcher, if any"""
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.stop()
+        _dispatcher = None
+
+
+def notify_webhook_dispatcher() -> None:
+    """Signal that events were written, so a local dispatcher does not wait for its next poll"""
+    if _dispatcher is not None:
+        _dispatcher.notify()
@@ -0,0 +1,72 @@
+"""
+Migration script to bring an existing database up to date with the models.
+
+Creates missing tables, adds columns that were introduced after a table was
+created, and creates missing indexes. Columns are added as nullable (with
+their server default, if any). Foreign keys whose ON DELETE rule changed
+are recreated, except in SQLite, which cannot alter constraints (the code
+does what the rule would there). For PostgreSQL enum changes use Alembic.
+"""
+from sqlalchemy import create_engine, inspect, text
+from app.core.config import settings
+from app.db.database import Base
+import app.models  # noqa: F401 - register all models with Base
+
+def migrate():
+    """Run the migration."""
+    connect_args = {"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
+    engine = create_engine(settings.DATABASE_URL, connect_args=connect_args)
+    
+    # New tables
+    Base.metadata.create_all(bind=engine)
+    
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                print(f"Adding column {table.name}.{column.name}")
+                conn.execute(text(ddl))
+            
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+            
+            if engine.dialect.name != "sqlite":
+                _update_foreign_keys(conn, inspector, table)
+    
+    print("Schema is up to date")
+
+def _update_foreign_keys(conn, inspector, table):
+    """Recreate foreign keys whose ON DELETE rule differs from the model's"""
+    existing = {
+        tuple(fk["constrained_columns"]): fk
+        for fk in inspector.get_foreign_keys(table.name)
+    }
+    for constraint in table.foreign_key_constraints:
+        columns = tuple(column.name for column in constraint.columns)
+        current = existing.get(columns)
+        if current is None or not current.get("name"):
+            continue
+        wanted = (constraint.ondelete or "").upper()
+        if ((current.get("options") or {}).get("ondelete") or "").upper() == wanted:
+            continue
+        referred = constraint.referred_table.name
+        referred_columns = ", ".join(element.column.name for element in constraint.elements)
+        ddl = (
+            f"ALTER TABLE {table.name} ADD CONSTRAINT {current['name']} "
+            f"FOREIGN KEY ({', '.join(columns)}) REFERENCES {referred} ({referred_columns})"
+        )
+        if wanted:
+            ddl += f" ON DELETE {wanted}"
+        print(f"Updating foreign key {table.name}.{current['name']}")
+        conn.execute(text(f"ALTER TABLE {table.name} DROP CONSTRAINT {current['name']}"))
+        conn.execute(text(ddl))
+
+if __name__ == "__main__":
+    migrate()
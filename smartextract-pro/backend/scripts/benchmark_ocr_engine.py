@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+# Add the parent directory to the path so we can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ocr_engine import PytesseractEngine, TesserocrEngine, tesserocr
+
+def make_regions(count, width=320, height=56):
+    """
+    Render small field-sized crops with varied text
+
+    Args:
+        count: Number of crops
+        width: Crop width in pixels
+        height: Crop height in pixels
+
+    Returns:
+        List of (grayscale image, expected text)
+    """
+    regions = []
+    for i in range(count):
+        text = f"INV-{i:05d} {(i * 37) % 1000}.{i % 100:02d}"
+        image = np.full((height, width), 255, dtype=np.uint8)
+        cv2.putText(image, text, (8, height - 18), cv2.FONT_HERSHEY_SIMPLEX, 0.8, 0, 2, cv2.LINE_AA)
+        regions.append((image, text))
+    return regions
+
+def benchmark(engine, regions, psm):
+    """
+    OCR every region once and time it
+
+    Returns:
+        Total seconds and the number of regions read exactly
+    """
+    engine.image_to_data(regions[0][0], psm)  # Warm up: loads the model for in-process engines
+    exact = 0
+    start = time.perf_counter()
+    for image, expected in regions:
+        data = engine.image_to_data(image, psm)
+        if " ".join(data["text"]) == expected:
+            exact += 1
+    return time.perf_counter() - start, exact
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare OCR engines on small region crops')
+    parser.add_argument('--regions', type=int, default=1000, help='Number of region OCR calls per engine')
+    parser.add_argument('--psm', type=int, default=7, help='Tesseract page segmentation mode (7: single line)')
+    parser.add_argument('--lang', default='eng', help='OCR language')
+
+    args = parser.parse_args()
+
+    regions = make_regions(args.regions)
+    engines = [PytesseractEngine(args.lang)]
+    if tesserocr is not None:
+        engines.append(TesserocrEngine(args.lang))
+    else:
+        print("tesserocr is not installed; only the pytesseract engine is measured")
+
+    results = {}
+    for engine in engines:
+        seconds, exact = benchmark(engine, regions, args.psm)
+        engine.close()
+        results[engine.name] = seconds
+        print(f"{engine.name:<12} {seconds:8.2f}s total  {seconds / len(regions) * 1000:7.2f} ms/region  "
+              f"{exact}/{len(regions)} exact  ({engine.version()})")
+
+    if len(results) == 2:
+        print(f"\nIn-process speedup: {results['pytesseract'] / results['tesserocr']:.1f}x")
+
+if __name__ == '__main__':
+    main()
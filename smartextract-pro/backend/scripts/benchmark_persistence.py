@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add the parent directory to the path so we can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.database import Base
+from app.models.user import User
+from app.models.document import Document
+from app.models.extraction import ExtractionJob, ExtractionStatus, ExtractedData, ExtractionPage
+from app.services.job_results import JobOutcome, persist_outcomes
+from app.services.token_store import TokenPage
+
+LEASE_OWNER = "benchmark"
+
+def make_words(count):
+    """Columnar OCR output with `count` words"""
+    return {
+        "text": [f"word{i}" for i in range(count)],
+        "left": [(i % 20) * 50 for i in range(count)],
+        "top": [(i // 20) * 30 for i in range(count)],
+        "width": [45] * count,
+        "height": [25] * count,
+        "conf": [90.0] * count,
+        "block_num": [1] * count,
+        "par_num": [1] * count,
+        "line_num": [i // 20 + 1 for i in range(count)],
+    }
+
+def make_outcome(job_id, fields, pages, words):
+    """A completed job's results, as a worker process returns them"""
+    outcome = JobOutcome(
+        job_id=job_id,
+        status=ExtractionStatus.COMPLETED,
+        pipeline_key=uuid.uuid4().hex,
+        extra_metadata={"pages": pages},
+    )
+    outcome.add_fields({
+        f"field_{i}": {"value": f"value {i}", "confidence": 0.9, "field_type": "text"}
+        for i in range(fields)
+    })
+    outcome.add_pages([TokenPage(page, "ocr", make_words(words), 2480, 3508) for page in range(1, pages + 1)])
+    return outcome
+
+def create_jobs(Session, count):
+    """Create a user, one document and `count` claimed jobs"""
+    db = Session()
+    try:
+        user = User(
+            id=str(uuid.uuid4()),
+            email=f"{uuid.uuid4().hex}@benchmark.local",
+            username=uuid.uuid4().hex[:20],
+            hashed_password="x"
+        )
+        document = Document(
+            id=str(uuid.uuid4()),
+            filename="benchmark.png",
+            file_path="/dev/null",
+            file_type="png",
+            file_size=0,
+            owner_id=user.id
+        )
+        db.add_all([user, document])
+        db.flush()
+        jobs = [
+            ExtractionJob(
+                id=str(uuid.uuid4()),
+                status=ExtractionStatus.PROCESSING,
+                lease_owner=LEASE_OWNER,
+                document_id=document.id,
+                user_id=user.id
+            )
+            for _ in range(count)
+        ]
+        db.add_all(jobs)
+        db.commit()
+        return [job.id for job in jobs]
+    finally:
+        db.close()
+
+def persist_per_row(Session, outcomes):
+    """The previous write path: ORM objects added one by one, three commits per job"""
+    for outcome in outcomes:
+        db = Session()
+        try:
+            job = db.query(ExtractionJob).filter(ExtractionJob.id == outcome.job_id).first()
+            job.status = ExtractionStatus.PROCESSING
+            db.commit()
+
+            job.pipeline_key = outcome.pipeline_key
+            job.extra_metadata = outcome.extra_metadata
+            for row in outcome.extracted_data:
+                db.add(ExtractedData(**row))
+            for row in outcome.pages:
+                db.add(ExtractionPage(**row))
+            job.status = outcome.status
+            job.progress = 100.0
+
+            current_owner = db.query(ExtractionJob.lease_owner).filter(ExtractionJob.id == job.id).scalar()
+            assert current_owner == LEASE_OWNER
+            job.lease_owner = None
+            job.lease_expires_at = None
+            db.commit()
+            db.refresh(job)
+        finally:
+            db.close()
+
+def persist_grouped(Session, outcomes, batch_size):
+    """The bulk write path: executemany inserts, one commit per group of jobs"""
+    for start in range(0, len(outcomes), batch_size):
+        db = Session()
+        try:
+            persist_outcomes(db, outcomes[start:start + batch_size], lease_owner=LEASE_OWNER)
+        finally:
+            db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-row and bulk persistence of extraction results')
+    parser.add_argument('--database-url', help='Database to run against, e.g. a PostgreSQL test database '
+                                               '(default: a temporary SQLite file)')
+    parser.add_argument('--jobs', type=int, default=500, help='Jobs written per run')
+    parser.add_argument('--fields', type=int, default=20, help='Extracted fields per job')
+    parser.add_argument('--pages', type=int, default=2, help='Pages per job')
+    parser.add_argument('--words', type=int, default=300, help='Words per page')
+    parser.add_argument('--batch-size', type=int, default=50, help='Jobs per transaction on the bulk path')
+
+    args = parser.parse_args()
+
+    temp_dir = None
+    database_url = args.database_url
+    if database_url is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{os.path.join(temp_dir.name, 'benchmark.db')}"
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    print(f"{engine.dialect.name}: {args.jobs} jobs, {args.fields} fields and "
+          f"{args.pages} pages of {args.words} words each")
+    try:
+        results = {}
+        for name, persist in (
+            ("per-row", lambda outcomes: persist_per_row(Session, outcomes)),
+            (f"bulk x{args.batch_size}", lambda outcomes: persist_grouped(Session, outcomes, args.batch_size)),
+        ):
+            job_ids = create_jobs(Session, args.jobs)
+            outcomes = [make_outcome(job_id, args.fields, args.pages, args.words) for job_id in job_ids]
+            start = time.perf_counter()
+            persist(outcomes)
+            seconds = time.perf_counter() - start
+            results[name] = args.jobs / seconds
+            print(f"{name:<12} {seconds:8.2f}s  {results[name]:8.0f} jobs/s")
+
+        before, after = results.values()
+        print(f"\nSpeedup: {after / before:.1f}x")
+    finally:
+        engine.dispose()
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+import cv2
+import numpy as np
+
+# Add the parent directory to the path so we can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.preprocessing import PreprocessingPipeline
+from app.services.ocr_data import empty_ocr_data
+from app.services.tiled_ocr import ocr_tiled
+
+def make_scan(file_path, megapixels):
+    """
+    Write a grayscale scan of about `megapixels` million pixels covered in text lines
+
+    A block of rendered text is repeated over the page, so even very large
+    images are generated quickly.
+    """
+    side = int((megapixels * 1e6) ** 0.5)
+    block = np.full((600, 2400), 255, dtype=np.uint8)
+    for line in range(10):
+        text = f"Invoice {line:02d} total 1{line}4.50 due 2024-0{line % 9 + 1}-15"
+        cv2.putText(block, text, (40, 45 + line * 58), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 2, cv2.LINE_AA)
+    page = np.tile(block, (side // block.shape[0] + 1, side // block.shape[1] + 1))[:side, :side]
+    cv2.imwrite(file_path, page)
+    return side
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+def run(mode, file_path, tile_size, overlap, ocr, results):
+    """Process one image in this (fresh) process and report its peak memory"""
+    settings.OCR_TILE_SIZE = tile_size
+    settings.OCR_TILE_OVERLAP = overlap
+    preprocessing = PreprocessingPipeline([{"stage": "binarize", "method": "otsu"}])
+
+    def recognize(binary):
+        return get_ocr_engine().image_to_data(binary, settings.OCR_PSM) if ocr else empty_ocr_data()
+
+    if ocr:
+        from app.services.ocr_engine import get_ocr_engine
+        recognize(np.full((32, 32), 255, dtype=np.uint8))  # Warm up: loads the model for in-process engines
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    if mode == "tiled":
+        words, _, _, _ = ocr_tiled(preprocessing.open_image(file_path), preprocessing, recognize)
+    else:
+        words = recognize(preprocessing.prepare_for_ocr(preprocessing.load_image(file_path)))
+    results.put((time.perf_counter() - start, baseline, peak_rss_mb(), len(words["text"])))
+
+def measure(mode, file_path, args):
+    """Run one mode in a spawned process, so peak memory is not shared between runs"""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=run, args=(mode, file_path, args.tile_size, args.overlap, not args.no_ocr, results)
+    )
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare peak memory of whole-page and tiled OCR of large scans')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[16, 64, 144], help='Image sizes in megapixels')
+    parser.add_argument('--formats', nargs='+', default=['bmp', 'png'], choices=['bmp', 'png', 'tiff', 'jpg'])
+    parser.add_argument('--tile-size', type=int, default=settings.OCR_TILE_SIZE)
+    parser.add_argument('--overlap', type=int, default=settings.OCR_TILE_OVERLAP)
+    parser.add_argument('--no-ocr', action='store_true', help='Only decode and binarize, e.g. without tesseract')
+
+    args = parser.parse_args()
+
+    print(f"Tiles of {args.tile_size}px overlapping by {args.overlap}px"
+          f"{'; OCR skipped' if args.no_ocr else ''}")
+    print(f"{'image':<16} {'mode':<8} {'seconds':>8} {'peak MB':>8} {'over base':>10} {'words':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for megapixels in args.sizes:
+            for image_format in args.formats:
+                file_path = os.path.join(temp_dir, f"scan.{image_format}")
+                side = make_scan(file_path, megapixels)
+                label = f"{side}x{side} {image_format}"
+                for mode in ("whole", "tiled"):
+                    seconds, baseline, peak, words = measure(mode, file_path, args)
+                    print(f"{label:<16} {mode:<8} {seconds:8.2f} {peak:8.0f} {peak - baseline:10.0f} {words:8d}")
+                os.remove(file_path)
+
+if __name__ == '__main__':
+    main()
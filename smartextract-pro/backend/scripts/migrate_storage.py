@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+import os
+import re
+import sys
+import time
+import uuid
+import errno
+import shutil
+import hashlib
+import argparse
+
+from sqlalchemy import create_engine, inspect
+
+# Add the parent directory to the path so we can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrate_schema
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.document import Document
+from app.services.content_store import add_reference, put_content, reserve_reference
+from app.services.storage import content_key
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+def relax_file_path(engine):
+    """Make documents.file_path nullable; documents in storage have none"""
+    column = next(c for c in inspect(engine).get_columns("documents") if c["name"] == "file_path")
+    if column["nullable"]:
+        return
+    print("Making documents.file_path nullable")
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ALTER TABLE documents ALTER COLUMN file_path DROP NOT NULL")
+    elif engine.dialect.name == "mysql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ALTER TABLE documents MODIFY file_path VARCHAR(512) NULL")
+    elif engine.dialect.name == "sqlite":
+        # SQLite cannot alter a column: rebuild the table without the constraint
+        with engine.begin() as conn:
+            table_sql, = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'documents'"
+            ).one()
+            index_sql = [sql for sql, in conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'documents' AND sql IS NOT NULL"
+            )]
+            new_sql = re.sub(r"(\bfile_path\b[^,]*?)\s+NOT NULL", r"\1", table_sql, count=1)
+            new_sql = re.sub(r"^CREATE TABLE\s+\"?documents\"?", "CREATE TABLE documents_new", new_sql)
+            conn.exec_driver_sql(new_sql)
+            conn.exec_driver_sql("INSERT INTO documents_new SELECT * FROM documents")
+            conn.exec_driver_sql("DROP TABLE documents")
+            conn.exec_driver_sql("ALTER TABLE documents_new RENAME TO documents")
+            for sql in index_sql:
+                conn.exec_driver_sql(sql)
+    else:
+        print(f"Cannot alter columns of {engine.dialect.name}: make documents.file_path nullable by hand")
+        sys.exit(1)
+
+def hash_file(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def stage_copy(path):
+    """
+    A file in UPLOAD_FOLDER with the contents of `path` for storage to take
+    over, so `path` stays in place until the documents are committed. A hard
+    link where possible, a copy otherwise.
+    """
+    staged = os.path.join(settings.UPLOAD_FOLDER, f"{uuid.uuid4()}.part")
+    try:
+        os.link(path, staged)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        shutil.copyfile(path, staged)
+    return staged
+
+def move_files(batch_size):
+    """Move the files of documents uploaded before storage keys into storage"""
+    db = SessionLocal()
+    moved = missing = documents = 0
+    last_path = ""
+    start = time.perf_counter()
+    try:
+        while True:
+            paths = [path for path, in db.query(Document.file_path).filter(
+                Document.storage_key.is_(None),
+                Document.file_path > last_path
+            ).distinct().order_by(Document.file_path).limit(batch_size)]
+            if not paths:
+                break
+            last_path = paths[-1]
+
+            for path in paths:
+                if not os.path.exists(path):
+                    print(f"Missing file, documents left as they are: {path}")
+                    missing += 1
+                    continue
+                # Documents sharing one file were deduplicated on upload, so have the same contents
+                sharing = db.query(Document).filter(
+                    Document.storage_key.is_(None),
+                    Document.file_path == path
+                ).all()
+                content_hash = sharing[0].content_hash or hash_file(path)
+                key = content_key(content_hash, sharing[0].file_type.lower())
+                reserve_reference(db, key, os.path.getsize(path))
+                staged = stage_copy(path)
+                try:
+                    put_content(key, staged)
+                    for document in sharing:
+                        add_reference(db, key, os.path.getsize(path))
+                        document.storage_key = key
+                        document.content_hash = content_hash
+                        document.file_path = None
+                    db.commit()
+                except BaseException:
+                    db.rollback()
+                    if os.path.exists(staged):
+                        os.remove(staged)
+                    raise
+                os.remove(path)
+                moved += 1
+                documents += len(sharing)
+
+            print(f"{moved} files of {documents} documents moved in {time.perf_counter() - start:.1f}s")
+    finally:
+        db.close()
+    print(f"Done: {moved} files of {documents} documents moved, {missing} missing")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Upgrade the database for content-addressed storage and move existing uploads into it'
+    )
+    parser.add_argument('--batch-size', type=int, default=500, help='Files looked up per query')
+
+    args = parser.parse_args()
+
+    migrate_schema.migrate()
+    connect_args = {"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
+    relax_file_path(create_engine(settings.DATABASE_URL, connect_args=connect_args))
+    move_files(args.batch_size)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import argparse
+
+# Add the parent directory to the path so we can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.template import Template
+from app.services.template_reapply import TemplateReapplyService
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Re-apply a template to every completed job that used it, from stored words (no OCR)'
+    )
+    parser.add_argument('template_id', help='ID of the template')
+    parser.add_argument('--user-id', help='Only re-apply to jobs of this user')
+    parser.add_argument('--batch-size', type=int, default=settings.TEMPLATE_REAPPLY_BATCH_SIZE,
+                        help='Jobs re-matched per transaction')
+
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        template = db.query(Template).filter(Template.id == args.template_id).first()
+        if template is None:
+            print(f"Error: template {args.template_id} not found")
+            sys.exit(1)
+
+        start = time.perf_counter()
+
+        def report(counts):
+            elapsed = time.perf_counter() - start
+            done = counts['reapplied'] + counts['skipped']
+            print(f"{done} jobs ({counts['reapplied']} re-applied, {counts['skipped']} skipped) "
+                  f"in {elapsed:.1f}s, {done / elapsed:.0f} jobs/s")
+
+        counts = TemplateReapplyService.reapply_template(
+            db=db,
+            template=template,
+            user_id=args.user_id,
+            batch_size=args.batch_size,
+            on_batch=report
+        )
+        print(f"Done: {counts['reapplied']} re-applied, {counts['skipped']} skipped "
+              f"in {time.perf_counter() - start:.1f}s")
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    main()
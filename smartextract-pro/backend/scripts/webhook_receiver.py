@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import time
+import random
+import calendar
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the parent directory to the path so we can import the app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.worker.webhooks import SIGNATURE_HEADER, TIMESTAMP_HEADER, sign
+
+def make_handler(args):
+    class WebhookHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep connections alive, as the dispatcher expects
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if args.delay:
+                time.sleep(args.delay)
+
+            if args.secret:
+                expected = f"sha256={sign(args.secret, self.headers.get(TIMESTAMP_HEADER, ''), body)}"
+                if self.headers.get(SIGNATURE_HEADER) != expected:
+                    print("Rejected request with a bad signature")
+                    return self._respond(401)
+
+            if random.random() < args.fail_rate:
+                print("Failing request on purpose")
+                return self._respond(503)
+
+            events = json.loads(body)["events"]
+            print(f"{len(events)} event(s) from port {self.client_address[1]}")
+            for event in events:
+                lag = time.time() - calendar.timegm(time.strptime(event["created_at"][:19], "%Y-%m-%dT%H:%M:%S"))
+                print(f"  {event['id']} {event['type']} job {event['data']['job_id']} ({lag:.1f}s after the event)")
+            self._respond(200)
+
+        def _respond(self, status_code):
+            self.send_response(status_code)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    return WebhookHandler
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub webhook receiver that prints the events it gets')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--secret', help='Endpoint secret to verify signatures with')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to take per request, to fall behind')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f"Listening on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+
+# Point the app at a scratch database before it is imported; no embedded worker
+_scratch = tempfile.mkdtemp(prefix="smartextract-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ["STORAGE_ROOT"] = os.path.join(_scratch, "objects")
+os.environ["EMBEDDED_WORKER"] = "False"
+
+import pytest
+
+from app.core.config import settings
+from sqlalchemy.orm import Session
+
+from app.core.database import BackgroundSessionLocal, SessionLocal, background_engine, engine
+from app.db.database import Base
+from app.models.user import User
+from app.services.storage import get_storage
+
+
+@pytest.fixture(autouse=True)
+def scratch_storage(tmp_path, monkeypatch):
+    """Uploads and stored files of a test go to its own directory"""
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "STORAGE_ROOT", str(tmp_path / "objects"))
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "local")
+    os.makedirs(settings.UPLOAD_FOLDER)
+    get_storage.cache_clear()
+    yield tmp_path
+    get_storage.cache_clear()
+
+
+@pytest.fixture
+def db():
+    """
+    A session on an empty database, on the background pool: the request
+    pool of SQLite has a single connection, left to the code under test
+    """
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = Session(bind=background_engine)
+    yield session
+    session.close()
+    SessionLocal.remove()
+    BackgroundSessionLocal.remove()
+
+
+@pytest.fixture
+def user(db):
+    return make_user(db, "user")
+
+
+def make_user(db, name: str) -> User:
+    user = User(id=f"{name}-id", email=f"{name}@example.com", username=name, hashed_password="x", is_active=True)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@pytest.fixture
+def client(db, user):
+    """API client signed in as `user`"""
+    from fastapi.testclient import TestClient
+    from app.core.security import get_current_active_user
+    from app.main import app
+
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+
+
+def make_document(db, owner: User, content: bytes = b"%PDF-1.4 test", filename: str = "doc.pdf"):
+    """A document whose file is not stored; for tests that never read it"""
+    import hashlib
+    from app.models.document import Document
+
+    document = Document(
+        filename=filename,
+        file_path=os.path.join(settings.UPLOAD_FOLDER, filename),
+        file_type=filename.rsplit(".", 1)[-1],
+        file_size=len(content),
+        content_hash=hashlib.sha256(content).hexdigest(),
+        owner_id=owner.id,
+    )
+    db.add(document)
+    db.commit()
+    return document
+
+
+def make_job(db, document, **columns):
+    from app.models.extraction import ExtractionJob
+
+    job = ExtractionJob(document_id=document.id, user_id=document.owner_id, **columns)
+    db.add(job)
+    db.commit()
+    return job
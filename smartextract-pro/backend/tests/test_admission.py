@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.admission import AdmissionController
+from app.core.config import settings
+from app.models.extraction import ExtractionStatus
+
+from conftest import make_document, make_job, make_user
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    """No limits unless a test sets them; throughput measured on every check"""
+    monkeypatch.setattr(settings, "ADMISSION_MAX_QUEUED_JOBS", 0)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_QUEUED_JOBS_PER_USER", 0)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_DRAIN_SECONDS", 0)
+    monkeypatch.setattr(settings, "ADMISSION_MIN_SAMPLES", 10)
+    monkeypatch.setattr(settings, "ADMISSION_WORKER_SLOTS", 2)
+    monkeypatch.setattr(settings, "ADMISSION_STATS_TTL", 0.0)
+    monkeypatch.setattr(settings, "ADMISSION_DEFAULT_RETRY_AFTER", 60)
+
+
+@pytest.fixture
+def document(db, user):
+    return make_document(db, user)
+
+
+def finished(db, document, count: int, seconds: float, age: float = 60.0):
+    """Jobs the workers extracted `age` seconds ago, taking `seconds` each"""
+    for _ in range(count):
+        make_job(
+            db, document,
+            status=ExtractionStatus.COMPLETED,
+            finished_at=datetime.utcnow() - timedelta(seconds=age),
+            processing_seconds=seconds
+        )
+
+
+def queued(db, document, count: int):
+    for _ in range(count):
+        make_job(db, document, status=ExtractionStatus.PENDING)
+
+
+def refused(check, *args) -> HTTPException:
+    with pytest.raises(HTTPException) as raised:
+        check(*args)
+    return raised.value
+
+
+def retry_after(error: HTTPException) -> int:
+    assert error.headers["Retry-After"] == str(error.detail["retry_after_seconds"])
+    return int(error.headers["Retry-After"])
+
+
+def test_no_estimate_below_min_samples(db, user, document, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_DRAIN_SECONDS", 1)
+    queued(db, document, 50)
+    finished(db, document, 9, seconds=30.0)
+    # Not counted: outside the window, or nothing extracted (reused results)
+    finished(db, document, 5, seconds=30.0, age=settings.ADMISSION_THROUGHPUT_WINDOW + 60)
+    make_job(db, document, status=ExtractionStatus.COMPLETED, finished_at=datetime.utcnow())
+
+    controller = AdmissionController()
+    assert controller.queue_stats(db).seconds_per_job is None
+    assert controller.queue_stats(db).seconds_for(100) is None
+    controller.check_extraction(db, user.id)
+
+    finished(db, document, 1, seconds=40.0)
+    stats = controller.queue_stats(db)
+    assert stats.seconds_per_job == pytest.approx(31.0)
+    assert stats.seconds_for(4) == pytest.approx(62.0)
+
+
+def test_drain_limit_refuses_with_measured_retry_after(db, user, document, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_DRAIN_SECONDS", 100)
+    finished(db, document, 10, seconds=30.0)
+    queued(db, document, 5)
+    controller = AdmissionController()
+
+    # 6 jobs * 30s over 2 slots: 90s
+    controller.check_extraction(db, user.id)
+
+    queued(db, document, 4)
+    # 10 jobs: 150s, 50s over the limit
+    error = refused(controller.check_extraction, db, user.id)
+    assert error.status_code == 503
+    assert retry_after(error) == 50
+
+
+def test_drain_uses_worker_slots(db, user, document, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_DRAIN_SECONDS", 100)
+    monkeypatch.setattr(settings, "ADMISSION_WORKER_SLOTS", 4)
+    finished(db, document, 10, seconds=30.0)
+    queued(db, document, 9)
+
+    # 10 jobs * 30s over 4 slots: 75s
+    AdmissionController().check_extraction(db, user.id)
+
+
+def test_queue_depth_limit_refuses(db, user, document, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_QUEUED_JOBS", 5)
+    queued(db, document, 4)
+    controller = AdmissionController()
+
+    controller.check_extraction(db, user.id)
+    error = refused(controller.check_extraction, db, user.id, 3)
+    assert error.status_code == 503
+    # Nothing measured yet
+    assert retry_after(error) == 60
+
+    finished(db, document, 10, seconds=30.0)
+    error = refused(controller.check_extraction, db, user.id, 3)
+    # 2 jobs too many * 30s over 2 slots
+    assert retry_after(error) == 30
+
+
+def test_per_user_limit_refuses_with_429(db, user, document, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_QUEUED_JOBS_PER_USER", 3)
+    other = make_user(db, "other")
+    queued(db, make_document(db, other), 10)
+    finished(db, document, 10, seconds=30.0)
+    queued(db, document, 3)
+    controller = AdmissionController()
+
+    # Other users' jobs do not count
+    controller.check_extraction(db, make_user(db, "third").id)
+    error = refused(controller.check_extraction, db, user.id)
+    assert error.status_code == 429
+    assert retry_after(error) == 15
+
+
+def test_low_disk_refuses_uploads(monkeypatch):
+    controller = AdmissionController()
+    monkeypatch.setattr(settings, "ADMISSION_MIN_FREE_DISK_MB", 1)
+    controller.check_upload(1024)
+
+    # More than any disk here has free
+    monkeypatch.setattr(settings, "ADMISSION_MIN_FREE_DISK_MB", 1024 ** 3)
+    error = refused(controller.check_upload, 1024)
+    assert error.status_code == 503
+    assert retry_after(error) == settings.ADMISSION_DISK_RETRY_AFTER
+
+    monkeypatch.setattr(settings, "ADMISSION_MIN_FREE_DISK_MB", 0)
+    controller.check_upload(1024)
+
+
+def test_extraction_request_is_refused(client, db, document, monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_QUEUED_JOBS", 1)
+    queued(db, document, 1)
+
+    response = client.post("/api/v1/extractions/", json={"document_id": document.id})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "60"
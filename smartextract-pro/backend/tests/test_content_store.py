@@ -0,0 +1,99 @@
+import os
+import asyncio
+import hashlib
+from datetime import timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models.document import Document
+from app.models.stored_file import StoredFile
+from app.services.content_store import collect_unreferenced_files
+from app.services.previews import preview_key
+from app.services.storage import get_storage
+from app.services.upload_stream import store_document
+
+CONTENT = b"%PDF-1.4 shared contents"
+
+
+@pytest.fixture(autouse=True)
+def no_upload_previews(monkeypatch):
+    monkeypatch.setattr(settings, "PREVIEW_ON_UPLOAD_SIZES", [])
+
+
+def upload(client, content: bytes = CONTENT, filename: str = "invoice.pdf") -> dict:
+    response = client.post("/api/v1/documents/upload/", files={"file": (filename, content, "application/pdf")})
+    assert response.status_code == 201
+    return response.json()
+
+
+def stored_file(db, key: str) -> StoredFile:
+    db.expire_all()
+    return db.get(StoredFile, key)
+
+
+def after_grace(db, key: str, seconds: int = 1):
+    return stored_file(db, key).updated_at + timedelta(seconds=settings.STORAGE_GC_GRACE + seconds)
+
+
+def test_identical_uploads_share_stored_file(client, db):
+    first = upload(client)
+    second = upload(client, filename="copy.pdf")
+
+    assert first["id"] != second["id"]
+    assert first["storage_key"] == second["storage_key"]
+    assert stored_file(db, first["storage_key"]).refcount == 2
+    assert db.query(StoredFile).count() == 1
+
+    other = upload(client, content=b"%PDF-1.4 other contents")
+    assert other["storage_key"] != first["storage_key"]
+    assert stored_file(db, other["storage_key"]).refcount == 1
+
+
+def test_released_file_is_deleted_after_grace(client, db):
+    first, second = upload(client), upload(client)
+    key = first["storage_key"]
+    storage = get_storage()
+    for size in (256, 1280):
+        path = os.path.join(settings.UPLOAD_FOLDER, "preview")
+        with open(path, "wb") as f:
+            f.write(b"jpeg")
+        storage.put(preview_key(key, 1, size), path)
+
+    assert client.delete(f"/api/v1/documents/{first['id']}/").status_code == 204
+    assert stored_file(db, key).refcount == 1
+    assert collect_unreferenced_files(db, after_grace(db, key)) == 0
+
+    assert client.delete(f"/api/v1/documents/{second['id']}/").status_code == 204
+    assert stored_file(db, key).refcount == 0
+    # Within the grace period
+    assert collect_unreferenced_files(db, after_grace(db, key, -60)) == 0
+    assert storage.exists(key)
+
+    assert collect_unreferenced_files(db, after_grace(db, key)) == 1
+    assert stored_file(db, key) is None
+    assert not storage.exists(key)
+    assert list(storage.keys(f"{key}.")) == []
+
+
+def test_reference_of_uncommitted_document_is_collected(db, user):
+    temp_path = os.path.join(settings.UPLOAD_FOLDER, "upload.part")
+    with open(temp_path, "wb") as f:
+        f.write(CONTENT)
+
+    document = asyncio.run(store_document(
+        db,
+        owner_id=user.id,
+        temp_path=temp_path,
+        filename="invoice.pdf",
+        size=len(CONTENT),
+        content_hash=hashlib.sha256(CONTENT).hexdigest()
+    ))
+    key = document.storage_key
+    db.rollback()  # Committing the document failed
+
+    assert db.query(Document).count() == 0
+    assert stored_file(db, key).refcount == 0
+    assert get_storage().exists(key)
+    assert collect_unreferenced_files(db, after_grace(db, key)) == 1
+    assert not get_storage().exists(key)
@@ -0,0 +1,142 @@
+import io
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.services.document_download import (
+    RangeNotSatisfiable,
+    _file_response,
+    etag_matches,
+    parse_range,
+)
+
+ETAG = '"abc123"'
+CONTENT = bytes(range(256)) * 4  # 1024 bytes
+
+
+def make_request(**headers: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def send_response(response) -> tuple:
+    """Run a response as an ASGI app; returns the status, headers and body"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(response({"type": "http", "extensions": {}}, receive, send))
+    start = messages[0]
+    headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], headers, body
+
+
+def file_response(request: Request):
+    return _file_response(request, lambda: io.BytesIO(CONTENT), len(CONTENT), {"etag": ETAG}, "application/pdf")
+
+
+def test_parse_range_closed():
+    assert parse_range("bytes=0-99", 1000) == (0, 99)
+
+
+def test_parse_range_end_past_size_is_clamped():
+    assert parse_range("bytes=900-2000", 1000) == (900, 999)
+
+
+def test_parse_range_open():
+    assert parse_range("bytes=500-", 1000) == (500, 999)
+
+
+def test_parse_range_suffix():
+    assert parse_range("bytes=-100", 1000) == (900, 999)
+
+
+def test_parse_range_suffix_longer_than_file():
+    assert parse_range("bytes=-5000", 1000) == (0, 999)
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1500-1600", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 1000)
+
+
+def test_parse_range_suffix_of_empty_file_is_unsatisfiable():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=-10", 0)
+
+
+@pytest.mark.parametrize("header", ["items=0-10", "bytes=0-10,20-30", "bytes=abc", "bytes=-", "bytes=50-10", "bytes=5"])
+def test_parse_range_ignored(header):
+    assert parse_range(header, 1000) is None
+
+
+def test_etag_matches_strong():
+    assert etag_matches(ETAG, ETAG)
+
+
+def test_etag_matches_weak():
+    assert etag_matches(f"W/{ETAG}", ETAG)
+
+
+def test_etag_matches_any():
+    assert etag_matches("*", ETAG)
+
+
+def test_etag_matches_list():
+    assert etag_matches(f'"other", W/{ETAG}', ETAG)
+
+
+def test_etag_does_not_match():
+    assert not etag_matches('"other", W/"another"', ETAG)
+
+
+def test_range_request():
+    status, headers, body = send_response(file_response(make_request(range="bytes=10-19")))
+    assert status == 206
+    assert headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+    assert headers["content-length"] == "10"
+    assert body == CONTENT[10:20]
+
+
+def test_suffix_range_request():
+    status, headers, body = send_response(file_response(make_request(range="bytes=-24")))
+    assert status == 206
+    assert body == CONTENT[-24:]
+
+
+def test_unsatisfiable_range_request():
+    status, headers, body = send_response(file_response(make_request(range="bytes=5000-")))
+    assert status == 416
+    assert headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_if_range_match_sends_range():
+    status, _, body = send_response(file_response(make_request(range="bytes=0-9", if_range=ETAG)))
+    assert status == 206
+    assert body == CONTENT[:10]
+
+
+def test_if_range_mismatch_sends_whole_file():
+    status, headers, body = send_response(file_response(make_request(range="bytes=0-9", if_range='"stale"')))
+    assert status == 200
+    assert "content-range" not in headers
+    assert body == CONTENT
+
+
+def test_no_range_sends_whole_file():
+    status, headers, body = send_response(file_response(make_request()))
+    assert status == 200
+    assert headers["accept-ranges"] == "bytes"
+    assert headers["content-length"] == str(len(CONTENT))
+    assert body == CONTENT
@@ -0,0 +1,178 @@
+import time
+
+import fitz
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import background_engine
+from app.models.extraction import ExtractionJob, ExtractionStatus
+from app.services.extraction_service import ExtractionService
+from app.services.job_control import MIN_OCR_TIMEOUT, JobControl
+
+from conftest import make_document, make_job
+
+PAGES = 4
+
+
+@pytest.fixture(autouse=True)
+def check_often(monkeypatch):
+    monkeypatch.setattr(settings, "CANCEL_CHECK_INTERVAL", 0.0)
+    monkeypatch.setattr(settings, "PROGRESS_UPDATE_INTERVAL", 0.0)
+    monkeypatch.setattr(settings, "PDF_TEXT_LAYER_ENABLED", True)
+    monkeypatch.setattr(settings, "PDF_PAGE_WORKERS", 1)
+
+
+def make_pdf_document(db, owner):
+    """A document with a born-digital PDF of PAGES pages, read without OCR"""
+    pdf = fitz.open()
+    for number in range(1, PAGES + 1):
+        pdf.new_page().insert_text((72, 72), f"Page {number} of the quarterly invoice summary")
+    content = pdf.tobytes()
+    pdf.close()
+    document = make_document(db, owner, content=content, filename="pages.pdf")
+    with open(document.file_path, "wb") as f:
+        f.write(content)
+    return document
+
+
+def after_page(monkeypatch, page: int, action):
+    """Run `action(control)` once `page` pages of a job are done"""
+    report_progress = JobControl.report_progress
+
+    def reporting(control, done, total):
+        report_progress(control, done, total)
+        if done == page:
+            action(control)
+
+    monkeypatch.setattr(JobControl, "report_progress", reporting)
+
+
+def run(db, job_id: str) -> ExtractionJob:
+    db.query(ExtractionJob).filter(ExtractionJob.id == job_id).update(
+        {"status": ExtractionStatus.PROCESSING, "lease_owner": "worker"}
+    )
+    db.commit()
+    return ExtractionService.process_document(db, job_id, lease_owner="worker")
+
+
+def test_cancel_pending_job(db, user, client):
+    job = make_job(db, make_document(db, user), status=ExtractionStatus.PENDING)
+
+    response = client.post(f"/api/v1/extractions/{job.id}/cancel")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+    db.refresh(job)
+    assert job.status == ExtractionStatus.CANCELLED
+    assert job.cancel_requested
+    assert client.post(f"/api/v1/extractions/{job.id}/cancel").status_code == 409
+
+
+def test_cancel_processing_job_stops_between_pages(db, user, client, monkeypatch):
+    job = make_job(db, make_pdf_document(db, user), status=ExtractionStatus.PENDING)
+    job_id = job.id
+
+    def cancel(control):
+        with Session(bind=background_engine) as other:
+            cancelled = ExtractionService.cancel_job(other, job_id, user.id)
+            # Flagged only: the worker ends the job
+            assert cancelled.status == ExtractionStatus.PROCESSING
+            assert cancelled.cancel_requested
+
+    after_page(monkeypatch, 2, cancel)
+    job = run(db, job_id)
+
+    assert job.status == ExtractionStatus.CANCELLED
+    assert job.error_message == "Cancelled by user"
+    assert job.extra_metadata["partial"] is True
+    assert [page.page_number for page in job.pages] == [1, 2]
+
+    response = client.get(f"/api/v1/extractions/{job_id}/data")
+    assert response.status_code == 200
+    assert response.headers["X-Extraction-Partial"] == "true"
+    (text,) = [item["extracted_value"] for item in response.json() if item["field_name"] == "full_text"]
+    assert "Page 2" in text and "Page 3" not in text
+
+
+def test_job_time_budget_stops_job(db, user, client, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_TIME_BUDGET", 30.0)
+    job = make_job(db, make_pdf_document(db, user), status=ExtractionStatus.PENDING)
+    job_id = job.id
+
+    def run_out_of_time(control):
+        control.deadline = time.monotonic()
+
+    after_page(monkeypatch, 1, run_out_of_time)
+    job = run(db, job_id)
+
+    assert job.status == ExtractionStatus.FAILED
+    assert job.error_message == "Job exceeded its time budget of 30s"
+    assert job.extra_metadata["partial"] is True
+    assert [page.page_number for page in job.pages] == [1]
+    response = client.get(f"/api/v1/extractions/{job_id}/data")
+    assert response.status_code == 200
+    assert response.headers["X-Extraction-Partial"] == "true"
+
+
+def test_data_of_unfinished_or_failed_job_is_refused(db, user, client):
+    document = make_document(db, user)
+    running = make_job(db, document, status=ExtractionStatus.PROCESSING)
+    failed = make_job(db, document, status=ExtractionStatus.FAILED, error_message="Unreadable")
+    completed = make_job(db, document, status=ExtractionStatus.COMPLETED)
+
+    assert client.get(f"/api/v1/extractions/{running.id}/data").status_code == 400
+    assert client.get(f"/api/v1/extractions/{failed.id}/data").status_code == 400
+    response = client.get(f"/api/v1/extractions/{completed.id}/data")
+    assert response.status_code == 200
+    assert "X-Extraction-Partial" not in response.headers
+
+
+def test_time_budget(db, user):
+    job = make_job(db, make_document(db, user), status=ExtractionStatus.PROCESSING)
+    control = JobControl(db, job.id, time_budget=0.05)
+
+    assert not control.should_stop()
+    time.sleep(0.06)
+    assert control.should_stop()
+    assert control.status == ExtractionStatus.FAILED
+    assert control.reason == "Job exceeded its time budget of 0.05s"
+
+    # The first reason is kept
+    control.stop(ExtractionStatus.CANCELLED, "Cancelled by user")
+    assert control.status == ExtractionStatus.FAILED
+
+
+def test_no_budget(db, user):
+    job = make_job(db, make_document(db, user), status=ExtractionStatus.PROCESSING)
+    control = JobControl(db, job.id, time_budget=0, page_budget=None)
+
+    assert control.ocr_timeout() is None
+    assert not control.should_stop()
+
+
+def test_ocr_timeout_is_page_budget_capped_by_job_budget(db, user):
+    job = make_job(db, make_document(db, user), status=ExtractionStatus.PROCESSING)
+
+    control = JobControl(db, job.id, time_budget=100.0, page_budget=5.0)
+    assert control.ocr_timeout() == pytest.approx(5.0, abs=0.1)
+    # Tiles of one page share its budget
+    assert control.ocr_timeout(page_started=time.monotonic() - 3.0) == pytest.approx(2.0, abs=0.1)
+    assert control.ocr_timeout(page_started=time.monotonic() - 10.0) == MIN_OCR_TIMEOUT
+
+    control = JobControl(db, job.id, time_budget=2.0, page_budget=5.0)
+    assert control.ocr_timeout() == pytest.approx(2.0, abs=0.1)
+
+
+def test_ocr_timed_out_fails_job(db, user):
+    job = make_job(db, make_document(db, user), status=ExtractionStatus.PROCESSING)
+
+    control = JobControl(db, job.id, time_budget=100.0, page_budget=5.0)
+    control.ocr_timed_out(3)
+    assert control.status == ExtractionStatus.FAILED
+    assert control.reason == "OCR of page 3 exceeded the page time budget of 5s"
+
+    control = JobControl(db, job.id, time_budget=100.0, page_budget=5.0)
+    control.deadline = time.monotonic()
+    control.ocr_timed_out(3)
+    assert control.reason == "Job exceeded its time budget of 100s"
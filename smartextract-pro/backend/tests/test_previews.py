@@ -0,0 +1,143 @@
+import os
+import time
+import signal
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.models.document import Document
+from app.services import previews
+from app.services.previews import PreviewRenderer, PreviewUnavailable, ensure_preview, preview_key
+from app.services.storage import get_storage
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    """Renders in threads of this process, counting the renders started"""
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.submitted = 0
+
+    def submit(self, fn, *args, **kwargs):
+        if fn is previews.generate_preview:
+            self.submitted += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+@pytest.fixture
+def renderer():
+    renderer = PreviewRenderer(max_workers=1)
+    yield renderer
+    renderer.stop()
+
+
+@pytest.fixture
+def executor(renderer):
+    renderer._executor = CountingExecutor()
+    return renderer._executor
+
+
+def store(key: str, content: bytes) -> str:
+    path = os.path.join(settings.UPLOAD_FOLDER, "source")
+    with open(path, "wb") as f:
+        f.write(content)
+    get_storage().put(key, path)
+    return key
+
+
+def store_image(key: str = "ab/cdef.png") -> str:
+    ok, encoded = cv2.imencode(".png", np.full((300, 400, 3), 200, dtype=np.uint8))
+    return store(key, encoded.tobytes())
+
+
+def test_request_waits_for_render_in_flight(renderer, executor):
+    key = store_image()
+    release = threading.Event()
+    executor.submit(release.wait)  # Keeps the render queued
+
+    first = renderer.submit(key, "png", 1, 64)
+    second = renderer.submit(key, "png", 1, 64)
+    release.set()
+
+    assert second is first
+    first.result(timeout=10)
+    assert executor.submitted == 1
+    assert get_storage().exists(preview_key(key, 1, 64))
+    assert renderer._in_flight == {}
+
+
+def test_failed_preview_is_not_rendered_again(renderer, executor):
+    key = store("ab/damaged.png", b"not an image")
+
+    with pytest.raises(PreviewUnavailable):
+        renderer.submit(key, "png", 1, 64).result(timeout=10)
+    with pytest.raises(PreviewUnavailable):
+        renderer.submit(key, "png", 1, 64).result(timeout=0)
+
+    assert executor.submitted == 1
+
+
+def test_stored_preview_is_not_rendered_again(renderer, executor, monkeypatch):
+    monkeypatch.setattr(previews, "preview_renderer", renderer)
+    document = Document(storage_key=store_image(), file_type="png")
+
+    key = asyncio.run(ensure_preview(document, 1, 64))
+    assert get_storage().exists(key)
+    assert asyncio.run(ensure_preview(document, 1, 64)) == key
+
+    assert executor.submitted == 1
+
+
+def test_pool_broken_at_submit_is_replaced(renderer, monkeypatch):
+    # Rendering processes are spawned: they read the settings from the environment
+    monkeypatch.setenv("STORAGE_ROOT", settings.STORAGE_ROOT)
+    monkeypatch.setenv("UPLOAD_FOLDER", settings.UPLOAD_FOLDER)
+    monkeypatch.setenv("STORAGE_BACKEND", "local")
+    key = store_image()
+    renderer.submit(key, "png", 1, 32).result(timeout=60)
+    broken = renderer._executor
+
+    for process in list(broken._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    deadline = time.monotonic() + 10
+    while not broken._broken and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert broken._broken
+
+    renderer.submit(key, "png", 1, 48).result(timeout=60)
+
+    assert renderer._executor is not broken
+    assert get_storage().exists(preview_key(key, 1, 48))
+
+
+def test_pool_broken_during_render_is_replaced(renderer, executor):
+    key = store_image()
+    future = previews.Future()
+    future.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly"))
+
+    renderer._finished(preview_key(key, 1, 64), future, executor)
+
+    assert renderer._executor is None
+    assert renderer._failed == {}
+    # The next render starts a new pool, and the preview is not remembered as failed
+    replacement = renderer._executor = CountingExecutor()
+    renderer.submit(key, "png", 1, 64).result(timeout=10)
+    assert replacement.submitted == 1
+
+
+def test_render_lost_to_broken_pool_is_retried_later(renderer, monkeypatch):
+    monkeypatch.setattr(previews, "preview_renderer", renderer)
+    document = Document(storage_key=store_image(), file_type="png")
+
+    def broken_render(*args):
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+    monkeypatch.setattr(previews, "generate_preview", broken_render)
+    renderer._executor = ThreadPoolExecutor(max_workers=1)
+    with pytest.raises(previews.PreviewsBusy):
+        asyncio.run(ensure_preview(document, 1, 64))
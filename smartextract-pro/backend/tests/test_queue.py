@@ -0,0 +1,126 @@
+import itertools
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.db.database import Base
+from app.models import ExtractionJob, ExtractionPriority
+from app.models.extraction import ExtractionStatus
+from app.worker.queue import JobQueue
+
+NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(settings, "TENANT_WEIGHTS", {})
+    monkeypatch.setattr(settings, "TENANT_MAX_CONCURRENT_JOBS", 0)
+    monkeypatch.setattr(settings, "TENANT_CONCURRENCY_LIMITS", {})
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+@pytest.fixture
+def add_job(db):
+    """Add a job; jobs are created one second apart, in the order they are added"""
+    sequence = itertools.count()
+
+    def add(user_id, priority=ExtractionPriority.INTERACTIVE, running=False):
+        number = next(sequence)
+        job = ExtractionJob(
+            id=f"{user_id}-{number}",
+            user_id=user_id,
+            document_id=f"doc-{number}",
+            priority=priority,
+            status=ExtractionStatus.PROCESSING if running else ExtractionStatus.PENDING,
+            lease_owner="other-worker" if running else None,
+            lease_expires_at=NOW + timedelta(minutes=5) if running else None,
+            created_at=NOW - timedelta(hours=1) + timedelta(seconds=number),
+            updated_at=NOW,
+        )
+        db.add(job)
+        db.commit()
+        return job.id
+
+    return add
+
+
+def schedule(db, limit, bulk_limit=None):
+    return list(JobQueue("test-worker")._schedule(db, NOW, limit, bulk_limit))
+
+
+def owners(job_ids):
+    return Counter(job_id.split("-")[0] for job_id in job_ids)
+
+
+def test_interactive_before_bulk(db, add_job):
+    bulk = add_job("a", ExtractionPriority.BULK)
+    interactive = add_job("b")
+    assert schedule(db, 2) == [interactive, bulk]
+
+
+def test_small_tenant_is_not_starved(db, add_job):
+    for _ in range(20):
+        add_job("a")
+    invoice = add_job("b")
+    assert invoice in schedule(db, 2)
+
+
+def test_tenants_share_in_proportion_to_weights(db, add_job, monkeypatch):
+    monkeypatch.setattr(settings, "TENANT_WEIGHTS", {"a": 2.0})
+    for _ in range(12):
+        add_job("a")
+        add_job("b")
+    assert owners(schedule(db, 12)) == {"a": 8, "b": 4}
+
+
+def test_equal_weights_alternate(db, add_job):
+    for _ in range(6):
+        add_job("a")
+    for _ in range(6):
+        add_job("b")
+    assert owners(schedule(db, 6)) == {"a": 3, "b": 3}
+
+
+def test_running_jobs_count_towards_share(db, add_job):
+    add_job("a", running=True)
+    add_job("a", running=True)
+    queued_a = add_job("a")
+    queued_b = add_job("b")
+    assert schedule(db, 2) == [queued_b, queued_a]
+
+
+def test_concurrency_cap(db, add_job, monkeypatch):
+    monkeypatch.setattr(settings, "TENANT_MAX_CONCURRENT_JOBS", 1)
+    add_job("a", running=True)
+    add_job("a")
+    queued_b = add_job("b")
+    assert schedule(db, 5) == [queued_b]
+
+
+def test_bulk_limit(db, add_job):
+    interactive = add_job("a")
+    for _ in range(3):
+        add_job("b", ExtractionPriority.BULK)
+    picked = schedule(db, 5, bulk_limit=1)
+    assert picked[0] == interactive
+    assert len(picked) == 2
+
+
+def test_claim_leases_jobs(db, add_job):
+    job_id = add_job("a")
+    claimed = JobQueue("test-worker").claim(db, limit=1)
+    assert claimed == [(job_id, ExtractionPriority.INTERACTIVE)]
+    job = db.get(ExtractionJob, job_id)
+    db.refresh(job)
+    assert job.status == ExtractionStatus.PROCESSING
+    assert job.lease_owner == "test-worker"
+    assert job.attempts == 1
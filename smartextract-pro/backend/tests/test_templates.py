@@ -0,0 +1,120 @@
+import pytest
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from app.core.database import background_engine
+from app.crud import crud_template
+from app.models.extraction import ExtractionJob, ExtractionStatus
+from app.models.template import Template
+
+from conftest import make_document, make_job
+
+
+def make_template(db, user):
+    template = Template(name="Invoice", fields=[{"name": "total", "type": "number"}], owner_id=user.id)
+    db.add(template)
+    db.commit()
+    return template
+
+
+def test_delete_template_used_by_job(client, db, user):
+    template = make_template(db, user)
+    job = make_job(db, make_document(db, user), template_id=template.id, status=ExtractionStatus.COMPLETED)
+
+    template_id, job_id = template.id, job.id
+
+    response = client.delete(f"/api/v1/templates/{template_id}")
+
+    assert response.status_code == 204
+    db.expire_all()
+    assert db.get(Template, template_id) is None
+    job = db.get(ExtractionJob, job_id)
+    assert job is not None
+    assert job.template_id is None
+
+
+def test_foreign_key_clears_template(db, user):
+    template = make_template(db, user)
+    job = make_job(db, make_document(db, user), template_id=template.id)
+    job_id = job.id
+
+    db.execute(delete(Template).where(Template.id == template.id))
+    db.commit()
+
+    assert db.get(ExtractionJob, job_id).template_id is None
+
+
+def test_reapply_counts_jobs_without_running(client, db, user):
+    template = make_template(db, user)
+    document = make_document(db, user)
+    for job_status in (ExtractionStatus.COMPLETED, ExtractionStatus.COMPLETED, ExtractionStatus.PENDING):
+        make_job(db, document, template_id=template.id, status=job_status)
+    template_id = template.id
+
+    response = client.get(f"/api/v1/templates/{template_id}/reapply")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["jobs"] == 2
+    assert body["command"] == f"python scripts/reapply_template.py {template_id} --user-id {user.id}"
+    assert client.post(f"/api/v1/templates/{template_id}/reapply").status_code == 405
+    assert client.get("/api/v1/templates/missing/reapply").status_code == 404
+
+
+@pytest.fixture
+def concurrent_change(monkeypatch):
+    """Make another request change a template right after an endpoint read it"""
+    def change(statement):
+        get_template = crud_template.get_template
+
+        def get_then_change(**kwargs):
+            template = get_template(**kwargs)
+            with Session(bind=background_engine) as other:
+                other.execute(statement)
+                other.commit()
+            return template
+
+        monkeypatch.setattr(crud_template, "get_template", get_then_change)
+    return change
+
+
+def test_concurrent_update_conflicts(client, db, user, concurrent_change):
+    template = make_template(db, user)
+    template_id = template.id
+    concurrent_change(update(Template).where(Template.id == template_id).values(name="Receipt", version=2))
+
+    response = client.put(f"/api/v1/templates/{template_id}", json={"name": "Bill"})
+
+    assert response.status_code == 409
+    db.expire_all()
+    template = db.get(Template, template_id)
+    assert (template.name, template.version) == ("Receipt", 2)
+
+
+def test_update_of_deleted_template_conflicts(client, db, user, concurrent_change):
+    template = make_template(db, user)
+    template_id = template.id
+    concurrent_change(delete(Template).where(Template.id == template_id))
+
+    assert client.put(f"/api/v1/templates/{template_id}", json={"name": "Bill"}).status_code == 409
+
+
+def test_delete_of_updated_template_conflicts(client, db, user, concurrent_change):
+    template = make_template(db, user)
+    job = make_job(db, make_document(db, user), template_id=template.id, status=ExtractionStatus.COMPLETED)
+    template_id, job_id = template.id, job.id
+    concurrent_change(update(Template).where(Template.id == template_id).values(version=2))
+
+    assert client.delete(f"/api/v1/templates/{template_id}").status_code == 409
+    db.expire_all()
+    assert db.get(Template, template_id) is not None
+    assert db.get(ExtractionJob, job_id).template_id == template_id
+
+
+def test_update_bumps_version(client, db, user):
+    template = make_template(db, user)
+
+    response = client.put(f"/api/v1/templates/{template.id}", json={"name": "Bill"})
+
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
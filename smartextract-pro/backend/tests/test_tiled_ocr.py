@@ -0,0 +1,87 @@
+import pytest
+
+from app.core.config import settings
+from app.services.ocr_data import OCR_DATA_COLUMNS, empty_ocr_data
+from app.services.tiled_ocr import merge_tile_words, plan_tiles
+
+# Two tiles side by side: x 0-1100 and 900-2000, owning the words centered left and right of x=1000
+WIDTH, HEIGHT, TILE_SIZE, OVERLAP = 2000, 500, 1100, 200
+
+
+@pytest.fixture
+def tiles(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_TILE_OVERLAP", OVERLAP)
+    return plan_tiles(WIDTH, HEIGHT, TILE_SIZE, OVERLAP)
+
+
+def words(tile, *entries):
+    """OCR output of a tile; entries are (text, page left, top, width, height, line)"""
+    data = empty_ocr_data()
+    for text, left, top, width, height, line in entries:
+        data["text"].append(text)
+        data["left"].append(left - tile.left)
+        data["top"].append(top - tile.top)
+        data["width"].append(width)
+        data["height"].append(height)
+        data["conf"].append(90.0)
+        data["block_num"].append(1)
+        data["par_num"].append(1)
+        data["line_num"].append(line)
+    return data
+
+
+def test_plan_tiles_overlap_and_cores(tiles):
+    assert [(tile.left, tile.right) for tile in tiles] == [(0, 1100), (900, 2000)]
+    assert [tile.core for tile in tiles] == [(0, 0, 1000, HEIGHT), (1000, 0, 2000, HEIGHT)]
+
+
+def test_plan_tiles_cover_the_page():
+    tiles = plan_tiles(10000, 7000, 4096, 384)
+    assert min(tile.left for tile in tiles) == 0 and max(tile.right for tile in tiles) == 10000
+    assert min(tile.top for tile in tiles) == 0 and max(tile.bottom for tile in tiles) == 7000
+    assert all(tile.right - tile.left <= 4096 and tile.bottom - tile.top <= 4096 for tile in tiles)
+
+
+def test_word_in_overlap_is_kept_once(tiles):
+    left, right = tiles
+    merged = merge_tile_words(tiles, [
+        words(left, ("alpha", 940, 100, 100, 20, 1)),
+        words(right, ("alpha", 940, 100, 100, 20, 1)),
+    ])
+    assert merged["text"] == ["alpha"]
+    assert (merged["left"][0], merged["top"][0]) == (940, 100)
+
+
+def test_cut_copy_is_dropped_for_whole_word(tiles):
+    left, right = tiles
+    merged = merge_tile_words(tiles, [
+        words(left, ("invoi", 850, 200, 250, 20, 1)),  # Runs into the tile's right edge
+        words(right, ("invoice", 905, 200, 190, 20, 1)),
+    ])
+    assert merged["text"] == ["invoice"]
+
+
+def test_cut_word_without_whole_copy_is_kept(tiles):
+    left, right = tiles
+    merged = merge_tile_words(tiles, [
+        words(left, ("longword", 850, 200, 250, 20, 1)),
+        words(right),
+    ])
+    assert merged["text"] == ["longword"]
+
+
+def test_lines_are_joined_across_seam(tiles):
+    left, right = tiles
+    merged = merge_tile_words(tiles, [
+        words(left, ("Total", 700, 300, 100, 20, 1), ("due", 850, 300, 100, 20, 1), ("42.00", 975, 302, 60, 20, 1)),
+        words(right, ("42.00", 975, 302, 60, 20, 1), ("Footer", 1500, 450, 120, 20, 2)),
+    ])
+    assert merged["text"] == ["Total", "due", "42.00", "Footer"]
+    lines = [(merged["block_num"][i], merged["par_num"][i], merged["line_num"][i]) for i in range(4)]
+    assert lines[0] == lines[1] == lines[2]
+    assert lines[3] != lines[0]
+    assert all(len(merged[column]) == 4 for column in OCR_DATA_COLUMNS)
+
+
+def test_no_tiles():
+    assert merge_tile_words([], []) == empty_ocr_data()
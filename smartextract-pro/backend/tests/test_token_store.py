@@ -0,0 +1,45 @@
+import pytest
+
+from app.services.ocr_data import OCR_DATA_COLUMNS, empty_ocr_data
+from app.services.token_store import pack_tokens, unpack_arrays, unpack_tokens
+
+
+def sample_words():
+    return {
+        "text": ["Invoice", "Nº", "2024-0017", "Total:", "€1.234,56", "日本語"],
+        "left": [10, 120, 160, 10, 120, 300],
+        "top": [5, 5, 5, 40, 40, 80],
+        "width": [100, 30, 120, 60, 110, 90],
+        "height": [20, 20, 20, 18, 18, 25],
+        "conf": [96.5, 88.25, 91.0, -1.0, 77.75, 64.0],
+        "block_num": [1, 1, 1, 2, 2, 3],
+        "par_num": [1, 1, 1, 1, 1, 1],
+        "line_num": [1, 1, 1, 1, 1, 2],
+    }
+
+
+def test_round_trip():
+    words = sample_words()
+    assert unpack_tokens(pack_tokens(words)) == words
+
+
+def test_round_trip_empty():
+    assert unpack_tokens(pack_tokens(empty_ocr_data())) == empty_ocr_data()
+
+
+def test_confidence_is_kept_to_two_decimals():
+    words = sample_words()
+    words["conf"] = [12.346, 99.999, 0.004, -5.0, 50.0, 1.0]
+    assert unpack_tokens(pack_tokens(words))["conf"] == [12.35, 100.0, 0.0, -1.0, 50.0, 1.0]
+
+
+def test_unpack_arrays_columns():
+    arrays = unpack_arrays(pack_tokens(sample_words()))
+    assert set(arrays) == set(OCR_DATA_COLUMNS)
+    assert all(len(values) == 6 for values in arrays.values())
+    assert arrays["text"][5] == "日本語"
+
+
+def test_not_a_token_blob():
+    with pytest.raises(ValueError):
+        unpack_tokens(b"JUNK" + bytes(16))
@@ -0,0 +1,121 @@
+import os
+import hashlib
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models.document import Document
+from app.models.upload_session import UploadSession
+from app.services.storage import get_storage
+from app.services.upload_sessions import collect_expired_sessions
+
+CONTENT = b"%PDF-1.4\n" + bytes(range(256)) * 8
+
+
+@pytest.fixture(autouse=True)
+def no_upload_previews(monkeypatch):
+    monkeypatch.setattr(settings, "PREVIEW_ON_UPLOAD_SIZES", [])
+
+
+def start(client, size: int = len(CONTENT)) -> str:
+    response = client.post("/api/v1/uploads/", json={"filename": "scan.pdf", "size": size})
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def put(client, session_id: str, offset: int, chunk: bytes):
+    return client.put(
+        f"/api/v1/uploads/{session_id}",
+        params={"offset": offset},
+        content=chunk,
+        headers={"Content-Type": "application/octet-stream"}
+    )
+
+
+def offset(client, session_id: str) -> int:
+    return client.get(f"/api/v1/uploads/{session_id}").json()["offset"]
+
+
+def test_chunk_past_offset_is_refused_with_resume_offset(client):
+    session_id = start(client)
+    assert put(client, session_id, 0, CONTENT[:100]).json()["offset"] == 100
+
+    response = put(client, session_id, 200, CONTENT[200:300])
+
+    assert response.status_code == 409
+    assert response.json()["detail"]["offset"] == 100
+    assert offset(client, session_id) == 100
+
+
+def test_retried_chunk_does_not_move_offset_back(client):
+    session_id = start(client)
+    put(client, session_id, 0, CONTENT[:1000])
+
+    # The response to the second chunk was lost; it is sent again
+    response = put(client, session_id, 500, CONTENT[500:700])
+    assert response.status_code == 200
+    assert response.json()["offset"] == 1000
+
+    # Overlapping and running past the offset advances it
+    assert put(client, session_id, 900, CONTENT[900:1200]).json()["offset"] == 1200
+
+
+def test_chunk_past_declared_size_is_refused(client):
+    session_id = start(client, size=100)
+
+    response = put(client, session_id, 0, CONTENT[:101])
+
+    assert response.status_code == 413
+    assert offset(client, session_id) == 0
+
+
+def test_finalize_before_complete_is_refused(client):
+    session_id = start(client)
+    put(client, session_id, 0, CONTENT[:100])
+
+    response = client.post(f"/api/v1/uploads/{session_id}/finalize")
+
+    assert response.status_code == 409
+    assert offset(client, session_id) == 100
+
+
+def test_finalize_creates_document(client, db, user):
+    session_id = start(client)
+    for position in range(0, len(CONTENT), 700):
+        assert put(client, session_id, position, CONTENT[position:position + 700]).status_code == 200
+    temp_path = db.get(UploadSession, session_id).temp_path
+
+    response = client.post(f"/api/v1/uploads/{session_id}/finalize")
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body["content_hash"] == hashlib.sha256(CONTENT).hexdigest()
+    assert body["file_size"] == len(CONTENT)
+    document = db.get(Document, body["id"])
+    assert document.owner_id == user.id
+    with get_storage().local_path(document.storage_key) as path, open(path, "rb") as f:
+        assert f.read() == CONTENT
+    # The session is over
+    assert client.get(f"/api/v1/uploads/{session_id}").status_code == 404
+    assert not os.path.exists(temp_path)
+    assert client.post(f"/api/v1/uploads/{session_id}/finalize").status_code == 404
+
+
+def test_expired_sessions_are_collected(client, db):
+    expired_id = start(client)
+    active_id = start(client)
+    put(client, expired_id, 0, CONTENT[:100])
+    db.expire_all()
+    expired = db.get(UploadSession, expired_id)
+    expired_path, active_path = expired.temp_path, db.get(UploadSession, active_id).temp_path
+    expired.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.commit()
+
+    assert collect_expired_sessions(db) == 1
+
+    db.expire_all()
+    assert db.get(UploadSession, expired_id) is None
+    assert not os.path.exists(expired_path)
+    assert db.get(UploadSession, active_id) is not None
+    assert os.path.exists(active_path)
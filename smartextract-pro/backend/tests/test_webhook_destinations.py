@@ -0,0 +1,67 @@
+import socket
+
+import pytest
+
+from app.core.config import settings
+from app.services.webhook_destinations import DestinationRefused, check_destination, check_url
+
+
+def resolves_to(monkeypatch, *addresses):
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET6 if ":" in a else socket.AF_INET, socket.SOCK_STREAM, 6, "", (a, port)) for a in addresses]
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/hook",
+    "http://localhost/hook",
+    "http://api.localhost/hook",
+    "http://10.1.2.3/hook",
+    "http://192.168.0.10/hook",
+    "http://172.16.5.5/hook",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://100.64.0.1/hook",
+    "http://0.0.0.0/hook",
+    "http://[::1]/hook",
+    "http://[fd00::1]/hook",
+    "http://[::ffff:10.0.0.1]/hook",
+])
+def test_non_public_urls_are_refused(url):
+    with pytest.raises(DestinationRefused):
+        check_url(url)
+
+
+def test_public_urls_pass():
+    check_url("https://hooks.example.com/smartextract")
+    check_url("http://93.184.216.34/hook")
+
+
+def test_name_resolving_to_private_address_is_refused(monkeypatch):
+    resolves_to(monkeypatch, "93.184.216.34", "10.0.0.5")
+    with pytest.raises(DestinationRefused):
+        check_destination("https://rebound.example.com/hook")
+
+
+def test_name_resolving_to_public_addresses_passes(monkeypatch):
+    resolves_to(monkeypatch, "93.184.216.34", "2606:2800:220:1:248:1893:25c8:1946")
+    check_destination("https://hooks.example.com/hook")
+
+
+def test_unresolvable_name_is_refused(monkeypatch):
+    def getaddrinfo(*args, **kwargs):
+        raise socket.gaierror("Name or service not known")
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    with pytest.raises(DestinationRefused):
+        check_destination("https://nowhere.example.com/hook")
+
+
+def test_allowed_hosts_are_not_checked(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOWED_HOSTS", ["127.0.0.1", "hooks.internal"])
+    resolves_to(monkeypatch, "10.0.0.5")
+    check_destination("http://127.0.0.1:9000/hook")
+    check_destination("http://hooks.internal/hook")
+
+
+def test_registering_private_url_is_rejected(client):
+    response = client.post("/api/v1/webhooks/", json={"url": "http://169.254.169.254/latest/meta-data/"})
+    assert response.status_code == 422
@@ -0,0 +1,273 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.models.extraction import ExtractionJob, ExtractionStatus
+from app.models.webhook import WebhookEndpoint, WebhookOutbox, WebhookDeliveryStatus
+from app.services.extraction_service import ExtractionService
+from app.services.job_results import JobOutcome, persist_outcomes
+from app.services.webhook_outbox import FinishedJob, enqueue_job_events
+from app.worker.queue import JobQueue
+from app.worker.webhooks import SIGNATURE_HEADER, TIMESTAMP_HEADER, WebhookDispatcher, backoff_seconds, sign
+
+from conftest import make_document, make_job
+
+SECRET = "test-secret"
+
+
+class Receiver:
+    """Webhook receiver on a local port; answers 200 unless told otherwise"""
+    def __init__(self):
+        self.requests = []  # (headers, body)
+        self.status = 200
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                receiver.requests.append((dict(self.headers), body))
+                self.send_response(receiver.status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def events(self, request: int):
+        return json.loads(self.requests[request][1])["events"]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def receiver(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOWED_HOSTS", ["127.0.0.1"])
+    receiver = Receiver()
+    yield receiver
+    receiver.close()
+
+
+@pytest.fixture
+def endpoint(db, user, receiver):
+    endpoint = WebhookEndpoint(url=receiver.url, secret=SECRET, user_id=user.id)
+    db.add(endpoint)
+    db.commit()
+    return endpoint
+
+
+def add_events(db, user, count: int):
+    """Finish `count` jobs of `user` one second apart and return their event IDs, oldest first"""
+    document = make_document(db, user)
+    start = datetime.utcnow() - timedelta(minutes=1)
+    for number in range(count):
+        job = make_job(db, document, status=ExtractionStatus.COMPLETED)
+        enqueue_job_events(db, [FinishedJob(job.id, ExtractionStatus.COMPLETED)], start + timedelta(seconds=number))
+    db.commit()
+    return list(db.execute(select(WebhookOutbox.id).order_by(WebhookOutbox.created_at)).scalars().all())
+
+
+def deliver(dispatcher: WebhookDispatcher) -> int:
+    """Run one dispatcher iteration to completion; returns the number of requests sent"""
+    with httpx.Client(trust_env=False) as client, ThreadPoolExecutor(2) as executor:
+        started = dispatcher._tick(client, executor)
+        wait(list(dispatcher._in_flight.values()))
+        dispatcher._reap()
+    return started
+
+
+def outbox(db):
+    db.expire_all()
+    return db.execute(select(WebhookOutbox).order_by(WebhookOutbox.created_at)).scalars().all()
+
+
+def allow_retry(db, endpoint):
+    db.execute(update(WebhookEndpoint).where(WebhookEndpoint.id == endpoint.id).values(retry_after=None))
+    db.commit()
+
+
+@pytest.fixture
+def commits(db, monkeypatch):
+    """Number of commits of the `db` session"""
+    count = []
+    commit = db.commit
+
+    def counting_commit():
+        count.append(1)
+        commit()
+
+    monkeypatch.setattr(db, "commit", counting_commit)
+    return count
+
+
+def test_persist_outcomes_writes_event_in_same_commit(db, user, endpoint, commits):
+    job = make_job(db, make_document(db, user), status=ExtractionStatus.PROCESSING, lease_owner="worker")
+    outcome = JobOutcome(job.id, ExtractionStatus.COMPLETED)
+    outcome.add_fields({"total": {"value": "12.50", "confidence": 0.9}})
+    commits.clear()
+
+    persist_outcomes(db, [outcome], lease_owner="worker")
+
+    assert len(commits) == 1
+    (event,) = outbox(db)
+    assert event.event == "extraction.completed"
+    assert event.job_id == job.id
+    assert event.payload["fields"]["total"]["value"] == "12.50"
+    assert db.get(ExtractionJob, job.id).status == ExtractionStatus.COMPLETED
+
+
+def test_fail_exhausted_writes_event_in_same_commit(db, user, endpoint, commits):
+    job = make_job(db, make_document(db, user), status=ExtractionStatus.PENDING, attempts=3)
+    commits.clear()
+
+    assert JobQueue("worker", max_attempts=3).fail_exhausted(db) == 1
+
+    assert len(commits) == 1
+    (event,) = outbox(db)
+    assert event.event == "extraction.failed"
+    assert db.get(ExtractionJob, job.id).status == ExtractionStatus.FAILED
+
+
+def test_cancel_job_writes_event_in_same_commit(db, user, endpoint, commits):
+    job = make_job(db, make_document(db, user), status=ExtractionStatus.PENDING)
+    commits.clear()
+
+    ExtractionService.cancel_job(db, job.id, user.id)
+
+    assert len(commits) == 1
+    (event,) = outbox(db)
+    assert event.event == "extraction.cancelled"
+    assert db.get(ExtractionJob, job.id).status == ExtractionStatus.CANCELLED
+
+
+def test_failed_commit_writes_neither_state_nor_event(db, user, endpoint, monkeypatch):
+    job = make_job(db, make_document(db, user), status=ExtractionStatus.PROCESSING, lease_owner="worker")
+
+    def failing_commit():
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(db, "commit", failing_commit)
+    with pytest.raises(RuntimeError):
+        persist_outcomes(db, [JobOutcome(job.id, ExtractionStatus.COMPLETED)], lease_owner="worker")
+    monkeypatch.undo()
+
+    assert outbox(db) == []
+    assert db.get(ExtractionJob, job.id).status == ExtractionStatus.PROCESSING
+
+
+def test_request_is_signed(db, user, endpoint, receiver):
+    (event_id,) = add_events(db, user, 1)
+
+    assert deliver(WebhookDispatcher()) == 1
+
+    (headers, body), = receiver.requests
+    timestamp = headers[TIMESTAMP_HEADER]
+    assert headers[SIGNATURE_HEADER] == f"sha256={sign(SECRET, timestamp, body)}"
+    assert headers[SIGNATURE_HEADER] != f"sha256={sign('other-secret', timestamp, body)}"
+    assert [event["id"] for event in receiver.events(0)] == [event_id]
+    (event,) = outbox(db)
+    assert event.status == WebhookDeliveryStatus.DELIVERED
+    assert event.attempts == 1
+    assert event.delivered_at is not None
+
+
+def test_events_are_batched_once_receiver_is_behind(db, user, endpoint, receiver, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_BATCH_SIZE", 3)
+    event_ids = add_events(db, user, 5)
+    dispatcher = WebhookDispatcher()
+
+    assert deliver(dispatcher) == 1
+    assert deliver(dispatcher) == 1
+    assert deliver(dispatcher) == 0
+
+    assert [event["id"] for event in receiver.events(0)] == event_ids[:3]
+    assert [event["id"] for event in receiver.events(1)] == event_ids[3:]
+    assert all(event.status == WebhookDeliveryStatus.DELIVERED for event in outbox(db))
+
+
+def test_failed_request_backs_endpoint_off(db, user, endpoint, receiver, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_BACKOFF_BASE", 10.0)
+    receiver.status = 500
+    add_events(db, user, 1)
+    dispatcher = WebhookDispatcher()
+
+    before = datetime.utcnow()
+    deliver(dispatcher)
+    db.refresh(endpoint)
+    assert endpoint.failure_count == 1
+    assert endpoint.last_error == "HTTP 500"
+    assert before + timedelta(seconds=5) <= endpoint.retry_after <= datetime.utcnow() + timedelta(seconds=10)
+    (event,) = outbox(db)
+    assert event.status == WebhookDeliveryStatus.PENDING
+    assert event.attempts == 1
+
+    # Nothing is sent while backing off
+    assert deliver(dispatcher) == 0
+    assert len(receiver.requests) == 1
+
+    allow_retry(db, endpoint)
+    before = datetime.utcnow()
+    deliver(dispatcher)
+    db.refresh(endpoint)
+    assert endpoint.failure_count == 2
+    assert before + timedelta(seconds=10) <= endpoint.retry_after <= datetime.utcnow() + timedelta(seconds=20)
+
+    # A delivery resets the endpoint
+    receiver.status = 204
+    allow_retry(db, endpoint)
+    deliver(dispatcher)
+    db.refresh(endpoint)
+    assert endpoint.failure_count == 0
+    assert endpoint.last_error is None
+    assert outbox(db)[0].status == WebhookDeliveryStatus.DELIVERED
+
+
+def test_backoff_doubles_up_to_maximum(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_BACKOFF_BASE", 2.0)
+    monkeypatch.setattr(settings, "WEBHOOK_BACKOFF_MAX", 60.0)
+    for failures, delay in [(1, 2.0), (2, 4.0), (3, 8.0), (5, 32.0), (6, 60.0), (30, 60.0)]:
+        assert delay / 2 <= backoff_seconds(failures) <= delay
+
+
+def test_event_fails_after_max_attempts(db, user, endpoint, receiver, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_ATTEMPTS", 3)
+    receiver.status = 503
+    add_events(db, user, 1)
+    dispatcher = WebhookDispatcher()
+
+    for attempt in range(1, 4):
+        allow_retry(db, endpoint)
+        assert deliver(dispatcher) == 1
+        (event,) = outbox(db)
+        assert event.attempts == attempt
+    assert event.status == WebhookDeliveryStatus.FAILED
+    assert event.last_error == "HTTP 503"
+
+    allow_retry(db, endpoint)
+    assert deliver(dispatcher) == 0
+    assert len(receiver.requests) == 3
+
+
+def test_non_public_destination_is_not_sent_to(db, user, endpoint, receiver, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_ALLOWED_HOSTS", [])
+    add_events(db, user, 1)
+
+    deliver(WebhookDispatcher())
+
+    assert receiver.requests == []
+    db.refresh(endpoint)
+    assert endpoint.last_error.startswith("Destination refused")
+    assert outbox(db)[0].status == WebhookDeliveryStatus.PENDING